@@ -0,0 +1,175 @@
+"""
+Headless batch detection over a folder of MRI images.
+
+Files are spread over a pool of worker processes, each holding its own
+BrainTumorDetector. Every result is appended to a JSONL file as soon as it
+arrives, so an interrupted run can be resumed: paths already present in the
+output file are skipped, except those recorded with an error, which are
+retried. Results, including failures, are also added to the results store
+(store.py) one chunk per transaction, unless --no-store is given.
+"""
+import glob
+import json
+import multiprocessing as mp
+import os
+import time
+
+from . import metrics
+from .cascade import SCREEN_SIZE, SUSPICION_THRESHOLD
+from .postprocess import CONF_FLOOR
+from .tiling import DEFAULT_OVERLAP
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Per-process detector, created by _init_worker
+_detector = None
+
+def collect_images(root, recursive=True):
+    pattern = os.path.join(root, '**', '*') if recursive else os.path.join(root, '*')
+    paths = [p for p in glob.glob(pattern, recursive=recursive) if p.lower().endswith(IMAGE_EXTS)]
+    return sorted(os.path.abspath(p) for p in paths)
+
+def load_checkpoint(out_path):
+    """Returns the set of image paths already written to out_path without an error."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                path = record['path']
+            except (ValueError, KeyError):
+                # Partial last line from a crashed run
+                continue
+            # A later line for the same path supersedes an earlier one
+            if record.get('error'):
+                done.discard(path)
+            else:
+                done.add(path)
+    return done
+
+def make_record(path, detections, error=None, image_hash=None):
+    record = {
+        'path': path,
+        'image_hash': image_hash,
+        'lesion_count': len(detections),
+        'max_conf': max((d['conf'] for d in detections), default=0.0),
+        'detections': detections,
+    }
+    if error:
+        record['error'] = error
+    return record
+
+def _init_worker(num_threads, detector_kwargs):
+    global _detector
+    import torch
+    from backend.detector import BrainTumorDetector
+
+    # Split the cores between processes instead of oversubscribing them
+    torch.set_num_threads(num_threads)
+    _detector = BrainTumorDetector(tune_threads=False, **detector_kwargs)
+
+def _process_chunk(args):
+    # Stage timings recorded in this worker travel back with the records
+    records = _detect_chunk(*args)
+    return records, metrics.drain()
+
+def _detect_chunk(paths, conf_threshold):
+    if _detector is None or _detector.model is None:
+        return [make_record(p, [], error="model not loaded") for p in paths]
+    hashes = {}
+    try:
+        results = _detector.detect_batch_candidates(paths, min(CONF_FLOOR, conf_threshold), hashes=hashes)
+    except Exception as e:
+        return [make_record(p, [], error=str(e)) for p in paths]
+    records = []
+    for i, (path, candidates) in enumerate(zip(paths, results)):
+        if candidates.error:
+            records.append(make_record(path, [], error=candidates.error, image_hash=hashes.get(i)))
+        else:
+            records.append(make_record(path, candidates.filter(conf_threshold).to_list(), image_hash=hashes.get(i)))
+    return records
+
+def _open_output(out_path):
+    f = open(out_path, 'a+', encoding='utf-8')
+    # Terminate a partial line left by a crash so the next record starts clean
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != '\n':
+            f.write('\n')
+    return f
+
+def run_batch(image_dir, out_path, workers=None, conf_threshold=0.25, chunk_size=8, resume=True, recursive=True,
+              metrics_out=None, store=True, **detector_kwargs):
+    paths = collect_images(image_dir, recursive)
+    done = load_checkpoint(out_path) if resume else set()
+    todo = [p for p in paths if p not in done]
+
+    print(f"Found {len(paths)} images, {len(done)} already processed, {len(todo)} to go.")
+    if not todo:
+        return 0
+
+    workers = workers or max(1, os.cpu_count() // 2)
+    num_threads = max(1, os.cpu_count() // workers)
+    chunks = [(todo[i:i + chunk_size], conf_threshold) for i in range(0, len(todo), chunk_size)]
+
+    if not resume and os.path.exists(out_path):
+        os.remove(out_path)
+
+    results_store = None
+    if store:
+        from .store import ResultsStore
+        results_store = ResultsStore()
+
+    t0 = time.perf_counter()
+    processed = 0
+    with _open_output(out_path) as f:
+        # spawn: torch and Qt do not survive fork() reliably
+        ctx = mp.get_context('spawn')
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(num_threads, detector_kwargs)) as pool:
+            for records, timings in pool.imap_unordered(_process_chunk, chunks):
+                metrics.merge(timings)
+                for record in records:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                if results_store is not None:
+                    # Failures are stored with their error, so they are not counted as negatives
+                    results_store.add_many(records, conf_threshold, detector_kwargs.get('engine'))
+                processed += len(records)
+                rate = processed / (time.perf_counter() - t0)
+                print(f"[{processed}/{len(todo)}] {rate:.1f} img/s", flush=True)
+
+    print(f"Done. Results written to {out_path}")
+    if metrics_out:
+        metrics.write_prometheus(metrics_out)
+        print(f"Stage timings written to {metrics_out}")
+    return 0
+
+def add_arguments(parser):
+    parser.add_argument('image_dir', help="folder with MRI images")
+    parser.add_argument('--out', default='results.jsonl', help="JSONL output file (default: results.jsonl)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: half the CPU count)")
+    parser.add_argument('--conf', type=float, default=0.25, help="confidence threshold")
+    parser.add_argument('--chunk-size', type=int, default=8, help="images per worker task")
+    parser.add_argument('--no-resume', action='store_true', help="ignore and overwrite an existing output file")
+    parser.add_argument('--no-recursive', action='store_true', help="only scan the top-level folder")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the on-disk detection cache")
+    parser.add_argument('--no-store', action='store_true', help="do not add the results to the results store")
+    parser.add_argument('--engine', default=None, help="inference engine: eager or torchscript (default: $BRAIN_MET_ENGINE or eager)")
+    parser.add_argument('--tile-size', type=int, default=None, help="tiled inference for images larger than this (default: off)")
+    parser.add_argument('--tile-overlap', type=float, default=DEFAULT_OVERLAP, help="fraction of overlap between tiles")
+    parser.add_argument('--cascade', action='store_true',
+                        help="screen at low resolution first; only suspicious images get the full pass")
+    parser.add_argument('--screen-size', type=int, default=SCREEN_SIZE, help="input size of the cascade screening pass")
+    parser.add_argument('--suspicion', type=float, default=SUSPICION_THRESHOLD,
+                        help="screening score that escalates an image to the full pass")
+    parser.add_argument('--metrics-out', default=None, help="write per-stage timings in Prometheus text format to this file")
+
+def main(args):
+    return run_batch(args.image_dir, args.out, workers=args.workers, conf_threshold=args.conf,
+                     chunk_size=args.chunk_size, resume=not args.no_resume, recursive=not args.no_recursive,
+                     metrics_out=args.metrics_out, store=not args.no_store,
+                     use_cache=not args.no_cache, engine=args.engine,
+                     tile_size=args.tile_size, tile_overlap=args.tile_overlap,
+                     cascade=args.cascade, screen_size=args.screen_size, suspicion=args.suspicion)
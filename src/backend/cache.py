@@ -0,0 +1,169 @@
+"""
+Persistent, content-addressed cache of detection results.
+
+Entries are keyed by the hash of the image content, the hash of the weights
+file and the inference parameters, so a changed image or a new `best.pt`
+never returns stale results. Storage is a single SQLite file in WAL mode,
+which gives safe concurrent access from the GUI and batch worker processes.
+The total size is bounded; least recently used entries are evicted first.
+The running total is kept in a meta row by triggers, so a write never
+scans the table, and reads only write back their access time when it is
+more than a minute old.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'brain_metastases')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# A hit only updates last_access when the stored value is older than this (seconds);
+# LRU order at this granularity is plenty and most reads stay read-only
+ACCESS_RESOLUTION = 60
+
+# Weights fingerprints, memoized on (path, size, mtime) so best.pt is not rehashed every call
+_weights_hashes = {}
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def hash_array(arr):
+    h = hashlib.sha256(str((arr.shape, arr.dtype.str)).encode())
+    h.update(memoryview(arr).cast('B') if arr.flags.c_contiguous else arr.tobytes())
+    return h.hexdigest()
+
+def hash_file(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def weights_fingerprint(path):
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key not in _weights_hashes:
+        _weights_hashes[key] = hash_file(path)
+    return _weights_hashes[key]
+
+def remember_fingerprint(path, digest):
+    """Records a weights hash known from elsewhere (e.g. a compiled artifact's stamp) for the current file."""
+    st = os.stat(path)
+    _weights_hashes[(path, st.st_size, st.st_mtime_ns)] = digest
+
+def make_key(image_hash, weights_hash, params):
+    params_str = json.dumps(params, sort_keys=True)
+    return hash_bytes(f"{image_hash}:{weights_hash}:{params_str}".encode())
+
+class DetectionCache:
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        if path is None:
+            path = os.path.join(DEFAULT_CACHE_DIR, 'detections.db')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        # One connection per thread; sqlite3 connections must not be shared
+        self._local = threading.local()
+        self._init_db()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS detections (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON detections(last_access)")
+            # Running total of `size`, kept by triggers so every process writing the file sees it
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS detections_insert AFTER INSERT ON detections BEGIN
+                    UPDATE cache_meta SET value = value + NEW.size WHERE name = 'bytes';
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS detections_delete AFTER DELETE ON detections BEGIN
+                    UPDATE cache_meta SET value = value - OLD.size WHERE name = 'bytes';
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS detections_resize AFTER UPDATE OF size ON detections BEGIN
+                    UPDATE cache_meta SET value = value - OLD.size + NEW.size WHERE name = 'bytes';
+                END
+            """)
+            # Refreshed on open: covers files written before the triggers existed
+            conn.execute("INSERT OR REPLACE INTO cache_meta (name, value)"
+                         " SELECT 'bytes', COALESCE(SUM(size), 0) FROM detections")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute("SELECT value, last_access FROM detections WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > ACCESS_RESOLUTION:
+            # Any UPDATE takes the write lock, so recent hits skip it
+            conn.execute("UPDATE detections SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers queue instead of deadlocking
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # UPDATE, then INSERT: REPLACE would delete the old row without firing the delete trigger
+            args = (data, len(data), time.time(), key)
+            if conn.execute("UPDATE detections SET value = ?, size = ?, last_access = ? WHERE key = ?", args).rowcount == 0:
+                conn.execute("INSERT INTO detections (value, size, last_access, key) VALUES (?, ?, ?, ?)", args)
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _total_bytes(self, conn):
+        return conn.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self, conn):
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM detections ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM detections WHERE key = ?", stale)
+
+    def clear(self):
+        self._conn().execute("DELETE FROM detections")
+
+    def stats(self):
+        conn = self._conn()
+        count = conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        total = self._total_bytes(conn)
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
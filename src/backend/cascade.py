@@ -0,0 +1,112 @@
+"""
+Cascade inference: a cheap low-resolution screen before the full pass.
+
+Most scans in a study contain no lesion. In cascade mode the detector first
+runs every image at SCREEN_SIZE; images whose best candidate stays below
+the suspicion threshold keep that result, and only the rest are run again
+at full resolution. With tiling on, images large enough to be tiled skip
+the screen and go straight to the tiled pass: a whole-image pass at
+SCREEN_SIZE would miss exactly the small lesions tiling is there for. Both
+the screen size and the threshold are detector settings (--screen-size,
+--suspicion).
+
+The screen can miss a lesion the full pass would find, so evaluate() runs a
+folder both ways and reports the time saved together with how many
+detections changed, before the cascade is used on real work.
+"""
+import json
+import time
+
+SCREEN_SIZE = 320
+# A screening candidate scoring at least this escalates the image to the full pass
+SUSPICION_THRESHOLD = 0.15
+
+def _run(detector, paths, conf_threshold, chunk_size):
+    results = []
+    t0 = time.perf_counter()
+    for start in range(0, len(paths), chunk_size):
+        chunk = detector.detect_batch_candidates(paths[start:start + chunk_size])
+        results.extend(candidates.filter(conf_threshold) for candidates in chunk)
+    return results, time.perf_counter() - t0
+
+def evaluate(image_dir, conf_threshold=0.25, screen_size=SCREEN_SIZE, suspicion=SUSPICION_THRESHOLD, limit=None,
+             chunk_size=8, engine=None, tile_size=None):
+    """Runs single-pass and cascade detection (cache off) over image_dir and compares time and detections."""
+    from .batch import collect_images
+    from .detector import BrainTumorDetector
+    from .export import match_detections
+
+    paths = collect_images(image_dir)[:limit]
+    if not paths:
+        print(f"No images found in {image_dir}")
+        return None
+    detector = BrainTumorDetector(use_cache=False, engine=engine, tile_size=tile_size)
+    if detector.model is None:
+        print("Model not loaded.")
+        return None
+    if detector.model.fixed_shape:
+        print(f"The {detector.model.name} engine has a fixed input shape; cascade mode needs the eager engine.")
+        return None
+    detector.warmup()
+
+    single, single_s = _run(detector, paths, conf_threshold, chunk_size)
+    detector.cascade, detector.screen_size, detector.suspicion = True, screen_size, suspicion
+    cascaded, cascade_s = _run(detector, paths, conf_threshold, chunk_size)
+
+    # A detection changed when it has no same-class IoU match on the other side
+    lost = added = changed_images = 0
+    for ref, cand in zip(single, cascaded):
+        matched = match_detections(ref, cand)[0]
+        lost += len(ref) - matched
+        added += len(cand) - matched
+        changed_images += bool(len(ref) - matched or len(cand) - matched)
+
+    stats = detector.cascade_stats
+    report = {
+        'images': len(paths),
+        'conf_threshold': conf_threshold,
+        'screen_size': screen_size,
+        'suspicion': suspicion,
+        'screened': stats['screened'],
+        'escalated': stats['escalated'],
+        'tiled_unscreened': stats['tiled'],
+        'single_pass_s': round(single_s, 3),
+        'cascade_s': round(cascade_s, 3),
+        'saved_s': round(single_s - cascade_s, 3),
+        'detections_single_pass': sum(len(r) for r in single),
+        'detections_lost': lost,
+        'detections_added': added,
+        'images_changed': changed_images,
+    }
+    print(f"Escalated {stats['escalated']}/{stats['screened']} images to the full pass "
+          f"(screen {screen_size}px, suspicion {suspicion}).")
+    if stats['tiled']:
+        print(f"{stats['tiled']} images larger than the tile size were tiled without screening; "
+              f"the cascade saves no time on them.")
+    print(f"Single pass: {single_s:.2f}s, cascade: {cascade_s:.2f}s, saved {single_s - cascade_s:.2f}s "
+          f"({100 * (1 - cascade_s / single_s) if single_s else 0:.0f}%).")
+    print(f"Detections at conf {conf_threshold}: {report['detections_single_pass']} single pass, "
+          f"{lost} lost and {added} added by the cascade, on {changed_images} images.")
+    return report
+
+def add_arguments(parser):
+    parser.add_argument('image_dir', help="folder with MRI images to evaluate on")
+    parser.add_argument('--conf', type=float, default=0.25, help="confidence threshold for comparing detections")
+    parser.add_argument('--screen-size', type=int, default=SCREEN_SIZE, help="input size of the screening pass")
+    parser.add_argument('--suspicion', type=float, default=SUSPICION_THRESHOLD,
+                        help="screening score that escalates an image to the full pass")
+    parser.add_argument('--limit', type=int, default=None, help="maximum number of images")
+    parser.add_argument('--engine', default=None, help="inference engine: eager or torchscript (default: $BRAIN_MET_ENGINE or eager)")
+    parser.add_argument('--tile-size', type=int, default=None, help="tiled full pass for images larger than this (default: off)")
+    parser.add_argument('--out', default=None, help="also write the comparison as JSON to this file")
+
+def main(args):
+    report = evaluate(args.image_dir, args.conf, args.screen_size, args.suspicion, args.limit, engine=args.engine,
+                      tile_size=args.tile_size)
+    if report is None:
+        return 1
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Comparison written to {args.out}")
+    return 0
@@ -0,0 +1,137 @@
+"""
+Thin client for the local inference server.
+
+RemoteDetector has the parts of the BrainTumorDetector interface the UI
+uses (load_default_model, warmup, detect_candidates, detect_batch_candidates,
+detect and detect_batch), so MainWindow and the InferenceService run
+unchanged against a shared server instead of a model of their own.
+Select it with BRAIN_MET_SERVER, e.g. http://127.0.0.1:8765.
+"""
+import http.client
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .image import SharedImage
+from .lazy import lazy_import
+from .postprocess import CONF_FLOOR
+from .results import Detections
+
+cv2 = lazy_import('cv2')
+
+DEFAULT_SERVER = os.environ.get('BRAIN_MET_SERVER')
+# Requests in flight at once, so the server can batch them
+CLIENT_CONCURRENCY = 8
+# Attempts when the server answers 503 (queue full)
+MAX_RETRIES = 5
+TIMEOUT = 120
+
+class RemoteModel:
+    """Stands in for an InferenceEngine: what the server reported in /health."""
+
+    def __init__(self, info):
+        self.name = info.get('engine')
+        self.names = info.get('names', [])
+
+class RemoteDetector:
+    def __init__(self, url=DEFAULT_SERVER, timeout=TIMEOUT):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.model = None # RemoteModel once the server answered
+        self._local = threading.local()
+
+    def load_default_model(self):
+        try:
+            status, body, _ = self._request('GET', '/health')
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Inference server {self.url} unreachable: {e}")
+            return
+        info = json.loads(body)
+        if status == 200:
+            self.model = RemoteModel(info)
+            print(f"Connected to inference server {self.url} (engine: {self.model.name})")
+        else:
+            print(f"Inference server {self.url} has no model loaded.")
+
+    def warmup(self):
+        # The server warmed its model up when it started
+        pass
+
+    def detect(self, image_path, conf_threshold=0.25):
+        return self.detect_candidates(image_path, min(CONF_FLOOR, conf_threshold)).filter(conf_threshold).to_list()
+
+    def detect_candidates(self, image_path, floor=CONF_FLOOR):
+        return self.detect_batch_candidates([image_path], floor)[0]
+
+    def detect_batch(self, paths_or_arrays, conf_threshold=0.25, **kwargs):
+        outputs = self.detect_batch_candidates(paths_or_arrays, min(CONF_FLOOR, conf_threshold))
+        return [candidates.filter(conf_threshold).to_list() for candidates in outputs]
+
+    def detect_batch_candidates(self, paths_or_arrays, floor=CONF_FLOOR, **kwargs):
+        if len(paths_or_arrays) == 1:
+            return [self._detect_one(paths_or_arrays[0], floor)]
+        # Concurrent requests: the server groups them into micro-batches
+        with ThreadPoolExecutor(min(CLIENT_CONCURRENCY, len(paths_or_arrays))) as pool:
+            return list(pool.map(lambda src: self._detect_one(src, floor), paths_or_arrays))
+
+    def _detect_one(self, src, floor):
+        data = _encode(src)
+        if data is None:
+            return Detections.failed("cannot read image")
+        for attempt in range(MAX_RETRIES):
+            try:
+                status, body, headers = self._request('POST', f'/detect?floor={floor}', data)
+            except (OSError, http.client.HTTPException) as e:
+                print(f"Inference server error: {e}")
+                return Detections.failed(f"inference server error: {e}")
+            if status == 200:
+                return Detections.from_dict(json.loads(body)['candidates'])
+            if status == 503 and attempt + 1 < MAX_RETRIES:
+                # Backpressure: wait as long as the server asks before trying again
+                time.sleep(float(headers.get('retry-after', 1)))
+                continue
+            print(f"Inference server returned {status}: {body[:200]!r}")
+            return Detections.failed(f"inference server returned {status}")
+        return Detections.failed("inference server busy")
+
+    def _request(self, method, path, body=None):
+        # One keep-alive connection per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {'Content-Type': 'application/octet-stream'} if body is not None else {}
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Stale keep-alive connection: reconnect once
+            conn.close()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                # Left closed, so the next request starts on a fresh connection
+                conn.close()
+                raise
+        payload = response.read()
+        return response.status, payload, {k.lower(): v for k, v in response.getheaders()}
+
+def _encode(src):
+    """Encoded image bytes for a path, SharedImage or BGR array."""
+    path = src if isinstance(src, str) else getattr(src, 'path', None)
+    if path is not None:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            if isinstance(src, str):
+                return None
+    pixels = src.pixels if isinstance(src, SharedImage) else src
+    ok, buf = cv2.imencode('.png', pixels)
+    return buf.tobytes() if ok else None
@@ -0,0 +1,152 @@
+"""
+Self-contained compiled model artifact.
+
+`main.py compile` traces the YOLOv7 network once, without its grid decode,
+and writes it next to best.pt as two files:
+
+    best.compiled.pt     the frozen TorchScript graph (the payload)
+    best.compiled.json   the stamped header
+
+The header carries the class names, strides and anchors the decode needs,
+the sha256, size and mtime of the payload (the stamp) and the same for the
+best.pt it was compiled from. While the payload's size and mtime match, the
+stamp is trusted and torch.jit.load reads the file once, by path; only a
+changed payload is hashed (from a memory map) before loading. Neither the
+YOLOv7 source tree nor its dependencies are imported.
+
+The grid decode runs outside the graph (HeadDecoder), so unlike the
+`torchscript` engine the artifact accepts any stride-aligned input shape
+and gives the same detections as the eager model.
+"""
+import hashlib
+import json
+import mmap
+import os
+import time
+
+from .cache import remember_fingerprint, weights_fingerprint
+from .lazy import lazy_import
+
+torch = lazy_import('torch')
+
+FORMAT = 2
+
+class ArtifactError(Exception):
+    """The artifact is unreadable, corrupted or stale; the caller falls back to the torch.hub path."""
+
+class HeadDecoder:
+    """
+    Wraps the compiled graph, which returns the raw (B, na, ny, nx, no) outputs of each
+    detection head, and decodes them to (B, N, no) predictions like YOLOv7's Detect layer.
+    """
+    def __init__(self, module, anchor_grid, strides):
+        self.module = module
+        # (nl, 1, na, 1, 1, 2) anchor sizes in pixels
+        self.anchor_grid = anchor_grid
+        self.strides = [float(s) for s in strides]
+        self._grids = {}
+
+    def _grid(self, ny, nx, device):
+        key = (ny, nx, str(device))
+        grid = self._grids.get(key)
+        if grid is None:
+            yv, xv = torch.meshgrid(torch.arange(ny, device=device), torch.arange(nx, device=device), indexing='ij')
+            grid = torch.stack((xv, yv), 2).view(1, 1, ny, nx, 2).float()
+            self._grids[key] = grid
+        return grid
+
+    def __call__(self, x):
+        z = []
+        for head, anchors, stride in zip(self.module(x), self.anchor_grid, self.strides):
+            bs, _, ny, nx, no = head.shape
+            y = head.float().sigmoid()
+            xy = (y[..., 0:2] * 2. - 0.5 + self._grid(ny, nx, y.device)) * stride
+            wh = (y[..., 2:4] * 2) ** 2 * anchors
+            z.append(torch.cat((xy, wh, y[..., 4:]), -1).view(bs, -1, no))
+        return torch.cat(z, 1)
+
+def header_path(path):
+    """The stamped header that goes with a payload file."""
+    return f"{os.path.splitext(path)[0]}.json"
+
+def _sha256_mapped(path):
+    """sha256 of a file hashed straight from a memory map. Returns (digest, size)."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return hashlib.sha256(mm).hexdigest(), len(mm)
+
+def write_artifact(path, module, meta, weights_path):
+    """Saves a scripted module and its stamped header. Returns the header written."""
+    # Written aside and renamed, so a running detector never loads a half-written file. The
+    # header goes last: until it is replaced, the old header's stamp rejects the new payload
+    tmp_path = f"{path}.tmp"
+    torch.jit.save(module, tmp_path)
+    digest, size = _sha256_mapped(tmp_path)
+    os.replace(tmp_path, path)
+
+    st = os.stat(weights_path)
+    header = dict(meta, **{
+        'format': FORMAT,
+        'torch': torch.__version__,
+        'created': time.time(),
+        'payload_size': size,
+        'payload_mtime_ns': os.stat(path).st_mtime_ns,
+        'payload_sha256': digest,
+        'weights_sha256': weights_fingerprint(weights_path),
+        'weights_size': st.st_size,
+        'weights_mtime_ns': st.st_mtime_ns,
+    })
+    tmp_header = f"{header_path(path)}.tmp"
+    with open(tmp_header, 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    os.replace(tmp_header, header_path(path))
+    return header
+
+def read_artifact(path):
+    """Reads the header and checks the payload against its stamp. Returns the header; raises ArtifactError."""
+    try:
+        with open(header_path(path), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('format') != FORMAT:
+            raise ArtifactError(f"format {header.get('format')}, expected {FORMAT}")
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) == (header['payload_size'], header.get('payload_mtime_ns')):
+            # Unchanged file: trust the stamp instead of reading the payload twice on every start
+            return header
+        digest, size = _sha256_mapped(path)
+        if size != header['payload_size'] or digest != header['payload_sha256']:
+            raise ArtifactError("payload does not match its stamp")
+        return header
+    except (OSError, ValueError, KeyError) as e:
+        raise ArtifactError(str(e)) from e
+
+def check_weights(header, weights_path):
+    """Raises ArtifactError if best.pt changed since the artifact was compiled."""
+    if not os.path.exists(weights_path):
+        # Self-contained: the artifact still runs without the weights file
+        return
+    st = os.stat(weights_path)
+    if (st.st_size, st.st_mtime_ns) == (header.get('weights_size'), header.get('weights_mtime_ns')):
+        # Unchanged file: trust the stamp instead of hashing best.pt on every start
+        remember_fingerprint(weights_path, header['weights_sha256'])
+    elif weights_fingerprint(weights_path) != header.get('weights_sha256'):
+        raise ArtifactError("compiled from different weights")
+
+def check_torch(header):
+    """A graph saved by a newer torch may use operators this one lacks."""
+    saved = tuple(int(p) for p in header['torch'].split('+')[0].split('.')[:2])
+    running = tuple(int(p) for p in torch.__version__.split('+')[0].split('.')[:2])
+    if saved > running:
+        raise ArtifactError(f"compiled with torch {header['torch']}, running {torch.__version__}")
+
+def load_artifact(path, weights_path, device):
+    """Returns (HeadDecoder, header) ready to run on `device`; raises ArtifactError."""
+    header = read_artifact(path)
+    check_weights(header, weights_path)
+    check_torch(header)
+    try:
+        # By path: torch reads the file itself instead of taking a copy of it as bytes
+        module = torch.jit.load(path, map_location=device)
+    except RuntimeError as e:
+        raise ArtifactError(f"cannot deserialize the graph: {e}") from e
+    anchor_grid = torch.tensor(header['anchor_grid'], dtype=torch.float32, device=device)
+    return HeadDecoder(module, anchor_grid, header['strides']), header
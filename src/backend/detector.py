@@ -1,93 +1,508 @@
-import torch
-import cv2
-import numpy as np
+import json
 import os
 import sys
-from PyQt5.QtCore import QThread, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor
 
-class DetectionWorker(QThread):
-    result_ready = pyqtSignal(list, object) # detections, debug_image (optional)
+from . import metrics
+from .cascade import SCREEN_SIZE, SUSPICION_THRESHOLD
+from .cache import DetectionCache, hash_array, hash_bytes, make_key, weights_fingerprint
+from .compiled import ArtifactError, load_artifact
+from .image import SharedImage
+from .lazy import lazy_import
+from .postprocess import CONF_FLOOR, IOU_THRESHOLD
+from .results import Detections
+from .tiling import DEFAULT_OVERLAP, merge_tiles, tile_grid
 
-    def __init__(self, detector, image_path, conf_threshold):
-        super().__init__()
-        self.detector = detector
-        self.image_path = image_path
-        self.conf_threshold = conf_threshold
+torch = lazy_import('torch')
+torchvision = lazy_import('torchvision')
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
 
-    def run(self):
-        try:
-            detections = self.detector.detect(self.image_path, self.conf_threshold)
-            self.result_ready.emit(detections, None)
-        except Exception as e:
-            print(f"Error in detection thread: {e}")
-            self.result_ready.emit([], None)
+# Bump when the cached value layout changes
+CACHE_FORMAT = 2
 
-class BrainTumorDetector:
-    def __init__(self):
-        self.model = None
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.load_default_model()
+# Model input size and stride (same defaults as the YOLOv7 autoShape wrapper)
+INPUT_SIZE = 640
+STRIDE = 32
+# Upper bound on pixels per forward pass (16 images of 640x640)
+MAX_BATCH_PIXELS = 16 * INPUT_SIZE * INPUT_SIZE
+# Same limits as YOLOv7 non_max_suppression
+MAX_DET = 300
+MAX_WH = 4096
 
-    def load_default_model(self):
-        # Paths relative to src/
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        src_dir = os.path.dirname(current_dir)
-        
-        yolo_path = os.path.join(src_dir, 'yolov7-main')
-        weights_path = os.path.join(src_dir, 'weight', 'best.pt')
+# Paths relative to src/
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YOLO_PATH = os.path.join(SRC_DIR, 'yolov7-main')
+WEIGHTS_PATH = os.path.join(SRC_DIR, 'weight', 'best.pt')
+
+# Inference engine, overridable per detector or with the environment variable
+DEFAULT_ENGINE = os.environ.get('BRAIN_MET_ENGINE', 'eager')
+# The eager engine loads the compiled artifact when present; BRAIN_MET_COMPILED=0 always uses torch.hub
+USE_COMPILED = os.environ.get('BRAIN_MET_COMPILED', '1') != '0'
+
+def letterbox_shape(shape, size=INPUT_SIZE, stride=STRIDE):
+    """Inference shape (h, w) the model letterboxes an image of `shape` (h, w) to."""
+    g = size / max(shape)
+    return tuple(int(np.ceil(x * g / stride) * stride) for x in shape)
+
+def letterbox(img, new_shape, color=(114, 114, 114)):
+    """Resize keeping aspect ratio and pad to new_shape (h, w). Returns image, gain, (pad_w, pad_h)."""
+    h0, w0 = img.shape[:2]
+    r = min(new_shape[0] / h0, new_shape[1] / w0)
+    new_unpad = int(round(w0 * r)), int(round(h0 * r))
+    dw, dh = (new_shape[1] - new_unpad[0]) / 2, (new_shape[0] - new_unpad[1]) / 2
+
+    if (w0, h0) != new_unpad:
+        img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, r, (dw, dh)
 
-        print(f"DEBUG: YOLO Path: {yolo_path}")
-        print(f"DEBUG: Weights Path: {weights_path}")
+def preprocess(imgs, shape):
+    """Letterboxes a list of HWC uint8 images to one shape. Returns a (B, 3, H, W) float tensor and per-image (gain, pad)."""
+    boxed, meta = [], []
+    for img in imgs:
+        img, gain, pad = letterbox(img, shape)
+        boxed.append(img)
+        meta.append((gain, pad))
+    x = np.ascontiguousarray(np.stack(boxed, 0).transpose((0, 3, 1, 2)))
+    return torch.from_numpy(x).float() / 255.0, meta
+
+def non_max_suppression(pred, conf_threshold, iou_threshold=IOU_THRESHOLD, max_det=MAX_DET):
+    """
+    Decodes raw YOLO output (B, N, 5 + nc) of xywh, objectness, class scores.
+    Returns one (n, 6) tensor per image of x1, y1, x2, y2, conf, cls, like YOLOv7.
+    """
+    nc = pred.shape[2] - 5
+    output = []
+    for x in pred:
+        x = x[x[:, 4] > conf_threshold]
+        if nc == 1:
+            # Single-class models: objectness is the score (YOLOv7 does the same)
+            scores = x[:, 4:5]
+        else:
+            scores = x[:, 5:] * x[:, 4:5]
+        box = torch.cat((x[:, :2] - x[:, 2:4] / 2, x[:, :2] + x[:, 2:4] / 2), 1)
+        conf, j = scores.max(1, keepdim=True)
+        x = torch.cat((box, conf, j.float()), 1)[conf.view(-1) > conf_threshold]
+
+        # Class offsets keep boxes of different classes from suppressing each other
+        keep = torchvision.ops.nms(x[:, :4] + x[:, 5:6] * MAX_WH, x[:, 4], iou_threshold)
+        output.append(x[keep[:max_det]])
+    return output
+
+def scale_boxes(boxes, gain, pad, shape0):
+    """Maps xyxy boxes from letterboxed input back to the original image (h, w), in place."""
+    boxes[:, [0, 2]] -= pad[0]
+    boxes[:, [1, 3]] -= pad[1]
+    boxes[:, :4] /= gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clamp(0, shape0[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clamp(0, shape0[0])
+    return boxes
+
+def load_hub_model(device):
+    """Builds the YOLOv7 model from the local source tree and weights. Returns the autoShape wrapper or None."""
+    print(f"DEBUG: YOLO Path: {YOLO_PATH}")
+    print(f"DEBUG: Weights Path: {WEIGHTS_PATH}")
+    
+    if not os.path.exists(YOLO_PATH):
+        print("ERROR: yolov7-main not found!")
+        return None
         
-        if not os.path.exists(yolo_path):
-            print("ERROR: yolov7-main not found!")
-            return
-            
-        if not os.path.exists(weights_path):
-            print("ERROR: Weights not found!")
-            return
+    if not os.path.exists(WEIGHTS_PATH):
+        print("ERROR: Weights not found!")
+        return None
+
+    # Add yolov7 to path so internal imports work
+    if YOLO_PATH not in sys.path:
+        sys.path.append(YOLO_PATH)
+
+    print("Loading YOLOv7 model...")
+    model = torch.hub.load(YOLO_PATH, 'custom', path_or_model=WEIGHTS_PATH, source='local')
+    return model.to(device).eval()
 
+def engine_path(name):
+    """Location of an exported engine artifact, next to best.pt."""
+    return os.path.join(os.path.dirname(WEIGHTS_PATH), f"best.{name}.pt")
+
+COMPILED_PATH = engine_path('compiled')
+
+class InferenceEngine:
+    """
+    Runs the raw network on a preprocessed (B, 3, H, W) batch and returns raw predictions (B, N, 5 + nc).
+    Pre- and post-processing are shared by all engines, so their outputs are directly comparable.
+    """
+    name = None
+    # (h, w) the engine only accepts, or None if any stride-aligned shape works
+    fixed_shape = None
+    # bfloat16 autocast on CPU, set from the tuning profile
+    bf16 = False
+    # True when loaded from the compiled artifact instead of the YOLOv7 source tree
+    compiled = False
+
+    def __init__(self, module, names, stride, device, weights_path):
+        self.module = module
+        self.names = list(names.values()) if isinstance(names, dict) else list(names)
+        self.stride = int(stride)
+        self.device = device
+        # File whose hash identifies the weights, for the detection cache
+        self.weights_path = weights_path
+
+    def __call__(self, x):
+        x = x.to(self.device)
+        if self.device.type == 'cpu':
+            autocast = torch.autocast('cpu', dtype=torch.bfloat16, enabled=self.bf16)
+        else:
+            autocast = torch.cuda.amp.autocast()
+        with torch.no_grad(), autocast:
+            out = self.module(x)
+        # YOLOv7 returns (predictions, feature maps) in eval mode
+        return (out[0] if isinstance(out, (tuple, list)) else out).float()
+
+class EagerEngine(InferenceEngine):
+    name = 'eager'
+
+    @classmethod
+    def load(cls, device, compiled=None):
+        if USE_COMPILED if compiled is None else compiled:
+            engine = CompiledEngine.load(device)
+            if engine is not None:
+                return engine
+
+        hub_model = load_hub_model(device)
+        if hub_model is None:
+            return None
+        # Unwrap autoShape: pre/post-processing is done by the detector
+        return cls(hub_model.model, hub_model.names, hub_model.stride.max(), device, WEIGHTS_PATH)
+
+class CompiledEngine(EagerEngine):
+    """
+    The eager model loaded from the artifact written by `main.py compile`: same shapes and
+    detections, but read from one stamped file instead of building the model from the YOLOv7 source.
+    Shares the eager engine's name, so cached results and tuning profiles carry over.
+    """
+    compiled = True
+
+    @classmethod
+    def load(cls, device):
+        if not os.path.exists(COMPILED_PATH):
+            return None
         try:
-            # Add yolov7 to path so internal imports work
-            if yolo_path not in sys.path:
-                sys.path.append(yolo_path)
-
-            print("Loading YOLOv7 model...")
-            self.model = torch.hub.load(yolo_path, 'custom', path_or_model=weights_path, source='local')
-            self.model.to(self.device).eval()
-            print("Model loaded successfully!")
+            module, meta = load_artifact(COMPILED_PATH, WEIGHTS_PATH, device)
+        except ArtifactError as e:
+            print(f"Ignoring {COMPILED_PATH} ({e}), re-run `python src/main.py compile`.")
+            return None
+        weights_path = WEIGHTS_PATH if os.path.exists(WEIGHTS_PATH) else COMPILED_PATH
+        return cls(module, meta['names'], meta['stride'], device, weights_path)
+
+class TorchScriptEngine(InferenceEngine):
+    """Traced and frozen graph exported by `main.py export`; runs without the YOLOv7 source tree."""
+    name = 'torchscript'
+
+    @classmethod
+    def load(cls, device):
+        path = engine_path(cls.name)
+        if not os.path.exists(path):
+            print(f"ERROR: {path} not found, run `python src/main.py export` first.")
+            return None
+
+        extra_files = {'meta.json': ''}
+        module = torch.jit.load(path, map_location=device, _extra_files=extra_files)
+        meta = json.loads(extra_files['meta.json'])
+
+        # The export is stale if best.pt changed since it was traced
+        if os.path.exists(WEIGHTS_PATH) and meta.get('weights_sha256') != weights_fingerprint(WEIGHTS_PATH):
+            print(f"ERROR: {path} was exported from different weights, re-run the export.")
+            return None
+
+        if device.type == 'cpu':
+            try:
+                module = torch.jit.optimize_for_inference(module)
+            except Exception as e:
+                print(f"optimize_for_inference skipped: {e}")
+
+        engine = cls(module, meta['names'], meta['stride'], device, path)
+        engine.fixed_shape = tuple(meta['shape'])
+        return engine
+
+ENGINES = {
+    EagerEngine.name: EagerEngine,
+    TorchScriptEngine.name: TorchScriptEngine,
+}
+
+class BrainTumorDetector:
+    def __init__(self, use_cache=True, load=True, engine=None, tile_size=None, tile_overlap=DEFAULT_OVERLAP, tile_workers=1,
+                 tune_threads=True, cascade=False, screen_size=SCREEN_SIZE, suspicion=SUSPICION_THRESHOLD):
+        self.model = None # InferenceEngine once loaded
+        # Inference settings; a saved tuning profile may change them when the model loads
+        self.input_size = INPUT_SIZE
+        self.max_batch_size = 16
+        # False when the caller manages torch threads itself (e.g. batch worker processes)
+        self.tune_threads = tune_threads
+        # Tiled mode: images larger than tile_size are split into overlapping tiles (None disables it)
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        # Threads running tile batches concurrently on CPU
+        self.tile_workers = tile_workers
+        # Cascade mode: a cheap pass at screen_size first; only images with a candidate scoring at least
+        # `suspicion` are run again at full resolution. Images large enough to be tiled are never screened
+        self.cascade = cascade
+        self.screen_size = screen_size
+        self.suspicion = suspicion
+        self.cascade_stats = {'screened': 0, 'escalated': 0, 'tiled': 0} # tiled: skipped the screen
+        self.engine_name = engine or DEFAULT_ENGINE
+        if self.engine_name not in ENGINES:
+            raise ValueError(f"Unknown engine '{self.engine_name}', expected one of {sorted(ENGINES)}")
+        self._device = None # chosen on first use, so creating a detector does not import torch
+        self.cache = None
+        if use_cache:
+            try:
+                self.cache = DetectionCache()
+            except Exception as e:
+                print(f"Detection cache disabled: {e}")
+        # load=False leaves loading to the caller, e.g. a service.ModelLoader thread
+        if load:
+            self.load_default_model()
+
+    @property
+    def device(self):
+        if self._device is None:
+            self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return self._device
+
+    def load_default_model(self):
+        try:
+            with metrics.span('model_load'):
+                self.model = ENGINES[self.engine_name].load(self.device)
+                if self.model is None and self.engine_name != EagerEngine.name:
+                    print("Falling back to the eager engine.")
+                    self.model = EagerEngine.load(self.device)
+            if self.model is not None:
+                compiled = ", compiled" if self.model.compiled else ""
+                print(f"Model loaded successfully! (engine: {self.model.name}{compiled})")
+                from .tuning import apply_saved_profile
+                apply_saved_profile(self)
         except Exception as e:
             print(f"Failed to load model: {e}")
 
+    def warmup(self):
+        """One dummy forward pass so lazy allocations happen before the first real request."""
+        if self.model is None:
+            return
+        shape = self.model.fixed_shape or (self.input_size, self.input_size)
+        self._infer([np.zeros((shape[0], shape[1], 3), dtype=np.uint8)], shape, CONF_FLOOR)
+
     def detect(self, image_path, conf_threshold=0.25):
+        candidates = self.detect_candidates(image_path, min(CONF_FLOOR, conf_threshold))
+        return candidates.filter(conf_threshold).to_list()
+
+    def detect_candidates(self, image_path, floor=CONF_FLOOR):
+        """
+        Runs the model once at the floor threshold and returns every candidate.
+        Returns a Detections; use .filter() to apply any higher threshold without another forward pass.
+        """
+        return self.detect_batch_candidates([image_path], floor)[0]
+
+    def detect_batch(self, paths_or_arrays, conf_threshold=0.25, max_batch_size=None, max_batch_pixels=MAX_BATCH_PIXELS):
+        """
+        Runs detection over many images with one forward pass per batch.
+        paths_or_arrays: list of image paths, BGR numpy arrays (as returned by cv2.imread) or SharedImages
+        Returns one list of detections per input, in input order. Images that failed give [] here;
+        use detect_batch_candidates to tell them apart from negatives.
+        """
+        outputs = self.detect_batch_candidates(paths_or_arrays, min(CONF_FLOOR, conf_threshold),
+                                               max_batch_size, max_batch_pixels)
+        return [candidates.filter(conf_threshold).to_list() for candidates in outputs]
+
+    def detect_batch_candidates(self, paths_or_arrays, floor=CONF_FLOOR, max_batch_size=None, max_batch_pixels=MAX_BATCH_PIXELS,
+                                hashes=None):
+        """
+        Candidates at `floor` for each input, in input order. Images that could not be read, decoded or run
+        give Detections.failed(reason). hashes: optional dict filled with {index: content hash}.
+        """
         if self.model is None:
             print("Model not loaded.")
-            return []
-
-        # Load and resize image
-        img0 = cv2.imread(image_path)
-        if img0 is None:
-            return []
-            
-        # Inference
+            return [Detections.failed("model not loaded") for _ in paths_or_arrays]
+        outputs = [None] * len(paths_or_arrays)
+        max_batch_size = max_batch_size or self.max_batch_size
+
+        # Decode cache misses
+        decoded = []
+        keys = {}
+        for i, src in enumerate(paths_or_arrays):
+            image_hash, data = self._read_source(src)
+            if data is None:
+                outputs[i] = Detections.failed("cannot read image")
+                continue
+            if hashes is not None:
+                hashes[i] = image_hash
+            keys[i] = self._cache_key(image_hash, floor)
+            cached = self._cache_get(keys[i])
+            if cached is not None:
+                outputs[i] = cached
+                continue
+            img0 = self._decode(data)
+            if img0 is None:
+                outputs[i] = Detections.failed("cannot decode image")
+                continue
+            decoded.append((i, img0))
+
+        if self.cascade and not self.model.fixed_shape:
+            # Images that will be tiled skip the screen: their small lesions are what a whole-image
+            # pass at screen_size would miss
+            tiled = [(i, img0) for i, img0 in decoded if self._tiled(img0)]
+            candidates = [(i, img0) for i, img0 in decoded if not self._tiled(img0)]
+            # Images the screening pass clears keep its result; only the suspicious ones go on
+            screened = self._run_buckets(candidates, self.screen_size, floor, max_batch_size, max_batch_pixels)
+            escalate = []
+            for i, img0 in candidates:
+                result = screened[i]
+                if result.error is None and result.max_conf < self.suspicion:
+                    outputs[i] = result
+                    self._cache_put(keys[i], result)
+                else:
+                    escalate.append((i, img0))
+            self.cascade_stats['screened'] += len(candidates)
+            self.cascade_stats['escalated'] += len(escalate)
+            self.cascade_stats['tiled'] += len(tiled)
+            decoded = tiled + escalate
+
+        direct = []
+        for i, img0 in decoded:
+            if self._tiled(img0):
+                try:
+                    outputs[i] = self._infer_tiled(img0, floor, max_batch_size)
+                    self._cache_put(keys[i], outputs[i])
+                except Exception as e:
+                    print(f"Inference Error: {e}")
+                    outputs[i] = Detections.failed(f"inference error: {e}", self.model.names)
+            else:
+                direct.append((i, img0))
+
+        for i, detections in self._run_buckets(direct, self.input_size, floor, max_batch_size, max_batch_pixels).items():
+            outputs[i] = detections
+            if detections.error is None:
+                self._cache_put(keys[i], detections)
+        return outputs
+
+    def _tiled(self, img0):
+        return bool(self.tile_size) and max(img0.shape[:2]) > self.tile_size
+
+    def _run_buckets(self, items, size, floor, max_batch_size, max_batch_pixels):
+        """Runs (index, image) pairs at input `size`, grouped by letterbox shape so a batch needs no extra padding.
+        Returns {index: Detections}; images whose batch failed get Detections.failed."""
+        buckets = {}
+        for i, img0 in items:
+            shape = self.model.fixed_shape or letterbox_shape(img0.shape[:2], size, self.model.stride)
+            buckets.setdefault(shape, []).append((i, img0))
+
+        results = {}
+        for (h, w), bucket in buckets.items():
+            # Dynamic batch size: large inputs get smaller batches
+            batch_size = max(1, min(max_batch_size, max_batch_pixels // (h * w)))
+            for start in range(0, len(bucket), batch_size):
+                chunk = bucket[start:start + batch_size]
+                try:
+                    preds = self._infer([img for _, img in chunk], (h, w), floor)
+
+                    # One (n, 6) tensor per image of x1, y1, x2, y2, conf, cls
+                    for (i, _), pred in zip(chunk, preds):
+                        results[i] = Detections.from_tensor(pred, self.model.names)
+                except Exception as e:
+                    print(f"Inference Error: {e}")
+                    for i, _ in chunk:
+                        results[i] = Detections.failed(f"inference error: {e}", self.model.names)
+        return results
+
+    def _infer(self, imgs, shape, floor):
+        """Letterbox to `shape`, one forward pass, NMS at `floor` and boxes scaled back to each image."""
+        with metrics.span('preprocess'):
+            x, meta = preprocess(imgs, shape)
+        with metrics.span('forward'):
+            raw = self.model(x)
+        with metrics.span('postprocess'):
+            preds = non_max_suppression(raw, floor)
+            for pred, img, (gain, pad) in zip(preds, imgs, meta):
+                scale_boxes(pred, gain, pad, img.shape[:2])
+        return preds
+
+    def _infer_tiled(self, img0, floor, max_batch_size=None):
+        """Detections over overlapping tiles, mapped back to img0 coordinates and merged across tile borders."""
+        tiles = tile_grid(img0.shape, self.tile_size, self.tile_overlap)
+        crops = [img0[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+        # All tiles have the same size, so they share one letterbox shape
+        h, w = self.model.fixed_shape or letterbox_shape(crops[0].shape[:2], self.input_size, self.model.stride)
+        batch_size = max(1, min(max_batch_size or self.max_batch_size, MAX_BATCH_PIXELS // (h * w)))
+        chunks = [crops[k:k + batch_size] for k in range(0, len(crops), batch_size)]
+
+        def run(chunk):
+            return self._infer(chunk, (h, w), floor)
+
+        if self.device.type == 'cpu' and self.tile_workers > 1:
+            with ThreadPoolExecutor(self.tile_workers) as pool:
+                results = list(pool.map(run, chunks))
+        else:
+            results = [run(chunk) for chunk in chunks]
+
+        per_tile = [Detections.from_tensor(pred, self.model.names) for preds in results for pred in preds]
+        return merge_tiles(per_tile, tiles, self.model.names)
+
+    @staticmethod
+    def _read_source(src):
+        """Returns (content hash, raw file bytes or array) for an image path, BGR array or SharedImage."""
+        if isinstance(src, SharedImage):
+            # Already decoded: reuse the shared buffer and the hash of its file
+            return src.content_hash, src.pixels
+        if isinstance(src, np.ndarray):
+            return hash_array(src), src
         try:
-            self.model.conf = conf_threshold
-            results = self.model(img0)
-            
-            # Extract DataFrame format
-            # columns: xmin, ymin, xmax, ymax, confidence, class, name
-            df = results.pandas().xyxy[0]
-            
-            detections = []
-            for _, row in df.iterrows():
-                detections.append({
-                    'label': row['name'],
-                    'conf': float(row['confidence']),
-                    'bbox': [int(row['xmin']), int(row['ymin']), int(row['xmax']), int(row['ymax'])]
-                })
-            
-            return detections
+            with open(src, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None, None
+        return hash_bytes(data), data
 
+    @staticmethod
+    def _decode(data):
+        if isinstance(data, np.ndarray):
+            return data
+        with metrics.span('decode'):
+            return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    def _cache_key(self, image_hash, floor):
+        if self.cache is None or self.model is None:
+            return None
+        try:
+            weights_hash = weights_fingerprint(self.model.weights_path)
+        except OSError:
+            return None
+        params = {'conf': floor, 'engine': self.model.name, 'format': CACHE_FORMAT}
+        if self.tile_size:
+            params['tile'] = [self.tile_size, self.tile_overlap]
+        # Settings that change the output; batch size and threads do not
+        if self.input_size != INPUT_SIZE and not self.model.fixed_shape:
+            params['size'] = self.input_size
+        if self.model.bf16:
+            params['bf16'] = True
+        if self.cascade and not self.model.fixed_shape:
+            params['cascade'] = [self.screen_size, self.suspicion]
+        return make_key(image_hash, weights_hash, params)
+
+    def _cache_get(self, key):
+        if key is None:
+            return None
+        try:
+            cached = self.cache.get(key)
+            return Detections.from_dict(cached) if cached is not None else None
+        except Exception as e:
+            print(f"Cache read error: {e}")
+            return None
+
+    def _cache_put(self, key, detections):
+        if key is None:
+            return
+        try:
+            self.cache.put(key, detections.to_dict())
         except Exception as e:
-            print(f"Inference Error: {e}")
-            return []
+            print(f"Cache write error: {e}")
@@ -0,0 +1,264 @@
+"""
+Engine export and accuracy-versus-latency comparison.
+
+`export` traces the YOLOv7 network once into a frozen TorchScript artifact
+next to best.pt, so the detector can run it
+without the YOLOv7 source tree. `compare-engines` runs every available
+engine over a folder of images and reports latency and agreement with the
+eager model, recommending the fastest engine within a tolerance.
+
+`compile` writes the self-contained artifact the eager engine loads
+instead of building the model through torch.hub (see compiled.py), checks
+it against the eager model and can time cold starts of both load paths.
+"""
+import json
+import multiprocessing as mp
+import os
+import time
+import warnings
+
+from .batch import collect_images
+from .cache import weights_fingerprint
+from .compiled import HeadDecoder, write_artifact
+from .detector import (COMPILED_PATH, ENGINES, INPUT_SIZE, WEIGHTS_PATH, BrainTumorDetector, EagerEngine,
+                       TorchScriptEngine, engine_path, load_hub_model)
+from .lazy import lazy_import
+from .postprocess import box_iou
+
+np = lazy_import('numpy')
+torch = lazy_import('torch')
+
+EXPORTABLE = (TorchScriptEngine.name,)
+REPORT_PATH = os.path.join(os.path.dirname(WEIGHTS_PATH), 'engine_report.json')
+# (batch, h, w) the compiled artifact is checked on; none is the traced shape
+CHECK_SHAPES = ((1, 512, 640), (2, 640, 384))
+
+def export_engine(name, size=INPUT_SIZE):
+    device = torch.device('cpu')
+    hub_model = load_hub_model(device)
+    if hub_model is None:
+        return None
+
+    module = hub_model.model
+
+    # Traced graphs bake in the Detect grid, so the artifact only accepts this input shape
+    example = torch.zeros(1, 3, size, size)
+    with torch.no_grad():
+        traced = torch.jit.trace(module, example, strict=False)
+    traced = torch.jit.freeze(traced.eval())
+
+    names = hub_model.names
+    meta = {
+        'engine': name,
+        'names': list(names.values()) if isinstance(names, dict) else list(names),
+        'stride': int(hub_model.stride.max()),
+        'shape': [size, size],
+        'weights_sha256': weights_fingerprint(WEIGHTS_PATH),
+        'torch': torch.__version__,
+    }
+    path = engine_path(name)
+    torch.jit.save(traced, path, _extra_files={'meta.json': json.dumps(meta)})
+    print(f"Exported {name} engine to {path}")
+    return path
+
+def compile_model(size=INPUT_SIZE, path=COMPILED_PATH):
+    device = torch.device('cpu')
+    hub_model = load_hub_model(device)
+    if hub_model is None:
+        return None
+
+    module = hub_model.model
+    detect = module.model[-1]
+    if not hasattr(detect, 'anchor_grid'):
+        print(f"ERROR: cannot compile a model whose last layer is {type(detect).__name__}.")
+        return None
+
+    # In training mode the Detect layer returns the raw heads; the shape-dependent grid
+    # decode stays out of the graph, so the artifact is not tied to the traced shape
+    detect.training = True
+    try:
+        with torch.no_grad(), warnings.catch_warnings():
+            warnings.simplefilter('ignore', torch.jit.TracerWarning)
+            traced = torch.jit.trace(module, torch.zeros(1, 3, size, size), strict=False)
+    finally:
+        detect.training = False
+    traced = torch.jit.freeze(traced.eval())
+
+    anchor_grid = detect.anchor_grid.detach().float().cpu()
+    strides = detect.stride.tolist()
+    compiled = HeadDecoder(traced, anchor_grid, strides)
+    for batch, h, w in CHECK_SHAPES:
+        x = torch.rand(batch, 3, h, w)
+        with torch.no_grad():
+            expected, actual = module(x)[0].float(), compiled(x)
+        if expected.shape != actual.shape or not torch.allclose(expected, actual, rtol=1e-3, atol=1e-3):
+            print(f"ERROR: compiled model disagrees with the eager model at {h}x{w}, not writing {path}.")
+            return None
+
+    names = hub_model.names
+    meta = {
+        'names': list(names.values()) if isinstance(names, dict) else list(names),
+        'stride': int(hub_model.stride.max()),
+        'strides': strides,
+        'anchor_grid': anchor_grid.tolist(),
+    }
+    header = write_artifact(path, traced, meta, WEIGHTS_PATH)
+    print(f"Compiled model written to {path} ({header['payload_size'] / 1e6:.1f} MB, stamp {header['payload_sha256'][:12]})")
+    return path
+
+def _cold_load(compiled):
+    # Runs in a fresh process, so nothing is imported or cached yet
+    t0 = time.perf_counter()
+    torch.zeros(1)
+    t1 = time.perf_counter()
+    engine = EagerEngine.load(torch.device('cpu'), compiled=compiled)
+    t2 = time.perf_counter()
+    if engine is None or engine.compiled != compiled:
+        return None
+    return t1 - t0, t2 - t1
+
+def measure_cold_start(runs=3):
+    """
+    Times model loading through torch.hub and from the compiled artifact, each run in a new
+    process. The OS file cache stays warm between runs, as it does between application starts.
+    """
+    ctx = mp.get_context('spawn')
+    report = {}
+    for label, compiled in (('torch.hub', False), ('compiled', True)):
+        times = []
+        for _ in range(runs):
+            with ctx.Pool(1) as pool:
+                times.append(pool.map(_cold_load, [compiled])[0])
+        if None in times:
+            print(f"Skipping {label}: model not available.")
+            continue
+        load = np.array([t[1] for t in times])
+        report[label] = {
+            'import_torch_s': float(np.mean([t[0] for t in times])),
+            'load_mean_s': float(load.mean()),
+            'load_min_s': float(load.min()),
+        }
+
+    print(f"{'load path':<12} {'import torch s':>15} {'load mean s':>12} {'load min s':>11}")
+    for label, r in report.items():
+        print(f"{label:<12} {r['import_torch_s']:>15.3f} {r['load_mean_s']:>12.3f} {r['load_min_s']:>11.3f}")
+    if len(report) == 2:
+        speedup = report['torch.hub']['load_mean_s'] / report['compiled']['load_mean_s']
+        print(f"Compiled artifact loads {speedup:.1f}x faster than torch.hub.")
+    return report
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Greedy same-class IoU matching. Returns (matches, mean absolute confidence difference)."""
+    used = np.zeros(len(candidate), dtype=bool)
+    matches, conf_diffs = 0, []
+    for box, score, cls in zip(reference.boxes, reference.scores, reference.classes):
+        pool = np.flatnonzero(~used & (candidate.classes == cls))
+        if pool.size == 0:
+            continue
+        ious = box_iou(box, candidate.boxes[pool])
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold:
+            used[pool[best]] = True
+            matches += 1
+            conf_diffs.append(abs(float(score) - float(candidate.scores[pool[best]])))
+    return matches, float(np.mean(conf_diffs)) if conf_diffs else 0.0
+
+def run_engine(name, paths, conf_threshold):
+    detector = BrainTumorDetector(use_cache=False, engine=name)
+    if detector.model is None or detector.model.name != name:
+        return None, None
+    detector.warmup()
+
+    results, latencies = [], []
+    for path in paths:
+        t0 = time.perf_counter()
+        results.append(detector.detect_candidates(path).filter(conf_threshold))
+        latencies.append(time.perf_counter() - t0)
+    return results, np.array(latencies)
+
+def compare_engines(image_dir, conf_threshold=0.25, tolerance=0.98, limit=100):
+    paths = collect_images(image_dir)[:limit]
+    if not paths:
+        print(f"No images found in {image_dir}")
+        return None
+
+    reference = None
+    report = {'images': len(paths), 'conf_threshold': conf_threshold, 'tolerance': tolerance, 'engines': {}}
+    for name in ENGINES:
+        results, latencies = run_engine(name, paths, conf_threshold)
+        if results is None:
+            print(f"Skipping {name}: engine not available.")
+            continue
+        if name == EagerEngine.name:
+            reference = results
+        if reference is None:
+            print("Eager engine not available, cannot compare accuracy.")
+            return None
+
+        ref_total = sum(len(r) for r in reference)
+        cand_total = sum(len(r) for r in results)
+        matched, diffs = 0, []
+        for ref, cand in zip(reference, results):
+            m, d = match_detections(ref, cand)
+            matched += m
+            diffs.append(d)
+        recall = matched / ref_total if ref_total else 1.0
+        precision = matched / cand_total if cand_total else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+        report['engines'][name] = {
+            'mean_ms': float(latencies.mean() * 1000),
+            'p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'agreement_f1': f1,
+            'recall_vs_eager': recall,
+            'precision_vs_eager': precision,
+            'mean_conf_diff': float(np.mean(diffs)),
+        }
+
+    within = [n for n, r in report['engines'].items() if r['agreement_f1'] >= tolerance]
+    report['recommended'] = min(within, key=lambda n: report['engines'][n]['mean_ms']) if within else EagerEngine.name
+
+    print(f"{'engine':<12} {'mean ms':>9} {'p95 ms':>9} {'F1 vs eager':>12} {'conf diff':>10}")
+    for name, r in report['engines'].items():
+        print(f"{name:<12} {r['mean_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['agreement_f1']:>12.3f} {r['mean_conf_diff']:>10.4f}")
+    print(f"Recommended engine (F1 >= {tolerance}): {report['recommended']}")
+    print(f"Set BRAIN_MET_ENGINE={report['recommended']} or pass --engine to use it.")
+
+    with open(REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {REPORT_PATH}")
+    return report
+
+def add_export_arguments(parser):
+    parser.add_argument('--engine', choices=EXPORTABLE + ('all',), default='all', help="engine artifact to export")
+    parser.add_argument('--size', type=int, default=INPUT_SIZE, help="square input size baked into the trace")
+
+def export_main(args):
+    names = EXPORTABLE if args.engine == 'all' else (args.engine,)
+    ok = all(export_engine(name, args.size) for name in names)
+    return 0 if ok else 1
+
+def add_compare_arguments(parser):
+    parser.add_argument('image_dir', help="folder with MRI images to compare on")
+    parser.add_argument('--conf', type=float, default=0.25, help="confidence threshold")
+    parser.add_argument('--tolerance', type=float, default=0.98, help="minimum detection F1 agreement with eager")
+    parser.add_argument('--limit', type=int, default=100, help="maximum number of images")
+
+def compare_main(args):
+    report = compare_engines(args.image_dir, args.conf, args.tolerance, args.limit)
+    return 0 if report else 1
+
+def add_compile_arguments(parser):
+    parser.add_argument('--size', type=int, default=INPUT_SIZE, help="square input size used for tracing (any stride-aligned shape runs)")
+    parser.add_argument('--benchmark', type=int, default=0, metavar='RUNS',
+                        help="afterwards, time RUNS cold starts of each load path in fresh processes")
+    parser.add_argument('--benchmark-only', action='store_true', help="only time the load paths, keep the existing artifact")
+
+def compile_main(args):
+    if not args.benchmark_only and compile_model(args.size) is None:
+        return 1
+    runs = args.benchmark or (3 if args.benchmark_only else 0)
+    if runs:
+        report = measure_cold_start(runs)
+        return 0 if len(report) == 2 else 1
+    return 0
@@ -0,0 +1,68 @@
+"""
+Decode-once image buffer shared by the viewer, the detector and the report export.
+
+A SharedImage holds the decoded BGR pixels as a read-only numpy array plus
+the hash of the original file bytes. The viewer wraps the same buffer in a
+QImage without copying, the detector reads it directly and the PDF export
+paints from it, so every consumer sees identical pixels and the file is
+decoded exactly once.
+"""
+from . import metrics
+from .cache import hash_array, hash_bytes
+from .lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+class SharedImage:
+    __slots__ = ('pixels', 'path', '_content_hash')
+
+    def __init__(self, pixels, path=None, content_hash=None):
+        pixels = np.ascontiguousarray(pixels)
+        # Read-only so no consumer can change what the others see
+        pixels.flags.writeable = False
+        self.pixels = pixels # (h, w, 3) uint8, BGR like cv2.imread
+        self.path = path
+        self._content_hash = content_hash
+
+    @classmethod
+    def from_file(cls, path):
+        """Reads and decodes a file once. Returns None if it cannot be read or decoded."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        return cls.from_bytes(data, path)
+
+    @classmethod
+    def from_bytes(cls, data, path=None):
+        """Decodes encoded image bytes (PNG, JPEG, ...). Returns None if they cannot be decoded."""
+        with metrics.span('decode'):
+            pixels = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if pixels is None:
+            return None
+        # Hash of the file bytes, so cache keys match path-based detection
+        return cls(pixels, path, hash_bytes(data))
+
+    @classmethod
+    def from_array(cls, pixels, path=None):
+        return cls(pixels, path)
+
+    @property
+    def content_hash(self):
+        if self._content_hash is None:
+            self._content_hash = hash_array(self.pixels)
+        return self._content_hash
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes
@@ -0,0 +1,54 @@
+"""
+Deferred imports of heavy modules.
+
+torch, torchvision, cv2 and numpy together take seconds to import, most of
+it before the window could appear or `--help` could print. Modules bind
+them with
+
+    torch = lazy_import('torch')
+
+instead of `import torch`. The returned stand-in imports the real module
+on first attribute access and forwards every attribute from then on, so the
+code using it does not change. The import then happens where it is first
+needed, e.g. in the model loader thread rather than at start-up.
+
+Code that runs at import time (decorators, default arguments, base
+classes) must not touch a lazy module, or the import happens right away;
+benchmarks/import_budget.py checks that start-up stays free of them.
+"""
+import importlib
+import sys
+import threading
+
+_lock = threading.Lock()
+
+class LazyModule:
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name):
+    """The module itself if something already imported it, otherwise a LazyModule."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,156 @@
+"""
+Per-stage timing histograms.
+
+Code wraps each pipeline stage in `with metrics.span('forward'):`. The
+duration goes into a fixed-bucket histogram for that stage: a bisect and
+three additions under a lock, with no allocation per sample. The
+histograms feed the in-app performance panel and can be written in
+Prometheus text format for headless runs.
+
+Set BRAIN_MET_METRICS=0 (or call set_enabled(False)) to turn collection
+off. span() then returns a shared no-op context manager, so the
+instrumentation can stay in place in production.
+"""
+import bisect
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('BRAIN_MET_METRICS', '1') != '0'
+
+# Upper bounds in seconds, as Prometheus `le` labels; a final +Inf bucket is implicit
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stages in pipeline order, for display
+STAGES = ('model_load', 'decode', 'preprocess', 'forward', 'postprocess', 'overlay_draw', 'report_export')
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estimate from the buckets with linear interpolation, like Prometheus histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+_lock = threading.Lock()
+_histograms = {}
+
+class _Span:
+    __slots__ = ('name', 't0')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.t0)
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NOOP = _NoopSpan()
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = enabled
+
+def span(name):
+    """Context manager timing one occurrence of a stage."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+def observe(name, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(seconds)
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+def snapshot():
+    """Plain-dict copy of every histogram: {stage: {'counts', 'count', 'sum'}}."""
+    with _lock:
+        return {name: {'counts': list(h.counts), 'count': h.count, 'sum': h.sum} for name, h in _histograms.items()}
+
+def drain():
+    """snapshot() and reset() in one step, e.g. to ship a worker process's samples to the parent."""
+    with _lock:
+        data = {name: {'counts': list(h.counts), 'count': h.count, 'sum': h.sum} for name, h in _histograms.items()}
+        _histograms.clear()
+    return data
+
+def merge(data):
+    """Adds a snapshot() from elsewhere (e.g. a worker process) into the local histograms."""
+    with _lock:
+        for name, d in data.items():
+            hist = _histograms.get(name)
+            if hist is None:
+                hist = _histograms[name] = Histogram()
+            hist.counts = [a + b for a, b in zip(hist.counts, d['counts'])]
+            hist.count += d['count']
+            hist.sum += d['sum']
+
+def summary():
+    """Rows of (stage, count, mean ms, p50 ms, p95 ms, total s), known stages first."""
+    with _lock:
+        names = [s for s in STAGES if s in _histograms] + sorted(set(_histograms) - set(STAGES))
+        rows = []
+        for name in names:
+            h = _histograms[name]
+            mean = h.sum / h.count if h.count else 0.0
+            rows.append((name, h.count, mean * 1000, h.quantile(0.5) * 1000, h.quantile(0.95) * 1000, h.sum))
+        return rows
+
+def prometheus_text(prefix='brain_met'):
+    metric = f"{prefix}_stage_seconds"
+    lines = [f"# HELP {metric} Duration of pipeline stages.", f"# TYPE {metric} histogram"]
+    for name, d in sorted(snapshot().items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float('inf'),), d['counts']):
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{name}"}} {d["sum"]:.6f}')
+        lines.append(f'{metric}_count{{stage="{name}"}} {d["count"]}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path):
+    """Writes the histograms in Prometheus text exposition format (e.g. for the node_exporter textfile collector)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
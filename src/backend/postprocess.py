@@ -0,0 +1,49 @@
+"""
+Cheap, model-free post-processing of raw detection candidates.
+
+The detector runs once at a low floor threshold and keeps every candidate.
+Any higher confidence threshold is then applied with vectorized numpy
+operations (see Detections.filter), so changing the threshold never needs
+another forward pass.
+"""
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# Confidence floor used for the single forward pass
+CONF_FLOOR = 0.05
+# IoU threshold matching the YOLOv7 autoShape default
+IOU_THRESHOLD = 0.45
+
+def box_iou(box, boxes):
+    """IoU between one box (4,) and many boxes (n, 4), all in xyxy format."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+def nms(boxes, scores, iou_threshold=IOU_THRESHOLD, classes=None):
+    """
+    Greedy non-maximum suppression. Returns kept indices, highest score first.
+    With `classes`, boxes of different classes never suppress each other.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float32)
+    if classes is not None:
+        # Shift each class into its own coordinate range (same trick as YOLOv7)
+        boxes = boxes + np.asarray(classes, dtype=np.float32)[:, None] * (boxes.max() + 1)
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        ious = box_iou(boxes[i], boxes[order[1:]])
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
@@ -0,0 +1,165 @@
+"""
+Speculative prefetch of the images after the one on screen.
+
+When an image is shown, the Prefetcher decodes the next few images of the
+study on a single background thread and queues them on the InferenceService
+at background priority. The service always serves foreground requests
+first, refuses a background request when its queue is full and evicts
+background ones to make room for anything more important, and the lookahead
+is capped, so prefetching never delays what the user asked for by more than
+the forward pass already on the model. When the user opens a prefetched image,
+the decoded buffer and the candidates are handed over without new work.
+
+Hit/miss counters show whether the policy pays off for a given workflow.
+"""
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from .image import SharedImage
+from .service import PRIORITY_BACKGROUND
+from .volume import is_volume_path
+
+# Images to prefetch after the current one; 0 disables prefetching
+DEFAULT_LOOKAHEAD = int(os.environ.get('BRAIN_MET_PREFETCH', '2'))
+MAX_LOOKAHEAD = 4
+# Decoded images kept ahead of the user
+MAX_PREFETCH_BYTES = 512 * 1024 * 1024
+# Prefetched results kept until used
+MAX_RESULTS = 64
+
+class Prefetcher(QObject):
+    # generation, path, SharedImage or None; delivered on the UI thread
+    _decoded = pyqtSignal(int, str, object)
+
+    def __init__(self, service, lookahead=DEFAULT_LOOKAHEAD, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.lookahead = max(0, min(lookahead, MAX_LOOKAHEAD))
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._generation = 0
+        self._images = OrderedDict() # path -> SharedImage
+        self._results = OrderedDict() # path -> Detections at the floor threshold
+        self._inflight = {} # request_id -> path
+        self._ahead = []
+        self._infer = False
+        self.stats = {
+            'result_hits': 0, # result ready when the user ran the image
+            'inflight_hits': 0, # still running or queued; promoted to foreground
+            'result_misses': 0,
+            'image_hits': 0,
+            'image_misses': 0,
+            'wasted': 0, # prefetched results dropped without being used
+        }
+        self._decoded.connect(self._on_decoded)
+        service.result_ready.connect(self._on_result)
+        service.request_dropped.connect(self._on_dropped)
+
+    def on_image_shown(self, path, paths, infer=True):
+        """Starts prefetching the images after path in paths. infer=False only decodes."""
+        self._generation += 1
+        if not self.lookahead or path not in paths:
+            self._ahead = []
+            self._cancel_outside([])
+            return
+
+        i = paths.index(path)
+        self._ahead = [p for p in paths[i + 1:i + 1 + self.lookahead] if not is_volume_path(p)]
+        self._infer = infer
+        self._cancel_outside(self._ahead + [path])
+        for p in list(self._images):
+            if p != path and p not in self._ahead:
+                del self._images[p]
+
+        to_decode = []
+        for p in self._ahead:
+            if p in self._images:
+                self._submit(p, self._images[p])
+            else:
+                to_decode.append(p)
+        if to_decode:
+            self._executor.submit(self._decode, self._generation, to_decode)
+
+    def take_image(self, path):
+        """The prefetched decoded image for path, or None."""
+        image = self._images.get(path)
+        self.stats['image_hits' if image is not None else 'image_misses'] += 1
+        return image
+
+    def take_result(self, path):
+        """Prefetched candidates for path, or None if the caller has to submit its own request."""
+        candidates = self._results.pop(path, None)
+        if candidates is not None:
+            self.stats['result_hits'] += 1
+            return candidates
+        for request_id, p in list(self._inflight.items()):
+            if p == path:
+                # The caller's submit coalesces with (and promotes) this request
+                del self._inflight[request_id]
+                self.stats['inflight_hits'] += 1
+                return None
+        self.stats['result_misses'] += 1
+        return None
+
+    def summary(self):
+        s = self.stats
+        runs = s['result_hits'] + s['inflight_hits'] + s['result_misses']
+        rate = 100 * s['result_hits'] / runs if runs else 0.0
+        return (f"Prefetch: {s['result_hits']} hits, {s['inflight_hits']} in flight, {s['result_misses']} misses "
+                f"({rate:.0f}% hit rate); images {s['image_hits']}/{s['image_hits'] + s['image_misses']} prefetched; "
+                f"{s['wasted']} wasted")
+
+    def shutdown(self):
+        self._generation += 1
+        self._cancel_outside([])
+        self._executor.shutdown(wait=False)
+
+    def _cancel_outside(self, keep):
+        for request_id, p in list(self._inflight.items()):
+            if p not in keep:
+                self.service.cancel(request_id)
+                del self._inflight[request_id]
+        for p in list(self._results):
+            if p not in keep:
+                del self._results[p]
+                self.stats['wasted'] += 1
+
+    def _decode(self, generation, paths):
+        # Runs on the prefetch thread, nearest image first
+        for path in paths:
+            if generation != self._generation:
+                return
+            self._decoded.emit(generation, path, SharedImage.from_file(path))
+
+    def _on_decoded(self, generation, path, image):
+        if generation != self._generation or image is None or path not in self._ahead:
+            return
+        self._images[path] = image
+        while sum(im.nbytes for im in self._images.values()) > MAX_PREFETCH_BYTES and len(self._images) > 1:
+            self._images.popitem(last=False)
+        self._submit(path, image)
+
+    def _submit(self, path, image):
+        if not self._infer or path in self._results or path in self._inflight.values():
+            return
+        request_id = self.service.submit(path, PRIORITY_BACKGROUND, source=image)
+        if request_id is None:
+            # Refused by a full queue; the next image shown tries again
+            return
+        self._inflight[request_id] = path
+
+    def _on_dropped(self, request_id):
+        # Evicted from the service queue to make room for other requests
+        self._inflight.pop(request_id, None)
+
+    def _on_result(self, request_id, image_path, candidates):
+        path = self._inflight.pop(request_id, None)
+        if path is None or candidates.error:
+            # A failed prefetch is not kept: opening the image runs it again
+            return
+        self._results[path] = candidates
+        while len(self._results) > MAX_RESULTS:
+            self._results.popitem(last=False)
+            self.stats['wasted'] += 1
@@ -0,0 +1,306 @@
+"""
+PDF diagnostic reports.
+
+Reports are rendered with QTextDocument onto a QPdfWriter, both of which
+work off the UI thread. The scan is downscaled to print resolution and
+the boxes are drawn on that copy, and the result is handed to the document
+as an image resource rather than as PNG-encoded base64. Printing costs the
+same whatever the size of the source image.
+
+Besides the single report exported from the window, export_study writes a
+whole folder as one multi-page PDF or as one PDF per image. It works in
+chunks, so only a chunk's worth of decoded images is in memory at a time.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QDate, QRectF, QSizeF, Qt, QThread, QUrl, pyqtSignal
+from PyQt5.QtGui import QImage, QPageSize, QPainter, QPdfWriter, QTextDocument
+
+from . import metrics
+from .batch import collect_images
+from .image import SharedImage
+from .lazy import lazy_import
+from .postprocess import CONF_FLOOR
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+REPORT_DPI = 300
+# QTextDocument lays out in logical 96 dpi pixels, like QTextDocument.print_
+LAYOUT_DPI = 96
+IMAGE_DISPLAY_WIDTH = 500
+# Wider than this would not show on paper at REPORT_DPI
+REPORT_IMAGE_WIDTH = IMAGE_DISPLAY_WIDTH * REPORT_DPI // LAYOUT_DPI
+IMAGE_URL = 'report://image'
+BOX_COLOR = (0, 0, 255) # BGR
+BOX_WIDTH = 5 # at full resolution
+
+def diagnose(detections):
+    """Summary shown in the report: malignancy probability (%), lesion count and diagnosis."""
+    if not detections:
+        return {'prob': 0, 'lesion_count': 0, 'diagnosis': "Normal"}
+    lesion_count = len(detections)
+    return {
+        'prob': int(max(d['conf'] for d in detections) * 100),
+        'lesion_count': lesion_count,
+        'diagnosis': "Not Metastases" if lesion_count == 1 else "Metastases",
+    }
+
+def findings(detections, results):
+    if not detections:
+        return ["• No Abnormalities Detected."]
+    best = max(detections, key=lambda d: d['conf'])
+    return [
+        f"• Detected {results['lesion_count']} lesion(s).",
+        f"• Diagnosis: {results['diagnosis']}",
+        f"• Max Confidence: {results['prob']}%",
+        f"• Primary lesion: {best['label']}",
+    ]
+
+def report_image(pixels, detections, max_width=REPORT_IMAGE_WIDTH):
+    """BGR pixels -> RGB QImage at print resolution with the detection boxes drawn on it."""
+    h, w = pixels.shape[:2]
+    scale = min(1.0, max_width / w)
+    if scale < 1:
+        out = cv2.resize(pixels, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        out = pixels.copy()
+    thickness = max(1, round(BOX_WIDTH * scale))
+    for det in detections:
+        x1, y1, x2, y2 = (round(v * scale) for v in det['bbox'])
+        cv2.rectangle(out, (x1, y1), (x2, y2), BOX_COLOR, thickness)
+    rgb = np.ascontiguousarray(cv2.cvtColor(out, cv2.COLOR_BGR2RGB))
+    # copy(): the QImage must own its pixels once rgb goes out of scope
+    return QImage(rgb.data, rgb.shape[1], rgb.shape[0], rgb.strides[0], QImage.Format_RGB888).copy()
+
+def report_html(results, finding_lines, date=None, title=None):
+    date = date or QDate.currentDate().toString(Qt.DefaultLocaleLongDate)
+    findings_html = "<ul>" + "".join(f"<li>{line}</li>" for line in finding_lines) + "</ul>"
+    source = f"Image: {title}<br>" if title else ""
+    return f"""
+        <html>
+        <head>
+            <style>
+                body {{ font-family: sans-serif; padding: 40px; color: #333; }}
+                h1 {{ color: #1e293b; font-size: 24px; border-bottom: 2px solid #334155; padding_bottom: 10px; }}
+                .header {{ display: flex; justify-content: space-between; margin-bottom: 30px; }}
+                .meta {{ color: #64748b; font-size: 12px; margin-bottom: 20px; }}
+                .section {{ margin-bottom: 25px; }}
+                .label {{ font-weight: bold; color: #475569; }}
+                .value {{ color: #0f172a; }}
+                .image-container {{ text-align: center; margin: 20px 0; border: 1px solid #ddd; padding: 10px; }}
+                img {{ max-width: 100%; height: auto; }}
+                .stats-table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
+                .stats-table td {{ padding: 8px; border-bottom: 1px solid #eee; }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>Brain Metastases Diagnostic Report</h1>
+            </div>
+
+            <div class="meta">
+                {source}Date: {date}<br>
+                Generated by: GUI Brain Metastases System
+            </div>
+
+            <div class="section">
+                <h3>Diagnosis Results</h3>
+                <table class="stats-table">
+                    <tr>
+                        <td class="label">Malignancy Probability</td>
+                        <td class="value">{results.get('prob', 0)}%</td>
+                    </tr>
+                    <tr>
+                        <td class="label">Lesion Count</td>
+                        <td class="value">{results.get('lesion_count', 0)}</td>
+                    </tr>
+                    <tr>
+                        <td class="label">Diagnosis</td>
+                        <td class="value">{results.get('diagnosis', 'N/A')}</td>
+                    </tr>
+                </table>
+            </div>
+
+            <div class="section image-container">
+                <h3>Visual Analysis</h3>
+                <img src="{IMAGE_URL}" width="{IMAGE_DISPLAY_WIDTH}">
+            </div>
+
+            <div class="section">
+                <h3>Clinical Findings</h3>
+                {findings_html}
+            </div>
+        </body>
+        </html>
+        """
+
+class PdfReportWriter:
+    """Appends reports, each starting on a new page, to one PDF file."""
+
+    def __init__(self, filename):
+        self.writer = QPdfWriter(filename)
+        self.writer.setPageSize(QPageSize(QPageSize.A4))
+        self.writer.setResolution(REPORT_DPI)
+        self.painter = None
+        self.pages = 0
+
+    def add(self, html, image):
+        document = QTextDocument()
+        document.addResource(QTextDocument.ImageResource, QUrl(IMAGE_URL), image)
+        document.setHtml(html)
+        scale = self.writer.resolution() / LAYOUT_DPI
+        page = QSizeF(self.writer.width() / scale, self.writer.height() / scale)
+        document.setPageSize(page)
+
+        if self.painter is None:
+            self.painter = QPainter(self.writer)
+        for i in range(document.pageCount()):
+            if self.pages:
+                self.writer.newPage()
+            self.painter.save()
+            self.painter.scale(scale, scale)
+            self.painter.translate(0, -i * page.height())
+            document.drawContents(self.painter, QRectF(0, i * page.height(), page.width(), page.height()))
+            self.painter.restore()
+            self.pages += 1
+
+    def close(self):
+        if self.painter is not None:
+            self.painter.end()
+            self.painter = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_report(filename, pixels, detections, results=None, finding_lines=None, date=None, title=None):
+    """Writes a single-report PDF. results and finding_lines default to the summary of detections."""
+    results = results or diagnose(detections)
+    finding_lines = finding_lines if finding_lines is not None else findings(detections, results)
+    with metrics.span('report_export'), PdfReportWriter(filename) as writer:
+        writer.add(report_html(results, finding_lines, date, title), report_image(pixels, detections))
+
+class ReportExporter(QThread):
+    finished_export = pyqtSignal(str, str) # filename, error message ('' on success)
+
+    def __init__(self, filename, image, detections, results, finding_lines):
+        super().__init__()
+        # Snapshot of the window state; SharedImage pixels are read-only, so sharing them is safe
+        self.filename = filename
+        self.image = image
+        self.detections = list(detections)
+        self.results = dict(results)
+        self.finding_lines = list(finding_lines)
+        self.date = QDate.currentDate().toString(Qt.DefaultLocaleLongDate)
+
+    def run(self):
+        try:
+            if self.image is not None:
+                pixels = self.image.pixels
+            else:
+                pixels = np.zeros((300, 400, 3), dtype=np.uint8)
+            write_report(self.filename, pixels, self.detections, self.results, self.finding_lines, self.date)
+            self.finished_export.emit(self.filename, '')
+        except Exception as e:
+            self.finished_export.emit(self.filename, str(e))
+
+def _render(path, image, detections):
+    # Downscale right away so the full-resolution buffer can be released
+    with metrics.span('report_render'):
+        results = diagnose(detections)
+        return report_html(results, findings(detections, results), title=os.path.basename(path)), \
+            report_image(image.pixels, detections)
+
+def export_study(image_dir, out, detector, conf_threshold=0.25, per_image=False, workers=None, chunk_size=8,
+                 recursive=True):
+    """
+    Writes reports for every image in image_dir: one multi-page PDF at out, or with per_image
+    one PDF per image under the folder out. Returns the number of reports written.
+    """
+    paths = collect_images(image_dir, recursive)
+    workers = workers or min(8, os.cpu_count() or 1)
+    print(f"Found {len(paths)} images.")
+    if per_image:
+        os.makedirs(out, exist_ok=True)
+
+    t0 = time.perf_counter()
+    written = 0
+    study = None if per_image else PdfReportWriter(out)
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            for start in range(0, len(paths), chunk_size):
+                chunk = paths[start:start + chunk_size]
+                loaded = [(p, im) for p, im in zip(chunk, pool.map(SharedImage.from_file, chunk)) if im is not None]
+                candidates = detector.detect_batch_candidates([im for _, im in loaded], min(CONF_FLOOR, conf_threshold))
+                # A failed image gets no report rather than one showing no lesions
+                kept, detections = [], []
+                for (p, im), c in zip(loaded, candidates):
+                    if c.error:
+                        print(f"Skipping {p}: {c.error}")
+                        continue
+                    kept.append((p, im))
+                    detections.append(c.filter(conf_threshold).to_list())
+                loaded = kept
+                if not loaded:
+                    continue
+                pages = list(pool.map(lambda args: _render(*args), [(p, im, d) for (p, im), d in zip(loaded, detections)]))
+                done = [p for p, _ in loaded]
+                del loaded, kept
+
+                if per_image:
+                    targets = [os.path.join(out, os.path.splitext(os.path.relpath(p, image_dir))[0] + '.pdf')
+                               for p in done]
+                    list(pool.map(lambda args: _write_single(*args), zip(targets, pages)))
+                else:
+                    # One writer, so pages are appended in order
+                    for html, image in pages:
+                        with metrics.span('report_write'):
+                            study.add(html, image)
+                written += len(pages)
+                rate = written / (time.perf_counter() - t0)
+                print(f"[{written}/{len(paths)}] {rate:.1f} reports/s", flush=True)
+    finally:
+        if study is not None:
+            study.close()
+    print(f"Done. Reports written to {out}")
+    return written
+
+def _write_single(filename, page):
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with metrics.span('report_write'), PdfReportWriter(filename) as writer:
+        writer.add(*page)
+
+def add_arguments(parser):
+    parser.add_argument('image_dir', help="folder with MRI images")
+    parser.add_argument('--out', default='study_report.pdf',
+                        help="multi-page PDF, or with --per-image an output folder (default: study_report.pdf)")
+    parser.add_argument('--per-image', action='store_true', help="write one PDF per image instead of one study PDF")
+    parser.add_argument('--workers', type=int, default=None, help="threads for decoding and rendering")
+    parser.add_argument('--conf', type=float, default=0.25, help="confidence threshold")
+    parser.add_argument('--chunk-size', type=int, default=8, help="images in memory at a time")
+    parser.add_argument('--no-recursive', action='store_true', help="only scan the top-level folder")
+    parser.add_argument('--engine', default=None, help="inference engine: eager or torchscript (default: $BRAIN_MET_ENGINE or eager)")
+    parser.add_argument('--metrics-out', default=None, help="write per-stage timings in Prometheus text format to this file")
+
+def main(args):
+    # QTextDocument needs a GUI application, but no display
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QGuiApplication
+    from .detector import BrainTumorDetector
+
+    app = QGuiApplication.instance() or QGuiApplication(['report'])
+    detector = BrainTumorDetector(engine=args.engine)
+    if detector.model is None:
+        print("Model not loaded.")
+        return 1
+    export_study(args.image_dir, args.out, detector, conf_threshold=args.conf, per_image=args.per_image,
+                 workers=args.workers, chunk_size=args.chunk_size, recursive=not args.no_recursive)
+    if args.metrics_out:
+        metrics.write_prometheus(args.metrics_out)
+        print(f"Stage timings written to {args.metrics_out}")
+    return 0
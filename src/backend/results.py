@@ -0,0 +1,91 @@
+"""
+Compact, array-backed detection results.
+
+Detections are built straight from the model's prediction tensor
+(x1, y1, x2, y2, conf, cls per row) and kept as numpy columns, so
+thresholding, NMS and summary statistics are vectorized. `to_list()`
+produces the list-of-dicts format used by the UI and the batch output.
+
+An image the detector could not read, decode or run gives an empty
+Detections whose `error` says why, so it is never mistaken for a scan
+without lesions.
+"""
+from .lazy import lazy_import
+from .postprocess import IOU_THRESHOLD, nms
+
+np = lazy_import('numpy')
+
+class Detections:
+    __slots__ = ('boxes', 'scores', 'classes', 'names', 'error')
+
+    def __init__(self, boxes, scores, classes, names, error=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)   # (n, 4) xyxy, image pixels
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)    # (n,)
+        self.classes = np.asarray(classes, dtype=np.int32).reshape(-1)    # (n,)
+        self.names = names                                                # class index -> label
+        self.error = error                                                # why there is no result, or None
+
+    @classmethod
+    def empty(cls, names=()):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names)
+
+    @classmethod
+    def failed(cls, error, names=()):
+        """No result because detection failed; not the same as a negative."""
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names, error)
+
+    @classmethod
+    def from_tensor(cls, pred, names):
+        """pred: (n, 6) tensor or array of x1, y1, x2, y2, conf, cls."""
+        if hasattr(pred, 'detach'):
+            pred = pred.detach().cpu().numpy()
+        pred = np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+        return cls(pred[:, :4], pred[:, 4], pred[:, 5], names)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['boxes'], data['scores'], data['classes'], data['names'], data.get('error'))
+
+    def to_dict(self):
+        data = {
+            'boxes': self.boxes.tolist(),
+            'scores': self.scores.tolist(),
+            'classes': self.classes.tolist(),
+            'names': list(self.names),
+        }
+        if self.error:
+            data['error'] = self.error
+        return data
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, index):
+        # Boolean mask or index array -> subset sharing the same names
+        return Detections(self.boxes[index], self.scores[index], self.classes[index], self.names, self.error)
+
+    @property
+    def labels(self):
+        return [self.names[c] for c in self.classes]
+
+    @property
+    def max_conf(self):
+        return float(self.scores.max()) if len(self) else 0.0
+
+    def filter(self, conf_threshold, iou_threshold=IOU_THRESHOLD):
+        """Confidence threshold followed by class-aware NMS, highest score first."""
+        subset = self[self.scores >= conf_threshold]
+        if not len(subset):
+            return subset
+        return subset[nms(subset.boxes, subset.scores, iou_threshold, subset.classes)]
+
+    def to_list(self):
+        """List of dicts {'bbox': [x1, y1, x2, y2], 'label': str, 'conf': float} for the UI."""
+        boxes = self.boxes.astype(np.int32).tolist()
+        return [{'label': label, 'conf': conf, 'bbox': bbox}
+                for label, conf, bbox in zip(self.labels, self.scores.tolist(), boxes)]
+
+    def __repr__(self):
+        if self.error:
+            return f"Detections(error={self.error!r})"
+        return f"Detections(n={len(self)}, max_conf={self.max_conf:.2f})"
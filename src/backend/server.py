@@ -0,0 +1,251 @@
+"""
+Local HTTP inference server with dynamic micro-batching.
+
+One process loads the model once and serves every GUI on the machine.
+Requests that arrive within a short window are run as one batch through
+detect_batch_candidates. When the queue is full, requests are refused with
+503 and Retry-After rather than queued without bound. Only the standard
+library is used (asyncio), and by default the server listens on localhost,
+so it works fully offline.
+
+Endpoints:
+    POST /detect?floor=0.05   encoded image bytes -> {"candidates": Detections.to_dict()}
+    GET  /health              model and queue status
+    GET  /metrics             stage timings and server counters, Prometheus text format
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from . import metrics
+from .image import SharedImage
+from .postprocess import CONF_FLOOR
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Batching: wait at most this long for more requests after the first one
+DEFAULT_BATCH_WINDOW = 0.010
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_QUEUE = 64
+DECODE_WORKERS = 4
+REQUEST_TIMEOUT = 120
+MAX_BODY = 256 * 1024 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+class _Job:
+    __slots__ = ('image', 'floor', 'future', 'enqueued')
+
+    def __init__(self, image, floor, future, enqueued):
+        self.image = image
+        self.floor = floor
+        self.future = future
+        self.enqueued = enqueued
+
+class InferenceServer:
+    def __init__(self, detector, max_batch=DEFAULT_MAX_BATCH, batch_window=DEFAULT_BATCH_WINDOW,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_queue = max_queue
+        self.queue = None # asyncio.Queue, created on the server's loop
+        # One thread owns the model; decoding runs beside it
+        self._model_executor = ThreadPoolExecutor(max_workers=1)
+        self._decode_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+        self.counters = {'requests': 0, 'rejected': 0, 'errors': 0, 'batches': 0, 'batch_items': 0}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.queue = asyncio.Queue(self.max_queue)
+        batcher = asyncio.ensure_future(self._batch_loop())
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Inference server listening on http://{host}:{port}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self._model_executor.shutdown(wait=False)
+            self._decode_executor.shutdown(wait=False)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Skip requests whose client has already gone
+            batch = [job for job in batch if not job.future.done()]
+            now = loop.time()
+            for job in batch:
+                metrics.observe('server_queue_wait', now - job.enqueued)
+
+            groups = {}
+            for job in batch:
+                groups.setdefault(job.floor, []).append(job)
+            for floor, jobs in groups.items():
+                self.counters['batches'] += 1
+                self.counters['batch_items'] += len(jobs)
+                try:
+                    results = await loop.run_in_executor(self._model_executor, self.detector.detect_batch_candidates,
+                                                         [job.image for job in jobs], floor, self.max_batch)
+                except Exception as e:
+                    for job in jobs:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    continue
+                for job, candidates in zip(jobs, results):
+                    if not job.future.done():
+                        job.future.set_result(candidates)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                t0 = time.perf_counter()
+                status, content_type, payload, extra = await self._route(method, target, body)
+                if target.startswith('/detect'):
+                    metrics.observe('server_request', time.perf_counter() - t0)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await _write_response(writer, status, content_type, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/health':
+            return self._health()
+        if url.path == '/metrics':
+            return 200, 'text/plain; version=0.0.4', self.prometheus_text().encode(), {}
+        if url.path != '/detect':
+            return _json(404, {'error': 'not found'})
+        if method != 'POST':
+            return _json(405, {'error': 'use POST'})
+        return await self._detect(body, parse_qs(url.query))
+
+    def _health(self):
+        model = getattr(self.detector, 'model', None)
+        info = {
+            'status': 'ok' if model is not None else 'unavailable',
+            'engine': getattr(model, 'name', None),
+            'names': list(getattr(model, 'names', [])),
+            'queue_depth': self.queue.qsize(),
+            'max_queue': self.max_queue,
+        }
+        return _json(200 if model is not None else 503, info)
+
+    async def _detect(self, body, query):
+        self.counters['requests'] += 1
+        if self.queue.full():
+            # Backpressure: shed load before spending time on decoding
+            self.counters['rejected'] += 1
+            status, content_type, payload, _ = _json(503, {'error': 'queue full', 'queue_depth': self.queue.qsize()})
+            return status, content_type, payload, {'Retry-After': '1'}
+        try:
+            floor = float(query.get('floor', [CONF_FLOOR])[0])
+        except ValueError:
+            return _json(400, {'error': 'invalid floor'})
+
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(self._decode_executor, SharedImage.from_bytes, body)
+        if image is None:
+            return _json(400, {'error': 'could not decode image'})
+
+        job = _Job(image, floor, loop.create_future(), loop.time())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            status, content_type, payload, _ = _json(503, {'error': 'queue full', 'queue_depth': self.queue.qsize()})
+            return status, content_type, payload, {'Retry-After': '1'}
+        try:
+            candidates = await asyncio.wait_for(job.future, REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            return _json(504, {'error': 'timed out'})
+        except Exception as e:
+            self.counters['errors'] += 1
+            return _json(500, {'error': str(e)})
+        return _json(200, {'candidates': candidates.to_dict(), 'floor': floor})
+
+    def prometheus_text(self):
+        lines = [metrics.prometheus_text().rstrip('\n')]
+        lines.append("# TYPE brain_met_server_queue_depth gauge")
+        lines.append(f"brain_met_server_queue_depth {self.queue.qsize() if self.queue else 0}")
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE brain_met_server_{name}_total counter")
+            lines.append(f"brain_met_server_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+def _json(status, data):
+    return status, 'application/json', json.dumps(data).encode(), {}
+
+async def _read_request(reader):
+    """Returns (method, target, headers, body), or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, _ = line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+async def _write_response(writer, status, content_type, payload, keep_alive, extra_headers):
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head += [f"{k}: {v}" for k, v in extra_headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + payload)
+    await writer.drain()
+
+def add_arguments(parser):
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="images per forward pass")
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW * 1000,
+                        help="how long to wait for more requests before running a batch")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="queued requests before 503")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the on-disk detection cache")
+    parser.add_argument('--engine', default=None, help="inference engine: eager or torchscript (default: $BRAIN_MET_ENGINE or eager)")
+
+def main(args):
+    from .detector import BrainTumorDetector
+
+    detector = BrainTumorDetector(use_cache=not args.no_cache, engine=args.engine)
+    if detector.model is None:
+        print("Model not loaded.")
+        return 1
+    detector.warmup()
+    server = InferenceServer(detector, args.max_batch, args.batch_window_ms / 1000, args.max_queue)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,328 @@
+"""
+Long-lived inference service thread, and the thread that loads the model.
+
+All detection requests from the UI go through one InferenceService, so at
+most one forward pass runs on the model at a time. Requests wait in a
+bounded priority queue, duplicates for the same image are coalesced and
+pending requests can be cancelled when the user moves on. Every request
+has an ID so the UI can ignore results that are no longer current.
+
+Volume requests run the whole stack through the detector in batches and
+stream progress and per-slice results back as each batch finishes. Batch
+requests (the folder watcher) hand their result back through a Future, so
+a plain worker thread can wait on it.
+"""
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .detector import BrainTumorDetector
+from .results import Detections
+
+# Lower value runs first
+PRIORITY_FOREGROUND = 0
+# Watched-folder batches: after what the user is looking at, before prefetching
+PRIORITY_WATCH = 5
+PRIORITY_BACKGROUND = 10
+
+# Slices per forward pass when running a volume
+VOLUME_BATCH_SIZE = 8
+
+class ModelLoader(QThread):
+    model_ready = pyqtSignal(bool, float) # loaded successfully, seconds spent loading + warming up
+    # First launch on this machine: profile from the quick tuning pass run after model_ready;
+    # apply it with InferenceService.apply_profile
+    profile_ready = pyqtSignal(object)
+
+    def __init__(self, detector, service=None):
+        super().__init__()
+        self.detector = detector
+        self.service = service # InferenceService serving detector; tuning only measures while it is idle
+
+    def run(self):
+        t0 = time.perf_counter()
+        try:
+            self.detector.load_default_model()
+            self.detector.warmup()
+        except Exception as e:
+            print(f"Error in model loader thread: {e}")
+        # The model is usable with the default settings; tuning must not hold up the first diagnosis
+        self.model_ready.emit(self.detector.model is not None, time.perf_counter() - t0)
+
+        if not isinstance(self.detector, BrainTumorDetector):
+            return
+        from . import tuning
+        try:
+            if tuning.TUNING_ENABLED and self.detector.device.type == 'cpu' and self.detector.model is not None \
+                    and not tuning.has_profile(self.detector):
+                print("No tuning profile for this machine, tuning in the background...")
+                # Tuned on a copy, one measurement at a time while the service is idle: requests keep the
+                # current settings and never run on a candidate thread count or skew a timing
+                profile = tuning.autotune(tuning.scratch_copy(self.detector), tuning.sample_images(), full=False,
+                                          seconds=0.5, log=self._tuning_log, hold=self._hold)
+                if profile is not None:
+                    self.profile_ready.emit(profile)
+        except InterruptedError:
+            print("Tuning interrupted, it runs again on the next launch.")
+        except Exception as e:
+            print(f"Error while tuning: {e}")
+
+    def _hold(self):
+        if self.service is None:
+            return contextlib.nullcontext()
+        return self.service.hold(self.isInterruptionRequested)
+
+    def _tuning_log(self, message):
+        # autotune logs after every measurement, so requestInterruption() stops it within one
+        if self.isInterruptionRequested():
+            raise InterruptedError
+        print(message)
+
+class InferenceRequest:
+    __slots__ = ('request_id', 'image_path', 'priority', 'seq', 'cancelled', 'volume', 'source', 'batch', 'future')
+
+    def __init__(self, request_id, image_path, priority, seq, volume=None, source=None, batch=None, future=None):
+        self.request_id = request_id
+        self.image_path = image_path # for volumes: the volume source, used for coalescing
+        self.priority = priority
+        self.seq = seq
+        self.cancelled = False
+        self.volume = volume
+        self.source = source # already decoded SharedImage, if the caller has one
+        self.batch = batch # list of image paths for a batch request
+        self.future = future # receives the batch request's list of Detections
+
+    def __lt__(self, other):
+        # Same priority: first come, first served
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class InferenceService(QThread):
+    result_ready = pyqtSignal(int, str, object) # request_id, image_path, Detections at the floor threshold
+    request_dropped = pyqtSignal(int) # request_id evicted from a full queue
+    volume_progress = pyqtSignal(int, int, int, object) # request_id, slices done, total, {slice index: Detections}
+
+    def __init__(self, detector, max_pending=8):
+        super().__init__()
+        self.detector = detector
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._heap = []
+        self._pending = {} # image_path -> InferenceRequest waiting in the queue
+        self._running = None # InferenceRequest being processed
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._stopping = False
+        self._held = False # hold(): background work has the model to itself
+        self._profile = None # tuning profile to apply before the next request
+
+    def submit(self, image_path, priority=PRIORITY_FOREGROUND, volume=None, source=None):
+        """Queues a request and returns its ID. A request for an image already queued or running is coalesced.
+        Returns None if the queue is full of requests that rank at least as high as this one."""
+        dropped = None
+        with self._cond:
+            running = self._running
+            if running is not None and running.image_path == image_path and not running.cancelled:
+                return running.request_id
+
+            request = self._pending.get(image_path)
+            if request is not None:
+                if priority < request.priority:
+                    # Promote: re-queue with the higher priority, the old heap entry is skipped
+                    request.cancelled = True
+                    request = self._enqueue(image_path, priority, request.request_id, volume, source or request.source)
+                return request.request_id
+
+            admitted, dropped = self._make_room(priority)
+            if not admitted:
+                return None
+            request = self._enqueue(image_path, priority, next(self._ids), volume, source)
+            self._cond.notify_all()
+
+        self._notify_dropped(dropped)
+        return request.request_id
+
+    def submit_volume(self, volume, priority=PRIORITY_FOREGROUND):
+        """Queues detection over every slice of a Volume; progress arrives through volume_progress."""
+        return self.submit(f"{volume.source}#volume", priority, volume)
+
+    def submit_batch(self, paths, priority=PRIORITY_WATCH):
+        """Queues detection over a list of image paths. Returns a Future of their Detections at the floor threshold;
+        it is cancelled if the request is refused by a full queue, dropped or the service stops first."""
+        future = Future()
+        with self._cond:
+            request_id = next(self._ids)
+            if self._stopping:
+                future.cancel()
+                return future
+            # Counted against max_pending like any other request
+            admitted, dropped = self._make_room(priority)
+            if not admitted:
+                future.cancel()
+                return future
+            self._enqueue(f"#batch{request_id}", priority, request_id, batch=list(paths), future=future)
+            self._cond.notify_all()
+        self._notify_dropped(dropped)
+        return future
+
+    def _make_room(self, priority):
+        """Called with the lock held, before queueing a request with the given priority. Returns (admitted, evicted):
+        a full queue evicts its lowest-priority, oldest request only for a request that ranks above it."""
+        if len(self._pending) < self.max_pending:
+            return True, None
+        dropped = max(self._pending.values(), key=lambda r: (r.priority, -r.seq))
+        if priority >= dropped.priority:
+            # Prefetching never pushes out a watch batch or what the user asked for
+            return False, None
+        dropped.cancelled = True
+        del self._pending[dropped.image_path]
+        return True, dropped
+
+    def _notify_dropped(self, dropped):
+        if dropped is None:
+            return
+        if dropped.future is not None:
+            dropped.future.cancel()
+        self.request_dropped.emit(dropped.request_id)
+
+    def _enqueue(self, image_path, priority, request_id, volume=None, source=None, batch=None, future=None):
+        request = InferenceRequest(request_id, image_path, priority, next(self._seq), volume, source, batch, future)
+        heapq.heappush(self._heap, request)
+        self._pending[image_path] = request
+        return request
+
+    def cancel(self, request_id):
+        """Cancels a pending request. A request already on the model finishes, but its result is not emitted."""
+        with self._cond:
+            for path, request in list(self._pending.items()):
+                if request.request_id == request_id:
+                    request.cancelled = True
+                    del self._pending[path]
+                    if request.future is not None:
+                        request.future.cancel()
+            if self._running is not None and self._running.request_id == request_id:
+                self._running.cancelled = True
+
+    def cancel_all(self, priority=None):
+        """Cancels every pending request, or only those with the given priority."""
+        with self._cond:
+            for path, request in list(self._pending.items()):
+                if priority is None or request.priority == priority:
+                    request.cancelled = True
+                    del self._pending[path]
+                    if request.future is not None:
+                        request.future.cancel()
+
+    @contextlib.contextmanager
+    def hold(self, interrupted=None):
+        """Waits until no request is queued or running, then keeps the service from starting one until the
+        block exits. For background work that needs the model and the thread settings to itself (tuning).
+        Raises InterruptedError once interrupted() returns True while waiting."""
+        with self._cond:
+            while (self._pending or self._running is not None) and not self._stopping:
+                if interrupted is not None and interrupted():
+                    raise InterruptedError
+                self._cond.wait(0.1)
+            self._held = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._held = False
+                self._cond.notify_all()
+
+    def apply_profile(self, profile):
+        """Applies a tuning profile to the detector between two requests, never during one."""
+        with self._cond:
+            self._profile = profile
+
+    def _apply_pending_profile(self):
+        with self._cond:
+            profile, self._profile = self._profile, None
+        if profile is not None and self.detector.model is not None:
+            from .tuning import apply_profile, describe
+            apply_profile(self.detector, profile)
+            print(f"Applied tuning profile: {describe(profile)}")
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            # Nobody will run the waiting batch requests
+            for request in self._pending.values():
+                if request.future is not None:
+                    request.future.cancel()
+            self._cond.notify_all()
+        self.wait()
+
+    def _next_request(self):
+        with self._cond:
+            while not self._stopping:
+                while self._heap and self._heap[0].cancelled:
+                    heapq.heappop(self._heap)
+                if self._heap and not self._held:
+                    request = heapq.heappop(self._heap)
+                    del self._pending[request.image_path]
+                    self._running = request
+                    return request
+                self._cond.wait()
+            return None
+
+    def run(self):
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            self._apply_pending_profile()
+            if request.volume is not None:
+                self._run_volume(request)
+                with self._cond:
+                    self._running = None
+                continue
+            if request.batch is not None:
+                # Running futures cannot be cancelled, so the result below always has somewhere to go
+                if request.future.set_running_or_notify_cancel():
+                    try:
+                        results = self.detector.detect_batch_candidates(request.batch)
+                    except Exception as e:
+                        request.future.set_exception(e)
+                    else:
+                        request.future.set_result(results)
+                with self._cond:
+                    self._running = None
+                continue
+            try:
+                candidates = self.detector.detect_candidates(request.source or request.image_path)
+            except Exception as e:
+                print(f"Error in inference service: {e}")
+                candidates = Detections.failed(str(e))
+
+            with self._cond:
+                self._running = None
+                cancelled = request.cancelled
+            if not cancelled:
+                self.result_ready.emit(request.request_id, request.image_path, candidates)
+
+    def _run_volume(self, request):
+        volume = request.volume
+        total = len(volume)
+        for start in range(0, total, VOLUME_BATCH_SIZE):
+            # Cancelled (e.g. another image was opened): stop between batches
+            if request.cancelled or self._stopping:
+                return
+            indices = range(start, min(start + VOLUME_BATCH_SIZE, total))
+            try:
+                # Only this batch of slices is paged in from the memory map
+                results = self.detector.detect_batch_candidates([volume.slice_bgr(i) for i in indices])
+            except Exception as e:
+                print(f"Error in inference service: {e}")
+                results = [Detections.failed(str(e)) for _ in indices]
+            if not request.cancelled:
+                self.volume_progress.emit(request.request_id, indices.stop, total, dict(zip(indices, results)))
@@ -0,0 +1,307 @@
+"""
+Persistent store of diagnosis results.
+
+Unlike the detection cache (raw candidates, evicted when full), the store
+keeps the thresholded result of every analyzed image for good: one row per
+image path in `images` and one row per lesion in `lesions`. Both tables are
+indexed for the usual questions (by image hash, study, date, lesion count
+and maximum confidence), so queries such as "all studies with at least two
+lesions above 0.6" answer from the indexes without re-running the model.
+
+Storage is a single SQLite file in WAL mode: the GUI and CLI read while a
+batch job writes. Writers insert whole chunks in one transaction.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import DEFAULT_CACHE_DIR, hash_file
+
+DEFAULT_STORE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'results.db')
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS images (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        image_hash TEXT,
+        study TEXT NOT NULL,
+        created REAL NOT NULL,
+        lesion_count INTEGER NOT NULL,
+        max_conf REAL NOT NULL,
+        conf_threshold REAL NOT NULL,
+        engine TEXT,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_images_hash ON images(image_hash);
+    CREATE INDEX IF NOT EXISTS idx_images_study ON images(study, created);
+    CREATE INDEX IF NOT EXISTS idx_images_created ON images(created);
+    CREATE INDEX IF NOT EXISTS idx_images_lesions ON images(lesion_count);
+    CREATE INDEX IF NOT EXISTS idx_images_max_conf ON images(max_conf);
+
+    CREATE TABLE IF NOT EXISTS lesions (
+        image_id INTEGER NOT NULL,
+        study TEXT NOT NULL,
+        conf REAL NOT NULL,
+        label TEXT,
+        x1 REAL, y1 REAL, x2 REAL, y2 REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_lesions_image ON lesions(image_id);
+    -- Covering index for per-study lesion counts above a confidence
+    CREATE INDEX IF NOT EXISTS idx_lesions_conf ON lesions(conf, study, image_id);
+
+    -- Files a folder watcher has handled, so a restart skips them
+    CREATE TABLE IF NOT EXISTS watched (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL
+    );
+"""
+
+def study_of(path):
+    """Images are grouped by the folder they were opened from."""
+    return os.path.dirname(os.path.abspath(path))
+
+def parse_date(text):
+    """'YYYY-MM-DD' (or a full ISO timestamp) -> epoch seconds, for the since/until filters."""
+    if text is None:
+        return None
+    for fmt in ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{text}', expected YYYY-MM-DD")
+
+class ResultsStore:
+    def __init__(self, path=None):
+        if path is None:
+            path = DEFAULT_STORE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # One connection per thread; sqlite3 connections must not be shared
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, path, detections, conf_threshold, image_hash=None, engine=None, study=None):
+        """Stores one image's thresholded detections (the list-of-dicts format), replacing any earlier result."""
+        self.add_many([{'path': path, 'image_hash': image_hash, 'detections': detections, 'study': study}],
+                      conf_threshold, engine)
+
+    def add_many(self, records, conf_threshold, engine=None, watched=()):
+        """Bulk insert of batch records ({'path', 'detections', optional 'image_hash', 'study', 'error'}) in one transaction.
+        watched: (path, size, mtime_ns) of files a folder watcher handled, recorded in the same transaction."""
+        now = time.time()
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent writers queue instead of deadlocking
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                path = record['path']
+                study = record.get('study') or study_of(path)
+                detections = record['detections']
+                # Latest result per path wins
+                conn.execute("DELETE FROM lesions WHERE image_id IN (SELECT id FROM images WHERE path = ?)", (path,))
+                conn.execute("DELETE FROM images WHERE path = ?", (path,))
+                cur = conn.execute(
+                    "INSERT INTO images (path, image_hash, study, created, lesion_count, max_conf, conf_threshold, engine, error)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, record.get('image_hash'), study, now, len(detections),
+                     max((d['conf'] for d in detections), default=0.0), conf_threshold, engine, record.get('error')))
+                conn.executemany(
+                    "INSERT INTO lesions (image_id, study, conf, label, x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(cur.lastrowid, study, d['conf'], d['label'], *d['bbox']) for d in detections])
+            conn.executemany("INSERT OR REPLACE INTO watched (path, size, mtime_ns) VALUES (?, ?, ?)", watched)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def import_jsonl(self, jsonl_path, conf_threshold, engine=None, chunk_size=1000):
+        """Loads a `batch` output file, hashing images that still exist. Returns the number of records."""
+        total, chunk = 0, []
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('image_hash') is None and os.path.exists(record['path']):
+                    record['image_hash'] = hash_file(record['path'])
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    self.add_many(chunk, conf_threshold, engine)
+                    total += len(chunk)
+                    chunk = []
+        if chunk:
+            self.add_many(chunk, conf_threshold, engine)
+            total += len(chunk)
+        return total
+
+    def watched_files(self, folder):
+        """{path: (size, mtime_ns)} of the files under folder a watcher has handled."""
+        prefix = os.path.join(os.path.abspath(folder), '')
+        # Range scan on the primary key instead of LIKE, which cannot use the index
+        rows = self._conn().execute("SELECT path, size, mtime_ns FROM watched WHERE path >= ? AND path < ?",
+                                    (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def studies(self, min_lesions=1, min_conf=0.0, since=None, until=None, limit=1000):
+        """Studies with at least min_lesions lesions scoring min_conf or more.
+        Rows of (study, lesions, images with lesions, max conf, last analyzed)."""
+        where, args = ["l.conf >= ?"], [min_conf]
+        join = ""
+        if since is not None or until is not None:
+            join = "JOIN images i ON i.id = l.image_id"
+            if since is not None:
+                where.append("i.created >= ?")
+                args.append(since)
+            if until is not None:
+                where.append("i.created < ?")
+                args.append(until)
+        sql = (f"SELECT l.study, COUNT(*), COUNT(DISTINCT l.image_id), MAX(l.conf) FROM lesions l {join}"
+               f" WHERE {' AND '.join(where)} GROUP BY l.study HAVING COUNT(*) >= ? ORDER BY COUNT(*) DESC LIMIT ?")
+        conn = self._conn()
+        rows = conn.execute(sql, args + [max(1, min_lesions), limit]).fetchall()
+        return [(study, count, n_images, max_conf,
+                 conn.execute("SELECT MAX(created) FROM images WHERE study = ?", (study,)).fetchone()[0])
+                for study, count, n_images, max_conf in rows]
+
+    def images(self, study=None, min_lesions=0, min_conf=0.0, since=None, until=None, image_hash=None, limit=1000):
+        """Images with at least min_lesions lesions scoring min_conf or more, newest first.
+        Rows of (path, study, created, lesions above min_conf, max conf, image hash)."""
+        where, args = [], []
+        for clause, value in (("i.study = ?", study), ("i.created >= ?", since), ("i.created < ?", until),
+                              ("i.image_hash = ?", image_hash)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        if min_conf > 0:
+            # Only images whose best lesion clears min_conf can qualify; the max_conf index narrows the join
+            where.append("i.max_conf >= ?")
+            args.append(min_conf)
+            count = "(SELECT COUNT(*) FROM lesions l WHERE l.image_id = i.id AND l.conf >= ?)"
+            args.insert(0, min_conf)
+        else:
+            count = "i.lesion_count"
+        sql = f"SELECT i.path, i.study, i.created, {count} AS n, i.max_conf, i.image_hash FROM images i"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        if min_lesions > 0:
+            sql += " AND n >= ?" if where else " WHERE n >= ?"
+            args.append(min_lesions)
+        sql += " ORDER BY i.created DESC LIMIT ?"
+        args.append(limit)
+        return self._conn().execute(sql, args).fetchall()
+
+    def lookup(self, image_hash):
+        """The latest stored result for an image content hash: (path, created, detections), or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT id, path, created FROM images WHERE image_hash = ? ORDER BY created DESC LIMIT 1",
+                           (image_hash,)).fetchone()
+        if row is None:
+            return None
+        image_id, path, created = row
+        detections = [{'label': label, 'conf': conf, 'bbox': [int(x1), int(y1), int(x2), int(y2)]}
+                      for label, conf, x1, y1, x2, y2 in conn.execute(
+                          "SELECT label, conf, x1, y1, x2, y2 FROM lesions WHERE image_id = ? ORDER BY conf DESC",
+                          (image_id,))]
+        return path, created, detections
+
+    def failures(self, since=None, until=None, limit=1000):
+        """Images whose latest analysis failed, newest first. Rows of (path, study, created, error)."""
+        sql = "SELECT path, study, created, error FROM images WHERE error IS NOT NULL"
+        args = []
+        for clause, value in ((" AND created >= ?", since), (" AND created < ?", until)):
+            if value is not None:
+                sql += clause
+                args.append(value)
+        sql += " ORDER BY created DESC LIMIT ?"
+        args.append(limit)
+        return self._conn().execute(sql, args).fetchall()
+
+    def forget_failed(self, folder):
+        """Removes the failed files under folder from the watched ledger, so a watcher analyzes them again.
+        Returns how many."""
+        prefix = os.path.join(os.path.abspath(folder), '')
+        cur = self._conn().execute("DELETE FROM watched WHERE path >= ? AND path < ? AND path IN"
+                                   " (SELECT path FROM images WHERE error IS NOT NULL)",
+                                   (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+        return cur.rowcount
+
+    def stats(self):
+        conn = self._conn()
+        images, studies = conn.execute("SELECT COUNT(*), COUNT(DISTINCT study) FROM images").fetchone()
+        lesions = conn.execute("SELECT COUNT(*) FROM lesions").fetchone()[0]
+        return {'images': images, 'studies': studies, 'lesions': lesions}
+
+def _format_time(created):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(created)) if created else '-'
+
+def add_arguments(parser):
+    parser.add_argument('--min-lesions', type=int, default=1, help="minimum number of lesions (default: 1)")
+    parser.add_argument('--min-conf', type=float, default=0.0, help="only count lesions at or above this confidence")
+    parser.add_argument('--study', default=None, help="list the images of this study folder")
+    parser.add_argument('--images', action='store_true', help="list matching images instead of studies")
+    parser.add_argument('--hash', default=None, help="look up the result for an image content hash")
+    parser.add_argument('--errors', action='store_true', help="list images whose analysis failed")
+    parser.add_argument('--since', default=None, help="analyzed on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--until', default=None, help="analyzed before this date (YYYY-MM-DD)")
+    parser.add_argument('--limit', type=int, default=100, help="maximum number of rows")
+    parser.add_argument('--import', dest='import_path', default=None,
+                        help="first load the results of a `batch` JSONL file into the store")
+    parser.add_argument('--conf', type=float, default=0.25, help="confidence threshold the imported file was run with")
+    parser.add_argument('--json', action='store_true', help="print rows as JSON")
+    parser.add_argument('--db', default=None, help=f"store location (default: {DEFAULT_STORE_PATH})")
+
+def main(args):
+    store = ResultsStore(args.db)
+    if args.import_path:
+        count = store.import_jsonl(args.import_path, args.conf)
+        print(f"Imported {count} results from {args.import_path}")
+    try:
+        since, until = parse_date(args.since), parse_date(args.until)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    t0 = time.perf_counter()
+    if args.hash:
+        result = store.lookup(args.hash)
+        rows = [] if result is None else [(result[0], _format_time(result[1]), result[2])]
+        header = ("path", "analyzed", "detections")
+    elif args.errors:
+        rows = [(path, study, _format_time(created), error)
+                for path, study, created, error in store.failures(since, until, args.limit)]
+        header = ("path", "study", "analyzed", "error")
+    elif args.images or args.study:
+        rows = [(path, study, _format_time(created), n, round(max_conf, 3))
+                for path, study, created, n, max_conf, _ in store.images(
+                    study=os.path.abspath(args.study) if args.study else None, min_lesions=args.min_lesions,
+                    min_conf=args.min_conf, since=since, until=until, limit=args.limit)]
+        header = ("path", "study", "analyzed", "lesions", "max_conf")
+    else:
+        rows = [(study, count, n_images, round(max_conf, 3), _format_time(created))
+                for study, count, n_images, max_conf, created in store.studies(
+                    args.min_lesions, args.min_conf, since, until, args.limit)]
+        header = ("study", "lesions", "images", "max_conf", "last_analyzed")
+    elapsed = time.perf_counter() - t0
+
+    if args.json:
+        print(json.dumps([dict(zip(header, row)) for row in rows], indent=2))
+    else:
+        print("\t".join(header))
+        for row in rows:
+            print("\t".join(str(v) for v in row))
+        print(f"{len(rows)} rows in {elapsed * 1000:.1f} ms ({store.stats()['images']} images stored)")
+    return 0
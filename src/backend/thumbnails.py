@@ -0,0 +1,73 @@
+"""
+Thumbnail generation with a persistent on-disk cache.
+
+Thumbnails are stored as small JPEG files, keyed by a hash of the file's
+path, size and modification time. A cache hit therefore costs one stat()
+and one small read, and an edited file gets a new thumbnail automatically.
+"""
+import hashlib
+import os
+import threading
+
+from .cache import DEFAULT_CACHE_DIR
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
+THUMBNAIL_DIR = os.path.join(DEFAULT_CACHE_DIR, 'thumbnails')
+THUMBNAIL_SIZE = 128
+
+def thumbnail_key(path, size=THUMBNAIL_SIZE):
+    st = os.stat(path)
+    return hashlib.sha256(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}:{size}".encode()).hexdigest()
+
+def make_thumbnail(path, size=THUMBNAIL_SIZE):
+    """Fits an image in size x size. Returns an RGB uint8 array, or None if the file cannot be decoded."""
+    try:
+        with Image.open(path) as im:
+            # JPEG: decode directly at a reduced DCT scale instead of full resolution
+            im.draft('RGB', (size, size))
+            im = im.convert('RGB')
+            im.thumbnail((size, size), Image.BILINEAR)
+            return np.asarray(im)
+    except (OSError, ValueError):
+        return None
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=THUMBNAIL_DIR, size=THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.jpg')
+
+    def get(self, path):
+        """Cached thumbnail or a freshly generated (and stored) one. RGB uint8 or None if unreadable."""
+        try:
+            key = thumbnail_key(path, self.size)
+        except OSError:
+            return None
+        entry = self._entry_path(key)
+        if os.path.exists(entry):
+            try:
+                with Image.open(entry) as im:
+                    return np.asarray(im.convert('RGB'))
+            except OSError:
+                pass # corrupt entry: regenerate below
+
+        thumb = make_thumbnail(path, self.size)
+        if thumb is not None:
+            self._store(entry, thumb)
+        return thumb
+
+    def _store(self, entry, thumb):
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            # Write then rename, so readers in other threads never see a partial file
+            tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+            Image.fromarray(thumb).save(tmp, 'JPEG', quality=85)
+            os.replace(tmp, entry)
+        except OSError as e:
+            print(f"Thumbnail cache write error: {e}")
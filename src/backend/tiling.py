@@ -0,0 +1,46 @@
+"""
+Helpers for tiled inference on high-resolution images.
+
+The image is split into overlapping tiles of equal size, so that small
+lesions are not lost when the model letterboxes a large scan down to its
+input size. Boxes are shifted back into full-image coordinates and the
+duplicates found on both sides of a tile border are merged with NMS.
+"""
+from .lazy import lazy_import
+from .postprocess import IOU_THRESHOLD, nms
+from .results import Detections
+
+np = lazy_import('numpy')
+
+DEFAULT_TILE_SIZE = 640
+DEFAULT_OVERLAP = 0.2
+
+def tile_positions(length, tile, overlap):
+    """Start offsets along one axis. The last tile is shifted inward so every tile has the same size."""
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+def tile_grid(shape, tile=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+    """Tiles as (x0, y0, x1, y1) covering an image of shape (h, w)."""
+    h, w = shape[:2]
+    th, tw = min(tile, h), min(tile, w)
+    return [(x, y, x + tw, y + th)
+            for y in tile_positions(h, th, overlap)
+            for x in tile_positions(w, tw, overlap)]
+
+def merge_tiles(tile_detections, tiles, names, iou_threshold=IOU_THRESHOLD):
+    """Shifts per-tile Detections into image coordinates and removes cross-tile duplicates."""
+    parts = [d for d in tile_detections if len(d)]
+    if not parts:
+        return Detections.empty(names)
+    offsets = np.concatenate([np.tile([x0, y0, x0, y0], (len(d), 1))
+                              for d, (x0, y0, _, _) in zip(tile_detections, tiles) if len(d)])
+    merged = Detections(np.concatenate([d.boxes for d in parts]) + offsets,
+                        np.concatenate([d.scores for d in parts]),
+                        np.concatenate([d.classes for d in parts]),
+                        names)
+    return merged[nms(merged.boxes, merged.scores, iou_threshold, merged.classes)]
@@ -0,0 +1,316 @@
+"""
+CPU auto-tuning of inference settings.
+
+PyTorch's default thread counts, the fixed batch size and float32
+precision are rarely the fastest choice on many-core CPU stations.
+autotune() measures, on a synthetic workload:
+
+- intra-op thread count (single-image latency),
+- inter-op thread count (in spawned processes, as it can only be set once
+  per process; full tuning only),
+- batch size (throughput),
+- bfloat16 autocast and reduced input resolutions.
+
+bfloat16 and a different resolution change the output, so they are only
+accepted when the detections on sample images still agree with the
+float32, full-resolution reference. The best profile is saved per machine
+and applied automatically whenever the model loads on the CPU.
+"""
+import contextlib
+import copy
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import platform
+import time
+
+from .cache import DEFAULT_CACHE_DIR
+from .detector import CONF_FLOOR, INPUT_SIZE, BrainTumorDetector, letterbox_shape
+from .lazy import lazy_import
+from .results import Detections
+
+torch = lazy_import('torch')
+
+PROFILE_PATH = os.path.join(DEFAULT_CACHE_DIR, 'tuning.json')
+# Set to 0 to ignore saved profiles
+TUNING_ENABLED = os.environ.get('BRAIN_MET_TUNING', '1') != '0'
+
+BATCH_CANDIDATES = (1, 2, 4, 8, 16)
+INTEROP_CANDIDATES = (1, 2, 4)
+RESOLUTION_CANDIDATES = (512,)
+# A setting must be at least this much faster to replace the default
+MIN_SPEEDUP = 1.10
+# ...and match this share of the reference detections (F1) when it changes the output
+MIN_AGREEMENT = 0.98
+# Batch size: the smallest one within this share of the best throughput
+BATCH_SLACK = 0.95
+
+def machine_key(engine_name):
+    """Identifies the hardware and software a profile was measured on."""
+    parts = [platform.node(), platform.machine(), platform.processor(), str(os.cpu_count()), torch.__version__,
+             engine_name]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16]
+
+def load_profiles(path=PROFILE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_profile(profile, engine_name, path=PROFILE_PATH):
+    profiles = load_profiles(path)
+    profiles[machine_key(engine_name)] = profile
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp, path)
+
+def saved_profile(engine_name):
+    return load_profiles().get(machine_key(engine_name))
+
+def apply_profile(detector, profile):
+    if detector.tune_threads:
+        torch.set_num_threads(profile['intra_threads'])
+        if profile.get('inter_threads'):
+            try:
+                torch.set_num_interop_threads(profile['inter_threads'])
+            except RuntimeError:
+                # Only possible before the first inter-op parallel work in this process
+                pass
+    detector.max_batch_size = profile['batch_size']
+    if not detector.model.fixed_shape:
+        detector.input_size = profile['input_size']
+    detector.model.bf16 = profile['bf16']
+
+def apply_saved_profile(detector):
+    """Applies this machine's profile, if any, to a detector whose model just loaded. Returns the profile."""
+    if not TUNING_ENABLED or detector.model is None or detector.device.type != 'cpu':
+        return None
+    profile = saved_profile(detector.model.name)
+    if profile is None:
+        return None
+    apply_profile(detector, profile)
+    print(f"Applied tuning profile: {describe(profile)}")
+    return profile
+
+def has_profile(detector):
+    return detector.model is not None and saved_profile(detector.model.name) is not None
+
+def scratch_copy(detector):
+    """A detector sharing detector's network but not its settings, cache or statistics, to tune on
+    while detector keeps serving requests. Its profile leaves the process-wide thread counts alone:
+    whoever owns detector applies it."""
+    scratch = copy.copy(detector)
+    scratch.model = copy.copy(detector.model)
+    scratch.cache = None
+    scratch.cascade = False
+    scratch.tune_threads = False
+    scratch.cascade_stats = dict(detector.cascade_stats)
+    return scratch
+
+def describe(profile):
+    return (f"{profile['intra_threads']} intra-op / {profile.get('inter_threads') or 'default'} inter-op threads, "
+            f"batch {profile['batch_size']}, input {profile['input_size']}, {'bf16' if profile['bf16'] else 'fp32'}")
+
+def _throughput(model, shape, batch, seconds=1.0, min_runs=3):
+    """Images per second of forward passes over random input."""
+    x = torch.rand(batch, 3, *shape)
+    model(x) # warm-up
+    runs, t0 = 0, time.perf_counter()
+    while runs < min_runs or time.perf_counter() - t0 < seconds:
+        model(x)
+        runs += 1
+    return runs * batch / (time.perf_counter() - t0)
+
+def _thread_candidates():
+    n = os.cpu_count() or 1
+    candidates = {n, max(1, n // 2)}
+    t = 1
+    while t < n:
+        candidates.add(t)
+        t *= 2
+    return sorted(candidates)
+
+def _agreement(detector, images, reference, **settings):
+    """F1 between the detections under `settings` and the reference detections."""
+    from .export import match_detections
+
+    saved = detector.input_size, detector.model.bf16
+    detector.input_size = settings.get('input_size', detector.input_size)
+    detector.model.bf16 = settings.get('bf16', detector.model.bf16)
+    try:
+        results = _detect(detector, images)
+    finally:
+        detector.input_size, detector.model.bf16 = saved
+    matched = ref_total = cand_total = 0
+    for ref, cand in zip(reference, results):
+        matched += match_detections(ref, cand)[0]
+        ref_total += len(ref)
+        cand_total += len(cand)
+    recall = matched / ref_total if ref_total else 1.0
+    precision = matched / cand_total if cand_total else 1.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+def _detect(detector, images, conf_threshold=0.25):
+    # Straight through _infer: the detection cache would hide the setting under test
+    results = []
+    for img in images:
+        shape = detector.model.fixed_shape or letterbox_shape(img.shape[:2], detector.input_size, detector.model.stride)
+        pred = detector._infer([img], shape, CONF_FLOOR)[0]
+        results.append(Detections.from_tensor(pred, detector.model.names).filter(conf_threshold))
+    return results
+
+@contextlib.contextmanager
+def _measuring(hold, threads):
+    """Gives a measurement the model to itself (see autotune's hold) on `threads` intra-op threads, and
+    puts the serving thread count back afterwards."""
+    with hold():
+        serving = torch.get_num_threads()
+        torch.set_num_threads(threads)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(serving)
+
+def _measure_interop(args):
+    # Runs in a fresh process: inter-op threads must be set before any parallel work
+    inter, intra, batch, shape, engine = args
+    torch.set_num_interop_threads(inter)
+    torch.set_num_threads(intra)
+    detector = BrainTumorDetector(use_cache=False, engine=engine, tune_threads=False)
+    if detector.model is None:
+        return 0.0
+    detector.model.bf16 = False
+    return _throughput(detector.model, shape, batch)
+
+def autotune(detector, images=(), full=True, seconds=1.0, log=print, hold=contextlib.nullcontext):
+    """
+    Measures and saves the best CPU profile for detector's engine.
+    images: BGR arrays used to check that bf16 / resolution changes keep the detections; without any,
+    only settings that leave the output unchanged are tuned. full=False (first launch) skips the
+    inter-op search and the largest batch size. hold: returns a context manager that every measurement
+    runs under, e.g. InferenceService.hold so live requests neither see the candidate thread counts
+    nor skew the timings.
+    """
+    model = detector.model
+    if model is None:
+        return None
+    shape = model.fixed_shape or (INPUT_SIZE, INPUT_SIZE)
+    model.bf16 = False
+    detector.input_size = INPUT_SIZE
+
+    # 1. Intra-op threads, on single-image latency (what the GUI waits on)
+    best_threads, best_rate = torch.get_num_threads(), 0.0
+    for t in _thread_candidates():
+        with _measuring(hold, t):
+            rate = _throughput(model, shape, 1, seconds)
+        log(f"  threads {t:>3}: {rate:.2f} img/s")
+        if rate > best_rate:
+            best_threads, best_rate = t, rate
+
+    # 2. Batch size, on throughput (batch and volume runs)
+    rates = {}
+    for b in BATCH_CANDIDATES if full else BATCH_CANDIDATES[:4]:
+        with _measuring(hold, best_threads):
+            rates[b] = _throughput(model, shape, b, seconds)
+        log(f"  batch {b:>3}: {rates[b]:.2f} img/s")
+    top = max(rates.values())
+    batch_size = min(b for b, r in rates.items() if r >= BATCH_SLACK * top)
+
+    # 3. Inter-op threads, each in a spawned process
+    inter_threads = None
+    if full:
+        ctx = mp.get_context('spawn')
+        inter_rates = {}
+        for inter in INTEROP_CANDIDATES:
+            with ctx.Pool(1) as pool:
+                inter_rates[inter] = pool.map(_measure_interop, [(inter, best_threads, batch_size, shape, model.name)])[0]
+            log(f"  inter-op {inter:>3}: {inter_rates[inter]:.2f} img/s")
+        inter_threads = max(inter_rates, key=inter_rates.get)
+
+    # 4. Output-changing settings: bf16 and reduced resolutions, only if faster and still in agreement
+    reference = None
+    if images:
+        with _measuring(hold, best_threads):
+            reference = _detect(detector, images)
+    bf16, input_size = False, INPUT_SIZE
+    if reference is not None:
+        try:
+            model.bf16 = True
+            with _measuring(hold, best_threads):
+                rate = _throughput(model, shape, 1, seconds)
+        except RuntimeError as e:
+            log(f"  bf16: not supported ({e})")
+            rate = 0.0
+        finally:
+            model.bf16 = False
+        if rate >= MIN_SPEEDUP * best_rate:
+            with _measuring(hold, best_threads):
+                f1 = _agreement(detector, images, reference, bf16=True)
+            log(f"  bf16: {rate:.2f} img/s, agreement {f1:.3f}")
+            bf16 = f1 >= MIN_AGREEMENT
+        elif rate:
+            log(f"  bf16: {rate:.2f} img/s, not faster")
+
+        if not model.fixed_shape:
+            for size in RESOLUTION_CANDIDATES:
+                model.bf16 = bf16
+                with _measuring(hold, best_threads):
+                    rate = _throughput(model, (size, size), 1, seconds)
+                model.bf16 = False
+                if rate < MIN_SPEEDUP * best_rate:
+                    log(f"  input {size}: {rate:.2f} img/s, not faster")
+                    continue
+                with _measuring(hold, best_threads):
+                    f1 = _agreement(detector, images, reference, input_size=size, bf16=bf16)
+                log(f"  input {size}: {rate:.2f} img/s, agreement {f1:.3f}")
+                if f1 >= MIN_AGREEMENT:
+                    input_size = size
+                    break
+    else:
+        log("  no sample images: bf16 and input resolution left at their defaults")
+
+    profile = {
+        'intra_threads': best_threads,
+        'inter_threads': inter_threads,
+        'batch_size': batch_size,
+        'input_size': input_size,
+        'bf16': bf16,
+        'measured_img_s': round(best_rate, 2),
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    save_profile(profile, model.name)
+    apply_profile(detector, profile)
+    log(f"Saved tuning profile: {describe(profile)}")
+    return profile
+
+def sample_images(image_dir=None, limit=16):
+    """Decoded images for the agreement check: image_dir, or the sample scans in the repository root."""
+    import cv2
+    from .batch import collect_images
+    from .detector import SRC_DIR
+
+    paths = collect_images(image_dir or os.path.dirname(SRC_DIR), recursive=image_dir is not None)[:limit]
+    images = [cv2.imread(p) for p in paths]
+    return [img for img in images if img is not None]
+
+def add_arguments(parser):
+    parser.add_argument('image_dir', nargs='?', default=None,
+                        help="images for the accuracy check (default: the bundled samples)")
+    parser.add_argument('--quick', action='store_true', help="skip the inter-op thread search")
+    parser.add_argument('--seconds', type=float, default=1.0, help="measurement time per setting")
+    parser.add_argument('--engine', default=None, help="inference engine: eager or torchscript (default: $BRAIN_MET_ENGINE or eager)")
+
+def main(args):
+    detector = BrainTumorDetector(use_cache=False, engine=args.engine, load=False)
+    if detector.device.type != 'cpu':
+        print("A GPU is in use; CPU tuning does not apply.")
+        return 0
+    detector.load_default_model()
+    if detector.model is None:
+        return 1
+    autotune(detector, sample_images(args.image_dir), full=not args.quick, seconds=args.seconds)
+    return 0
@@ -0,0 +1,151 @@
+"""
+Multi-slice MRI volumes (DICOM series and NIfTI) backed by memory-mapped arrays.
+
+A volume is converted once, slice by slice, into an uncompressed .npy file
+in the cache directory and then opened with np.load(mmap_mode='r'). Only the
+slices that are viewed or sent to the detector are paged in, so memory use
+does not grow with the number of slices. Uncompressed NIfTI files are mapped
+directly without a copy.
+"""
+import glob
+import hashlib
+import os
+
+from .cache import DEFAULT_CACHE_DIR
+from .lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+VOLUME_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'volumes')
+VOLUME_EXTS = ('.nii', '.nii.gz', '.dcm')
+
+def is_volume_path(path):
+    return os.path.isdir(path) or path.lower().endswith(VOLUME_EXTS)
+
+class Volume:
+    def __init__(self, data, source, spacing=None):
+        self.data = data # (slices, h, w), usually a read-only np.memmap
+        self.source = source
+        self.spacing = spacing
+        self.vmin, self.vmax = self._intensity_window()
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    def _intensity_window(self, samples=16):
+        # Percentiles over a few evenly spaced slices, so opening a volume reads only a handful of them
+        step = max(1, len(self) // samples)
+        sample = np.asarray(self.data[::step], dtype=np.float32)
+        lo, hi = np.percentile(sample, (1, 99))
+        return float(lo), float(max(hi, lo + 1))
+
+    def slice_gray(self, index):
+        """Slice as uint8 grayscale, windowed to the volume's intensity range."""
+        s = np.asarray(self.data[index], dtype=np.float32)
+        s = (s - self.vmin) * (255.0 / (self.vmax - self.vmin))
+        return np.clip(s, 0, 255).astype(np.uint8)
+
+    def slice_bgr(self, index):
+        """Slice as a 3-channel BGR uint8 array, the detector's input format."""
+        return cv2.cvtColor(self.slice_gray(index), cv2.COLOR_GRAY2BGR)
+
+def load_volume(path):
+    """Opens a NIfTI file, or a DICOM series given as a folder or any .dcm file inside it."""
+    if path.lower().endswith(('.nii', '.nii.gz')):
+        return load_nifti(path)
+    if path.lower().endswith('.dcm'):
+        path = os.path.dirname(path)
+    return load_dicom_series(path)
+
+def _cache_path(source_paths):
+    # Keyed by source paths, sizes and modification times so edited inputs are re-converted
+    h = hashlib.sha256()
+    for p in sorted(source_paths):
+        st = os.stat(p)
+        h.update(f"{os.path.abspath(p)}:{st.st_size}:{st.st_mtime_ns}".encode())
+    os.makedirs(VOLUME_CACHE_DIR, exist_ok=True)
+    return os.path.join(VOLUME_CACHE_DIR, h.hexdigest()[:32] + '.npy')
+
+def _write_memmap(path, shape, dtype, slices):
+    """Writes slices one at a time into a .npy file, then reopens it read-only."""
+    tmp_path = path + '.tmp'
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=shape)
+    for i, s in enumerate(slices):
+        out[i] = s
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r')
+
+def load_nifti(path):
+    try:
+        import nibabel as nib
+    except ImportError:
+        raise RuntimeError("Loading NIfTI volumes requires nibabel (pip install nibabel)")
+
+    img = nib.load(path, mmap=True)
+    if len(img.shape) < 3:
+        raise RuntimeError(f"{path} is not a volume (shape {img.shape})")
+    # 4D and up (e.g. a time series): the first volume
+    extra = (0,) * (len(img.shape) - 3)
+    spacing = tuple(float(z) for z in img.header.get_zooms()[:3])
+    # NIfTI stores (x, y, z); the viewer wants axial slices as (z, y, x)
+    if not path.lower().endswith('.gz') and img.dataobj.slope == 1 and img.dataobj.inter == 0:
+        data = np.asanyarray(img.dataobj)[(Ellipsis,) + extra]
+        return Volume(data.transpose(2, 1, 0), path, spacing)
+
+    # Compressed or scaled data cannot be mapped directly: convert once into the cache
+    cache_path = _cache_path([path])
+    if not os.path.exists(cache_path):
+        proxy = img.dataobj
+        depth = img.shape[2]
+        shape = (depth, img.shape[1], img.shape[0])
+        slices = (np.asarray(proxy[(slice(None), slice(None), z) + extra], dtype=np.float32).T for z in range(depth))
+        data = _write_memmap(cache_path, shape, np.float32, slices)
+    else:
+        data = np.load(cache_path, mmap_mode='r')
+    return Volume(data, path, spacing)
+
+def load_dicom_series(folder):
+    try:
+        import pydicom
+    except ImportError:
+        raise RuntimeError("Loading DICOM series requires pydicom (pip install pydicom)")
+
+    files = sorted(glob.glob(os.path.join(folder, '*.dcm')))
+    if not files:
+        raise RuntimeError(f"No .dcm files found in {folder}")
+
+    # Order slices by position along the scan axis, falling back to instance number
+    headers = [(pydicom.dcmread(f, stop_before_pixels=True), f) for f in files]
+    def position(item):
+        ds = item[0]
+        if 'ImagePositionPatient' in ds:
+            return float(ds.ImagePositionPatient[2])
+        return float(getattr(ds, 'InstanceNumber', 0))
+    headers.sort(key=position)
+    files = [f for _, f in headers]
+
+    first = headers[0][0]
+    spacing = None
+    if 'PixelSpacing' in first:
+        spacing = (float(getattr(first, 'SliceThickness', 1.0)), float(first.PixelSpacing[0]), float(first.PixelSpacing[1]))
+
+    cache_path = _cache_path(files)
+    if not os.path.exists(cache_path):
+        shape = (len(files), int(first.Rows), int(first.Columns))
+        def read_slices():
+            for f in files:
+                ds = pydicom.dcmread(f)
+                slope = float(getattr(ds, 'RescaleSlope', 1))
+                intercept = float(getattr(ds, 'RescaleIntercept', 0))
+                yield ds.pixel_array.astype(np.float32) * slope + intercept
+        data = _write_memmap(cache_path, shape, np.float32, read_slices())
+    else:
+        data = np.load(cache_path, mmap_mode='r')
+    return Volume(data, folder, spacing)
@@ -0,0 +1,290 @@
+"""
+Hot-folder watcher: analyzes images as the scanners drop them into a folder.
+
+A scanner thread polls the folder (standard library only, so it works the
+same on network shares). A new or changed file is only taken once its size
+and modification time have stayed the same for `settle` seconds, so the
+scanner's write has finished. Settled files go through a bounded queue to a
+worker thread that runs them through the detector in small batches. When
+the worker falls behind and the queue is full, the scanner stops taking
+files (they stay on disk and are picked up on a later scan) and counts a
+backpressure event instead of buffering without bound.
+
+Results go to the results store together with each file's size and
+modification time in the same transaction, so a restarted watcher skips
+everything it has already handled. Files that could not be analyzed are
+stored with their error (`main.py query --errors`) rather than as
+negatives; `watch --retry-errors` analyzes them again. Queue depth and latency (file first
+seen -> result stored) are available from status(), and latency is also
+recorded as the 'watch_latency' stage in backend.metrics.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError
+
+from . import metrics
+from .batch import IMAGE_EXTS
+from .cache import hash_file
+from .postprocess import CONF_FLOOR
+from .results import Detections
+
+DEFAULT_SETTLE = 1.0
+DEFAULT_POLL = 0.5
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_BATCH_SIZE = 8
+# Latency samples kept for the status percentiles
+LATENCY_WINDOW = 200
+
+class _Item:
+    __slots__ = ('path', 'size', 'mtime_ns', 'first_seen', 'changed_at', 'queued_at')
+
+    def __init__(self, path, size, mtime_ns, first_seen, changed_at):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.first_seen = first_seen
+        self.changed_at = changed_at
+        self.queued_at = None
+
+class FolderWatcher:
+    """
+    detect: callable taking a list of image paths and returning Detections at the floor threshold for each,
+    e.g. BrainTumorDetector.detect_batch_candidates. on_result(path, detections) is called from the worker
+    thread after each file is stored.
+    """
+
+    def __init__(self, folder, detect, store, conf_threshold=0.25, settle=DEFAULT_SETTLE, poll=DEFAULT_POLL,
+                 max_queue=DEFAULT_MAX_QUEUE, batch_size=DEFAULT_BATCH_SIZE, recursive=True, engine=None,
+                 on_result=None):
+        self.folder = os.path.abspath(folder)
+        self.detect = detect
+        self.store = store
+        self.conf_threshold = conf_threshold
+        self.settle = settle
+        self.poll = poll
+        self.batch_size = batch_size
+        self.recursive = recursive
+        self.engine = engine
+        self.on_result = on_result
+        self.queue = queue.Queue(max_queue)
+        self.max_queue = max_queue
+
+        self.handled = store.watched_files(self.folder) # path -> (size, mtime_ns) already analyzed
+        self._settling = {} # path -> _Item, changing or not yet settled
+        self._queued = set() # paths in the queue or on the model
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.counters = {'processed': 0, 'errors': 0, 'backpressure': 0}
+        self._backpressured = False
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._scan_loop, name='watch-scan', daemon=True),
+                         threading.Thread(target=self._work_loop, name='watch-work', daemon=True)]
+        for t in self._threads:
+            t.start()
+        print(f"Watching {self.folder} ({len(self.handled)} files already handled)")
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait:
+            self.join()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _scan(self):
+        """(path, size, mtime_ns) of every image under the folder."""
+        stack = [self.folder]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                stack.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTS):
+                            try:
+                                st = entry.stat()
+                            except OSError:
+                                continue # deleted while scanning
+                            yield entry.path, st.st_size, st.st_mtime_ns
+            except OSError:
+                continue
+
+    def _scan_loop(self):
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            settled, seen = [], set()
+            for path, size, mtime_ns in self._scan():
+                if self.handled.get(path) == (size, mtime_ns) or path in self._queued:
+                    continue
+                seen.add(path)
+                item = self._settling.get(path)
+                if item is None or (item.size, item.mtime_ns) != (size, mtime_ns):
+                    # New or still being written: (re)start the settle timer
+                    self._settling[path] = _Item(path, size, mtime_ns, item.first_seen if item else now, now)
+                elif size > 0 and now - item.changed_at >= self.settle:
+                    settled.append(item)
+            # Files removed before they settled
+            for path in set(self._settling) - seen:
+                del self._settling[path]
+
+            for item in sorted(settled, key=lambda i: i.first_seen):
+                item.queued_at = time.perf_counter()
+                try:
+                    self.queue.put_nowait(item)
+                except queue.Full:
+                    # Backpressure: leave the rest on disk until the worker catches up
+                    if not self._backpressured:
+                        self.counters['backpressure'] += 1
+                        print(f"Watch queue full ({self.max_queue}); waiting for inference to catch up.", flush=True)
+                    self._backpressured = True
+                    break
+                del self._settling[item.path]
+                with self._lock:
+                    self._queued.add(item.path)
+            else:
+                self._backpressured = False
+            self._stop.wait(self.poll)
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self.queue.get(timeout=self.poll)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        start = time.perf_counter()
+        for item in batch:
+            metrics.observe('watch_queue_wait', start - item.queued_at)
+        try:
+            results = self.detect([item.path for item in batch])
+        except CancelledError:
+            # Dropped by a shared inference service: release the files so a later scan queues them again
+            with self._lock:
+                for item in batch:
+                    self._queued.discard(item.path)
+            return
+        except Exception as e:
+            if self._stop.is_set():
+                return
+            print(f"Watch inference error: {e}")
+            results = [Detections.failed(f"inference error: {e}") for _ in batch]
+
+        records = []
+        for item, candidates in zip(batch, results):
+            if candidates.error:
+                print(f"{item.path}: {candidates.error}", flush=True)
+                records.append({'path': item.path, 'image_hash': None, 'detections': [], 'error': candidates.error})
+            else:
+                records.append({'path': item.path, 'image_hash': _hash(item.path),
+                                'detections': candidates.filter(self.conf_threshold).to_list()})
+        failed = sum(1 for record in records if 'error' in record)
+        # Failed files are marked as handled too, so a broken file is not retried forever;
+        # their error row keeps them queryable and --retry-errors runs them again
+        watched = [(item.path, item.size, item.mtime_ns) for item in batch]
+        try:
+            self.store.add_many(records, self.conf_threshold, self.engine, watched)
+        except Exception as e:
+            print(f"Could not store watch results: {e}")
+
+        done = time.perf_counter()
+        with self._lock:
+            for item in batch:
+                self._queued.discard(item.path)
+                self.handled[item.path] = (item.size, item.mtime_ns)
+                self._latencies.append(done - item.first_seen)
+                metrics.observe('watch_latency', done - item.first_seen)
+            self.counters['processed'] += len(records) - failed
+            self.counters['errors'] += failed
+        if self.on_result is not None:
+            for record in records:
+                if 'error' not in record:
+                    self.on_result(record['path'], record['detections'])
+
+    def status(self):
+        """Queue depth, files still settling, processed counts and latency percentiles in seconds."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counters = dict(self.counters)
+        p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+        return {
+            'queue_depth': self.queue.qsize(),
+            'max_queue': self.max_queue,
+            'settling': len(self._settling),
+            'latency_p50': p(0.5),
+            'latency_p95': p(0.95),
+            **counters,
+        }
+
+def _hash(path):
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+def format_status(status):
+    return (f"queue {status['queue_depth']}/{status['max_queue']}, settling {status['settling']}, "
+            f"processed {status['processed']}, latency p50 {status['latency_p50']:.1f}s "
+            f"p95 {status['latency_p95']:.1f}s, backpressure events {status['backpressure']}")
+
+def add_arguments(parser):
+    parser.add_argument('folder', help="folder the scanners export to")
+    parser.add_argument('--conf', type=float, default=0.25, help="confidence threshold")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help="seconds a file must stay unchanged before it is analyzed")
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL, help="seconds between folder scans")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="settled files waiting for the model")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="files per forward pass")
+    parser.add_argument('--no-recursive', action='store_true', help="only watch the top-level folder")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the on-disk detection cache")
+    parser.add_argument('--engine', default=None, help="inference engine: eager or torchscript (default: $BRAIN_MET_ENGINE or eager)")
+    parser.add_argument('--status-interval', type=float, default=10.0, help="seconds between status lines")
+    parser.add_argument('--retry-errors', action='store_true',
+                        help="analyze again the files in the folder whose earlier analysis failed")
+
+def main(args):
+    from .detector import BrainTumorDetector
+    from .store import ResultsStore
+
+    if not os.path.isdir(args.folder):
+        print(f"{args.folder} is not a folder.")
+        return 1
+    detector = BrainTumorDetector(use_cache=not args.no_cache, engine=args.engine)
+    if detector.model is None:
+        print("Model not loaded.")
+        return 1
+    detector.warmup()
+
+    def report(path, detections):
+        print(f"{path}: {len(detections)} lesion(s)", flush=True)
+
+    store = ResultsStore()
+    if args.retry_errors:
+        print(f"Retrying {store.forget_failed(args.folder)} file(s) whose analysis failed.")
+    watcher = FolderWatcher(args.folder, lambda paths: detector.detect_batch_candidates(paths, CONF_FLOOR),
+                            store, args.conf, args.settle, args.poll, args.max_queue, args.batch_size,
+                            recursive=not args.no_recursive, engine=detector.model.name, on_result=report)
+    watcher.start()
+    try:
+        while True:
+            time.sleep(args.status_interval)
+            print(format_status(watcher.status()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    watcher.stop()
+    return 0
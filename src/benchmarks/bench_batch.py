@@ -0,0 +1,83 @@
+"""
+Throughput benchmark: per-image detect() loop vs detect_batch().
+
+Usage:
+    python src/benchmarks/bench_batch.py [image_dir] [--repeat N]
+
+Without an image directory the sample MRI images in the repository root are used.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+# Add the src directory to python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+sys.path.append(src_dir)
+
+import numpy as np
+
+from backend.detector import BrainTumorDetector
+from backend.postprocess import CONF_FLOOR
+
+IMAGE_EXTS = ('*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tif')
+# Batching may change the float results slightly
+BOX_TOLERANCE = 1.0 # pixels
+SCORE_TOLERANCE = 1e-3
+
+def collect_images(image_dir):
+    paths = []
+    for ext in IMAGE_EXTS:
+        paths.extend(glob.glob(os.path.join(image_dir, ext)))
+    return sorted(paths)
+
+def same_detections(a, b):
+    """Same boxes, scores and classes within tolerance; both are sorted by score."""
+    if a.error or b.error or len(a) != len(b):
+        return False
+    return (np.array_equal(a.classes, b.classes)
+            and np.allclose(a.boxes, b.boxes, atol=BOX_TOLERANCE)
+            and np.allclose(a.scores, b.scores, atol=SCORE_TOLERANCE))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image_dir', nargs='?', default=os.path.dirname(src_dir))
+    parser.add_argument('--repeat', type=int, default=16, help="times the image list is repeated")
+    parser.add_argument('--conf', type=float, default=0.25)
+    args = parser.parse_args()
+
+    paths = collect_images(args.image_dir) * args.repeat
+    if not paths:
+        print(f"No images found in {args.image_dir}")
+        return 1
+
+    # The list repeats, so with the cache on both runs would mostly time cache hits
+    detector = BrainTumorDetector(use_cache=False)
+    if detector.model is None:
+        return 1
+
+    # Warm-up so lazy allocations are not timed
+    detector.detect(paths[0], args.conf)
+    floor = min(CONF_FLOOR, args.conf)
+
+    t0 = time.perf_counter()
+    loop_results = [detector.detect_candidates(p, floor).filter(args.conf) for p in paths]
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batch_results = [c.filter(args.conf) for c in detector.detect_batch_candidates(paths, floor)]
+    t_batch = time.perf_counter() - t0
+
+    mismatched = sum(not same_detections(a, b) for a, b in zip(loop_results, batch_results))
+
+    print(f"Images:      {len(paths)}")
+    print(f"Per-image:   {t_loop:.2f}s  ({len(paths) / t_loop:.1f} img/s)")
+    print(f"Batched:     {t_batch:.2f}s  ({len(paths) / t_batch:.1f} img/s)")
+    print(f"Speed-up:    {t_loop / t_batch:.2f}x")
+    print(f"Images with different detections: {mismatched}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Rendering benchmark for detection overlays: one QGraphicsRectItem per box
+(the previous approach) against the single DetectionOverlayItem.
+
+Usage:
+    python src/benchmarks/bench_overlay.py [--boxes 10 1000 10000] [--repeat N]
+
+Runs with the offscreen Qt platform, so no display is needed.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen
+from PyQt5.QtWidgets import QApplication, QGraphicsRectItem, QGraphicsScene
+
+# Add the src directory to python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from ui.overlay import DetectionOverlayItem
+
+IMAGE_SIZE = 2048
+
+def make_boxes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, IMAGE_SIZE - 80, size=(n, 2))
+    wh = rng.uniform(10, 80, size=(n, 2))
+    return np.hstack([xy, xy + wh]).astype(np.float32), rng.uniform(0.05, 1, size=n).astype(np.float32)
+
+def render(scene, target):
+    target.fill(0)
+    painter = QPainter(target)
+    scene.render(painter, QRectF(target.rect()), QRectF(0, 0, IMAGE_SIZE, IMAGE_SIZE))
+    painter.end()
+
+def bench_items(boxes, target, repeat):
+    scene = QGraphicsScene()
+    items = []
+    pen = QPen(QColor(255, 0, 0), 3)
+    t_update = t_render = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            scene.removeItem(item)
+        items.clear()
+        for x1, y1, x2, y2 in boxes.tolist():
+            item = QGraphicsRectItem(x1, y1, x2 - x1, y2 - y1)
+            item.setPen(pen)
+            scene.addItem(item)
+            items.append(item)
+        t1 = time.perf_counter()
+        render(scene, target)
+        t2 = time.perf_counter()
+        t_update += t1 - t0
+        t_render += t2 - t1
+    return t_update / repeat, t_render / repeat
+
+def bench_overlay(boxes, scores, target, repeat, score_colors=False, heatmap=False):
+    scene = QGraphicsScene()
+    overlay = DetectionOverlayItem(IMAGE_SIZE, IMAGE_SIZE)
+    overlay.set_score_colors(score_colors)
+    overlay.set_heatmap(heatmap)
+    scene.addItem(overlay)
+    t_update = t_render = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        overlay.set_detections(boxes, scores)
+        t1 = time.perf_counter()
+        render(scene, target)
+        t2 = time.perf_counter()
+        t_update += t1 - t0
+        t_render += t2 - t1
+    return t_update / repeat, t_render / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--boxes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    target = QImage(1024, 1024, QImage.Format_RGB32)
+
+    print(f"{'boxes':>7} {'mode':<22} {'update ms':>10} {'render ms':>10}")
+    for n in args.boxes:
+        boxes, scores = make_boxes(n)
+        rows = [
+            ("rect items", bench_items(boxes, target, args.repeat)),
+            ("overlay", bench_overlay(boxes, scores, target, args.repeat)),
+            ("overlay + score colours", bench_overlay(boxes, scores, target, args.repeat, score_colors=True)),
+            ("overlay + heatmap", bench_overlay(boxes, scores, target, args.repeat, heatmap=True)),
+        ]
+        for mode, (t_update, t_render) in rows:
+            print(f"{n:>7} {mode:<22} {t_update * 1000:>10.2f} {t_render * 1000:>10.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
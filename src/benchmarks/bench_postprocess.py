@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of detection post-processing: the previous pandas path
+(results.pandas() + DataFrame.iterrows) against the array-backed Detections.
+
+Usage:
+    python src/benchmarks/bench_postprocess.py [--candidates N] [--iterations N]
+
+Runs on synthetic prediction tensors, so no model weights are needed.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import torch
+
+# Add the src directory to python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from backend.results import Detections
+
+NAMES = ['metastasis']
+
+def make_pred(n, seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 500, size=(n, 2))
+    wh = rng.uniform(5, 60, size=(n, 2))
+    conf = rng.uniform(0.05, 1.0, size=(n, 1))
+    cls = rng.integers(0, len(NAMES), size=(n, 1))
+    return torch.from_numpy(np.hstack([xy, xy + wh, conf, cls]).astype(np.float32))
+
+def pandas_path(pred, names):
+    import pandas as pd
+
+    # Same construction as YOLOv7 Detections.pandas().xyxy[i]
+    ca = 'xmin', 'ymin', 'xmax', 'ymax', 'confidence', 'class', 'name'
+    rows = [x[:5] + [int(x[5]), names[int(x[5])]] for x in pred.tolist()]
+    df = pd.DataFrame(rows, columns=ca)
+
+    detections = []
+    for _, row in df.iterrows():
+        detections.append({
+            'label': row['name'],
+            'conf': float(row['confidence']),
+            'bbox': [int(row['xmin']), int(row['ymin']), int(row['xmax']), int(row['ymax'])]
+        })
+    return detections
+
+def array_path(pred, names):
+    return Detections.from_tensor(pred, names).to_list()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candidates', type=int, nargs='+', default=[0, 5, 50, 300])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'candidates':>10} {'pandas (us)':>12} {'arrays (us)':>12} {'filter (us)':>12} {'speed-up':>9}")
+    for n in args.candidates:
+        pred = make_pred(n)
+        assert pandas_path(pred, NAMES) == array_path(pred, NAMES)
+
+        t_pandas = timeit.timeit(lambda: pandas_path(pred, NAMES), number=args.iterations) / args.iterations
+        t_arrays = timeit.timeit(lambda: array_path(pred, NAMES), number=args.iterations) / args.iterations
+        dets = Detections.from_tensor(pred, NAMES)
+        t_filter = timeit.timeit(lambda: dets.filter(0.25), number=args.iterations) / args.iterations
+
+        print(f"{n:>10} {t_pandas * 1e6:>12.1f} {t_arrays * 1e6:>12.1f} {t_filter * 1e6:>12.1f} {t_pandas / t_arrays:>8.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
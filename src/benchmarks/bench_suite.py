@@ -0,0 +1,179 @@
+"""
+End-to-end benchmark suite on the stub model, runnable in CI.
+
+Times image decode, BrainTumorDetector.detect end to end, post-processing
+(NMS, box scaling, Detections), ImageViewer.draw_detections with a repaint,
+and PDF report export, all under the offscreen Qt platform. Results are
+written as JSON and checked against absolute limits in thresholds.json and,
+optionally, against a previous run.
+
+Usage:
+    python src/benchmarks/bench_suite.py [--out bench.json] [--baseline previous.json] [--tolerance 1.25]
+
+Exits with status 1 when a stage is over its threshold or regressed beyond
+the tolerance, so a CI job can run it on every commit.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import torch
+from PyQt5.QtWidgets import QApplication
+
+# Add the src directory to python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+sys.path.append(src_dir)
+
+from stub_model import make_stub_detector, synthetic_image
+from backend.batch import collect_images
+from backend.detector import CONF_FLOOR, letterbox_shape, non_max_suppression, preprocess, scale_boxes
+from backend.image import SharedImage
+from backend.report import write_report
+from backend.results import Detections
+from ui.viewer import ImageViewer
+
+THRESHOLDS_PATH = os.path.join(current_dir, 'thresholds.json')
+
+def measure(fn, repeat, warmup=1):
+    """Per-call wall times in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+def summarize(times):
+    t = np.asarray(times)
+    return {
+        'median_ms': round(float(np.median(t)), 3),
+        'p95_ms': round(float(np.percentile(t, 95)), 3),
+        'min_ms': round(float(t.min()), 3),
+        'runs': len(t),
+    }
+
+def prepare_images(tmp_dir):
+    """Sample scans from the repository root, or synthetic ones when they are missing."""
+    paths = collect_images(os.path.dirname(src_dir), recursive=False)
+    if paths:
+        return paths
+    import cv2
+    for i in range(3):
+        path = os.path.join(tmp_dir, f"synthetic_{i}.png")
+        cv2.imwrite(path, synthetic_image(seed=i))
+        paths.append(path)
+    return paths
+
+def run_suite(repeat):
+    app = QApplication.instance() or QApplication(sys.argv)
+    torch.manual_seed(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = prepare_images(tmp_dir)
+        detector = make_stub_detector()
+        image = SharedImage.from_file(paths[0])
+
+        results['decode'] = summarize(measure(lambda: [SharedImage.from_file(p) for p in paths], repeat))
+
+        # Cache is off, so every call runs read, decode, preprocess, forward and NMS
+        results['detect_e2e'] = summarize(measure(lambda: detector.detect(paths[0]), repeat))
+
+        shape = letterbox_shape(image.pixels.shape[:2], stride=detector.model.stride)
+        x, meta = preprocess([image.pixels], shape)
+        raw = detector.model(x)
+
+        def postprocess():
+            preds = non_max_suppression(raw, CONF_FLOOR)
+            gain, pad = meta[0]
+            scale_boxes(preds[0], gain, pad, image.pixels.shape[:2])
+            return Detections.from_tensor(preds[0], detector.model.names).filter(0.25)
+        results['postprocess'] = summarize(measure(postprocess, repeat))
+
+        candidates = detector.detect_candidates(image)
+        viewer = ImageViewer()
+        viewer.resize(800, 800)
+        viewer.show()
+        viewer.load_image(paths[0], image)
+        app.processEvents()
+
+        def draw():
+            viewer.draw_detections(candidates)
+            viewer.viewport().repaint()
+        results['draw_detections'] = summarize(measure(draw, repeat))
+        viewer.close()
+
+        detections = candidates.filter(0.25).to_list()
+        report_path = os.path.join(tmp_dir, 'report.pdf')
+        results['export_report'] = summarize(measure(lambda: write_report(report_path, image.pixels, detections), repeat))
+        results['detections'] = len(detections)
+    return results
+
+def check(results, thresholds, baseline=None, tolerance=1.25):
+    """Returns a list of failure messages."""
+    failures = []
+    for stage, limit in thresholds.items():
+        if stage in results and results[stage]['median_ms'] > limit:
+            failures.append(f"{stage}: {results[stage]['median_ms']:.2f} ms over the {limit} ms threshold")
+    if baseline:
+        for stage, stats in results.items():
+            if not isinstance(stats, dict) or stage not in baseline.get('stages', {}):
+                continue
+            before = baseline['stages'][stage]['median_ms']
+            if before > 0 and stats['median_ms'] > before * tolerance:
+                failures.append(f"{stage}: {stats['median_ms']:.2f} ms vs {before:.2f} ms in the baseline "
+                                f"(+{100 * (stats['median_ms'] / before - 1):.0f}%)")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--out', default='bench.json', help="JSON results file")
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help="JSON of stage -> max median ms")
+    parser.add_argument('--baseline', default=None, help="previous results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="allowed slowdown factor vs the baseline")
+    args = parser.parse_args()
+
+    stages = run_suite(args.repeat)
+    detections = stages.pop('detections')
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'torch': torch.__version__, 'threads': torch.get_num_threads()},
+        'repeat': args.repeat,
+        'detections': detections,
+        'stages': stages,
+    }
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'stage':<16} {'median ms':>10} {'p95 ms':>10}")
+    for stage, stats in stages.items():
+        print(f"{stage:<16} {stats['median_ms']:>10.2f} {stats['p95_ms']:>10.2f}")
+    print(f"Results written to {args.out}")
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds, 'r', encoding='utf-8') as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    failures = check(stages, thresholds, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Recall versus latency for whole-image and tiled inference.
+
+Usage:
+    python src/benchmarks/bench_tiling.py image_dir [--labels label_dir] [--tiles 640:0.2 512:0.25 ...]
+
+Ground truth is read from YOLO-format label files (class cx cy w h, normalized),
+one <image stem>.txt per image, looked up in --labels or next to the images.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add the src directory to python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from backend.batch import collect_images
+from backend.detector import BrainTumorDetector
+from backend.postprocess import box_iou
+
+def load_labels(image_path, label_dir):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    label_path = os.path.join(label_dir or os.path.dirname(image_path), stem + '.txt')
+    if not os.path.exists(label_path):
+        return None
+    h, w = cv2.imread(image_path).shape[:2]
+    rows = np.loadtxt(label_path, ndmin=2)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], 1).astype(np.float32)
+
+def recall(pred_boxes, gt_boxes, iou_threshold=0.5):
+    if len(gt_boxes) == 0:
+        return 0, 0
+    hits = sum(1 for gt in gt_boxes if len(pred_boxes) and box_iou(gt, pred_boxes).max() >= iou_threshold)
+    return hits, len(gt_boxes)
+
+def parse_tile(spec):
+    size, overlap = spec.split(':')
+    return int(size), float(overlap)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('image_dir')
+    parser.add_argument('--labels', default=None, help="folder with YOLO label files")
+    parser.add_argument('--tiles', type=parse_tile, nargs='+', default=[(640, 0.2), (512, 0.25), (320, 0.25)],
+                        help="tile configurations as size:overlap")
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--tile-workers', type=int, default=1)
+    args = parser.parse_args()
+
+    samples = [(p, load_labels(p, args.labels)) for p in collect_images(args.image_dir)]
+    samples = [(p, gt) for p, gt in samples if gt is not None]
+    if not samples:
+        print("No labelled images found.")
+        return 1
+
+    print(f"{'mode':<16} {'recall':>8} {'detections':>11} {'ms/image':>10}")
+    for config in [None] + args.tiles:
+        if config is None:
+            detector = BrainTumorDetector(use_cache=False)
+            mode = "whole image"
+        else:
+            detector = BrainTumorDetector(use_cache=False, tile_size=config[0], tile_overlap=config[1],
+                                          tile_workers=args.tile_workers)
+            mode = f"tiles {config[0]}/{config[1]:.2f}"
+        if detector.model is None:
+            return 1
+        detector.warmup()
+
+        hits, total, count = 0, 0, 0
+        t0 = time.perf_counter()
+        for path, gt in samples:
+            dets = detector.detect_candidates(path).filter(args.conf)
+            h, n = recall(dets.boxes, gt)
+            hits, total, count = hits + h, total + n, count + len(dets)
+        elapsed = (time.perf_counter() - t0) / len(samples)
+
+        print(f"{mode:<16} {hits / max(total, 1):>8.3f} {count:>11} {elapsed * 1000:>10.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
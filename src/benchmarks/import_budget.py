@@ -0,0 +1,115 @@
+"""
+Start-up import budget check, runnable in CI.
+
+Runs each start-up path in a fresh interpreter under `python -X importtime`
+and fails when its total import time exceeds the budget in
+import_budget.json, or when it imports a module that must stay lazy
+(torch, cv2, numpy, the YOLOv7 dependencies, ...; see backend/lazy.py).
+Each scenario runs several times and the fastest run counts, which keeps
+the check stable on a loaded CI machine.
+
+Usage:
+    python src/benchmarks/import_budget.py [--runs 3] [--budget import_budget.json] [--out imports.json]
+
+Exits with status 1 on any violation and prints the slowest imports of
+the offending scenario.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+BUDGET_PATH = os.path.join(current_dir, 'import_budget.json')
+
+# Scenario -> arguments after `python -X importtime`
+SCENARIOS = {
+    'cli_help': [os.path.join(src_dir, 'main.py'), '--help'],
+    'batch_help': [os.path.join(src_dir, 'main.py'), 'batch', '--help'],
+    # Everything imported before the window can be created (run_gui imports ui.window)
+    'gui_window': ['-c', "import sys; sys.path.insert(0, sys.argv[1]); import ui.window", src_dir],
+}
+
+# Top-level packages none of the start-up paths may import
+FORBIDDEN = ('torch', 'torchvision', 'cv2', 'numpy', 'PIL', 'pandas', 'seaborn', 'matplotlib', 'yaml', 'scipy')
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def run_scenario(args):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        # The import time lines are still useful; the error is reported with the result
+        tail = [l for l in proc.stderr.splitlines() if not l.startswith('import time:')][-1:]
+        return parse_importtime(proc.stderr), tail[0] if tail else f"exit status {proc.returncode}"
+    return parse_importtime(proc.stderr), None
+
+def measure(runs):
+    results = {}
+    for name, args in SCENARIOS.items():
+        best = None
+        for _ in range(runs):
+            rows, error = run_scenario(args)
+            total = sum(self_us for _, self_us, _ in rows) / 1000
+            if best is None or total < best['total_ms']:
+                slowest = sorted(rows, key=lambda r: -r[2])[:10]
+                best = {
+                    'total_ms': round(total, 1),
+                    'modules': len(rows),
+                    'forbidden': sorted({m for m, _, _ in rows if m.split('.')[0] in FORBIDDEN}),
+                    'slowest': [(m, round(c / 1000, 1)) for m, _, c in slowest],
+                    'error': error,
+                }
+        results[name] = best
+    return results
+
+def check(results, budget):
+    failures = []
+    for name, r in results.items():
+        if r['error']:
+            failures.append(f"{name}: failed to run ({r['error']})")
+        if r['forbidden']:
+            failures.append(f"{name}: imports {', '.join(r['forbidden'])} at start-up")
+        limit = budget.get(name)
+        if limit is not None and r['total_ms'] > limit:
+            failures.append(f"{name}: {r['total_ms']:.1f} ms of imports, budget {limit} ms")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help="runs per scenario; the fastest counts")
+    parser.add_argument('--budget', default=BUDGET_PATH, help="JSON of scenario -> max total import ms")
+    parser.add_argument('--out', default=None, help="also write the measurements as JSON")
+    args = parser.parse_args()
+
+    with open(args.budget, 'r', encoding='utf-8') as f:
+        budget = json.load(f)
+    results = measure(args.runs)
+
+    print(f"{'scenario':<12} {'imports ms':>11} {'budget':>8} {'modules':>8}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['total_ms']:>11.1f} {budget.get(name, '-'):>8} {r['modules']:>8}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failures = check(results, budget)
+    for failure in failures:
+        print(f"FAIL {failure}")
+        scenario = failure.split(':', 1)[0]
+        for module, ms in results[scenario]['slowest']:
+            print(f"    {ms:>8.1f} ms  {module}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Deterministic stand-in for the YOLOv7 model, for benchmarks that must run
+without weight/best.pt and yolov7-main.
+
+StubHubModel exposes what the detector takes from the torch.hub wrapper
+(.model, .names, .stride) and, like autoShape, can be called on images to
+get results with .xyxy. The network is a small fixed-seed conv stack, so a
+forward pass has a real cost, and its raw output has the YOLO layout
+(B, N, 5 + nc). Objectness comes from local image brightness, so the
+same image always gives the same boxes.
+"""
+import os
+import sys
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+# Add the src directory to python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_dir))
+
+from backend.detector import (INPUT_SIZE, BrainTumorDetector, EagerEngine, letterbox_shape, non_max_suppression,
+                              preprocess, scale_boxes)
+
+STRIDES = (8, 16, 32)
+ANCHOR_SCALES = (1.5, 3.0, 6.0) # box side as a multiple of the stride
+NAMES = ['metastasis']
+
+class StubYoloModule(torch.nn.Module):
+    def __init__(self, nc=1, seed=0):
+        super().__init__()
+        self.nc = nc
+        self.backbone = torch.nn.Sequential(
+            torch.nn.Conv2d(3, 16, 3, 2, 1), torch.nn.SiLU(),
+            torch.nn.Conv2d(16, 32, 3, 2, 1), torch.nn.SiLU(),
+            torch.nn.Conv2d(32, 64, 3, 2, 1), torch.nn.SiLU(),
+        )
+        generator = torch.Generator().manual_seed(seed)
+        with torch.no_grad():
+            for p in self.parameters():
+                p.copy_(torch.randn(p.shape, generator=generator) * 0.1)
+
+    def forward(self, x):
+        feats = self.backbone(x) # stride 8
+        brightness = x.mean(1, keepdim=True)
+        outputs = []
+        for s in STRIDES:
+            b = F.avg_pool2d(brightness, s)
+            f = F.avg_pool2d(feats.mean(1, keepdim=True), s // STRIDES[0]) if s > STRIDES[0] else feats.mean(1, keepdim=True)
+            logit = 12 * (b - 0.6) + 0.01 * f
+            bs, _, ny, nx = b.shape
+            yv, xv = torch.meshgrid(torch.arange(ny, device=x.device), torch.arange(nx, device=x.device), indexing='ij')
+            cx = ((xv + 0.5) * s).float().expand(bs, ny, nx)
+            cy = ((yv + 0.5) * s).float().expand(bs, ny, nx)
+            obj = torch.sigmoid(logit[:, 0])
+            for scale in ANCHOR_SCALES:
+                wh = torch.full_like(cx, s * scale)
+                cls = torch.ones(bs, ny, nx, self.nc, device=x.device)
+                rows = torch.cat([torch.stack([cx, cy, wh, wh, obj], -1), cls], -1)
+                outputs.append(rows.view(bs, -1, 5 + self.nc))
+        # YOLOv7 returns (predictions, feature maps) in eval mode
+        return torch.cat(outputs, 1), [feats]
+
+class StubResults:
+    """Subset of the YOLOv7 autoShape Detections interface."""
+
+    def __init__(self, xyxy, names):
+        self.xyxy = xyxy # one (n, 6) tensor per image
+        self.names = names
+        self.n = len(xyxy)
+
+    def __len__(self):
+        return self.n
+
+class StubHubModel:
+    def __init__(self, nc=1, seed=0):
+        self.model = StubYoloModule(nc, seed).eval()
+        self.names = NAMES if nc == 1 else [f'class{i}' for i in range(nc)]
+        self.stride = torch.tensor([float(s) for s in STRIDES])
+        self.conf = 0.25
+        self.iou = 0.45
+
+    def to(self, device):
+        self.model.to(device)
+        return self
+
+    def eval(self):
+        return self
+
+    def __call__(self, imgs, size=INPUT_SIZE):
+        """imgs: one BGR array or a list of them, like cv2.imread returns."""
+        imgs = imgs if isinstance(imgs, list) else [imgs]
+        shape = letterbox_shape(max((im.shape[:2] for im in imgs), key=max), size, int(self.stride.max()))
+        x, meta = preprocess(imgs, shape)
+        with torch.no_grad():
+            preds = non_max_suppression(self.model(x.to(next(self.model.parameters()).device))[0], self.conf, self.iou)
+        for pred, img, (gain, pad) in zip(preds, imgs, meta):
+            scale_boxes(pred, gain, pad, img.shape[:2])
+        return StubResults(preds, self.names)
+
+def make_stub_detector(**kwargs):
+    """BrainTumorDetector running the stub model through the eager engine. The detection cache is off by default."""
+    kwargs.setdefault('use_cache', False)
+    detector = BrainTumorDetector(load=False, **kwargs)
+    hub_model = StubHubModel().to(detector.device)
+    # The stub source file stands in for the weights in cache keys
+    detector.model = EagerEngine(hub_model.model, hub_model.names, hub_model.stride.max(), detector.device,
+                                 os.path.abspath(__file__))
+    return detector
+
+def synthetic_image(size=512, lesions=3, seed=0):
+    """Dark BGR slice with a few bright blobs, so the stub finds something."""
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 60, size=(size, size, 3), dtype=np.uint8)
+    for _ in range(lesions):
+        cx, cy = rng.integers(size // 8, size - size // 8, size=2)
+        r = int(rng.integers(size // 40, size // 12))
+        yy, xx = np.ogrid[:size, :size]
+        img[(xx - cx) ** 2 + (yy - cy) ** 2 <= r * r] = 230
+    return img
@@ -1,23 +1,73 @@
+import time
+LAUNCH_TIME = time.perf_counter()
+
 import sys
 import os
+import argparse
+import importlib
 
 # Add the src directory to python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from PyQt5.QtWidgets import QApplication
-from ui.window import MainWindow
+def run_gui(qt_args):
+    from PyQt5.QtWidgets import QApplication
+    from ui.window import MainWindow
+
+    app = QApplication(qt_args)
 
-def main():
-    app = QApplication(sys.argv)
-    
     # Set app style/palette here if needed for generic "dark mode" or similar
     app.setStyle("Fusion")
 
-    window = MainWindow()
+    window = MainWindow(launch_time=LAUNCH_TIME)
     window.show()
-    
-    sys.exit(app.exec_())
+
+    return app.exec_()
+
+# Sub-commands: name -> (module, argument function, entry point, help)
+COMMANDS = {
+    'batch': ('backend.batch', 'add_arguments', 'main', "run detection headless over a folder of images"),
+    'export': ('backend.export', 'add_export_arguments', 'export_main', "export the TorchScript inference engine"),
+    'compile': ('backend.export', 'add_compile_arguments', 'compile_main', "write the self-contained model artifact for fast start-up"),
+    'compare-engines': ('backend.export', 'add_compare_arguments', 'compare_main', "compare engine latency and accuracy"),
+    'serve': ('backend.server', 'add_arguments', 'main', "run a local inference server shared by several GUIs"),
+    'tune': ('backend.tuning', 'add_arguments', 'main', "benchmark and save the best CPU inference settings"),
+    'report': ('backend.report', 'add_arguments', 'main', "write PDF reports for a folder of images"),
+    'cascade-eval': ('backend.cascade', 'add_arguments', 'main', "compare cascade and single-pass detection on a folder"),
+    'query': ('backend.store', 'add_arguments', 'main', "query stored results, e.g. studies with 2+ lesions above 0.6"),
+    'watch': ('backend.watch', 'add_arguments', 'main', "analyze images as they appear in a folder"),
+}
+
+def build_parser(command=None):
+    """Only the module of `command` is imported, so `--help` and every sub-command start without the others.
+    Without a command the parser is the GUI's: it lists the sub-commands but takes none of them."""
+    parser = argparse.ArgumentParser(description="Brain Metastases Diagnosis System")
+    if command is None:
+        parser.formatter_class = argparse.RawDescriptionHelpFormatter
+        parser.epilog = "sub-commands:\n" + "\n".join(
+            f"  {name:<18}{help_text}" for name, (_, _, _, help_text) in COMMANDS.items())
+        return parser
+
+    subparsers = parser.add_subparsers(dest='command')
+
+    for name, (module_name, add_arguments, entry_point, help_text) in COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=help_text)
+        if name == command:
+            module = importlib.import_module(module_name)
+            getattr(module, add_arguments)(command_parser)
+            command_parser.set_defaults(func=getattr(module, entry_point))
+
+    return parser
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] in COMMANDS else None
+    if command is not None:
+        args = build_parser(command).parse_args()
+        sys.exit(args.func(args))
+
+    # No sub-command: start the GUI. Arguments it does not know (e.g. -platform offscreen) go to Qt
+    _, remainder = build_parser().parse_known_args()
+    sys.exit(run_gui([sys.argv[0]] + remainder))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,218 @@
+"""
+Study gallery sidebar: a virtualised list of thumbnails for a whole folder.
+
+Only rows the view actually paints ask for a thumbnail, and those requests
+are served newest-first by a small thread pool, so the visible screen fills
+first even while scrolling quickly through thousands of images. Thumbnails
+come from the on-disk ThumbnailCache and are kept in a bounded in-memory LRU.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import (QAbstractListModel, QModelIndex, QObject, QRunnable, QSize, Qt, QThreadPool,
+                          pyqtSignal)
+from PyQt5.QtGui import QColor, QImage, QPixmap
+from PyQt5.QtWidgets import QFileDialog, QLabel, QListView, QPushButton, QVBoxLayout, QWidget
+
+from backend.batch import collect_images
+from backend.thumbnails import THUMBNAIL_SIZE, ThumbnailCache
+
+# Thumbnails kept as QPixmaps for fast repaint
+MAX_PIXMAPS = 2000
+# Queued requests beyond this are dropped (they scrolled out of view long ago)
+MAX_QUEUED = 256
+THUMBNAIL_THREADS = 4
+
+class _ThumbnailSignals(QObject):
+    ready = pyqtSignal(int, str, object) # generation, path, QImage or None
+    dropped = pyqtSignal(int, str) # generation, path of a request evicted from the queue unserved
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    def run(self):
+        self.loader._work()
+
+class ThumbnailLoader:
+    """LIFO request queue in front of a dedicated thread pool."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.signals = _ThumbnailSignals()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(THUMBNAIL_THREADS)
+        self._lock = threading.Lock()
+        self._queue = OrderedDict() # path -> generation, most recent request last
+        self.generation = 0
+
+    def reset(self):
+        with self._lock:
+            self.generation += 1
+            self._queue.clear()
+
+    def request(self, path):
+        dropped = []
+        with self._lock:
+            if path in self._queue:
+                self._queue.move_to_end(path)
+                return
+            self._queue[path] = self.generation
+            while len(self._queue) > MAX_QUEUED:
+                dropped.append(self._queue.popitem(last=False))
+        for old_path, generation in dropped:
+            self.signals.dropped.emit(generation, old_path)
+        self.pool.start(_ThumbnailJob(self))
+
+    def _work(self):
+        # Serve the most recent request, i.e. what is on screen right now
+        with self._lock:
+            if not self._queue:
+                return
+            path, generation = self._queue.popitem(last=True)
+        thumb = self.cache.get(path)
+        image = None
+        if thumb is not None:
+            h, w = thumb.shape[:2]
+            image = QImage(thumb.data, w, h, thumb.strides[0], QImage.Format_RGB888).copy()
+        self.signals.ready.emit(generation, path, image)
+
+class GalleryModel(QAbstractListModel):
+    def __init__(self, loader, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.loader.signals.ready.connect(self._on_thumbnail_ready)
+        self.loader.signals.dropped.connect(self._on_thumbnail_dropped)
+        self.paths = []
+        self.rows = {} # path -> row
+        self.pixmaps = OrderedDict() # path -> QPixmap, LRU
+        self.requested = set()
+        self.placeholder = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        self.placeholder.fill(QColor("#1e293b"))
+
+    def set_paths(self, paths):
+        self.beginResetModel()
+        self.loader.reset()
+        self.paths = list(paths)
+        self.rows = {p: i for i, p in enumerate(self.paths)}
+        self.pixmaps.clear()
+        self.requested.clear()
+        self.endResetModel()
+
+    def add_path(self, path):
+        if path in self.rows:
+            return
+        row = len(self.paths)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.paths.append(path)
+        self.rows[path] = row
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(path)
+        if role == Qt.ToolTipRole:
+            return path
+        if role == Qt.UserRole:
+            return path
+        if role == Qt.DecorationRole:
+            pixmap = self.pixmaps.get(path)
+            if pixmap is not None:
+                self.pixmaps.move_to_end(path)
+                return pixmap
+            # data() is only asked for rows being painted, so requests follow the viewport
+            if path not in self.requested:
+                self.requested.add(path)
+                self.loader.request(path)
+            return self.placeholder
+        return None
+
+    def _on_thumbnail_ready(self, generation, path, image):
+        if generation != self.loader.generation or path not in self.rows:
+            return
+        self.requested.discard(path)
+        if image is None:
+            return
+        self.pixmaps[path] = QPixmap.fromImage(image)
+        while len(self.pixmaps) > MAX_PIXMAPS:
+            evicted, _ = self.pixmaps.popitem(last=False)
+            self.requested.discard(evicted)
+        index = self.index(self.rows[path])
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def _on_thumbnail_dropped(self, generation, path):
+        # Never served: let the next data() call for this row ask again
+        if generation == self.loader.generation:
+            self.requested.discard(path)
+
+class GalleryPanel(QWidget):
+    image_selected = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setObjectName("GalleryPanel")
+        self.setFixedWidth(THUMBNAIL_SIZE + 60)
+        self.folder = None
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(8)
+
+        self.lbl_title = QLabel("STUDY GALLERY")
+        self.lbl_title.setStyleSheet("color: #64748b; font-weight: bold; font-size: 12px;")
+        layout.addWidget(self.lbl_title)
+
+        self.btn_open = QPushButton("Open Folder")
+        self.btn_open.setProperty("class", "ToolbarBtn")
+        self.btn_open.setCursor(Qt.PointingHandCursor)
+        self.btn_open.clicked.connect(self.choose_folder)
+        layout.addWidget(self.btn_open)
+
+        self.model = GalleryModel(ThumbnailLoader(ThumbnailCache()), self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setViewMode(QListView.IconMode)
+        self.view.setFlow(QListView.TopToBottom)
+        self.view.setWrapping(False)
+        self.view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.view.setGridSize(QSize(THUMBNAIL_SIZE + 20, THUMBNAIL_SIZE + 30))
+        # Uniform sizes and batched layout keep the view virtualised for thousands of rows
+        self.view.setUniformItemSizes(True)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(200)
+        self.view.setMovement(QListView.Static)
+        self.view.setStyleSheet("background-color: white; border-radius: 8px; border: none;")
+        # Current-item changes cover both clicks and stepping with the arrow keys
+        self.view.selectionModel().currentChanged.connect(self._on_current_changed)
+        layout.addWidget(self.view, stretch=1)
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Study Folder")
+        if folder:
+            self.open_folder(folder)
+
+    def open_folder(self, folder, paths=None):
+        paths = paths if paths is not None else collect_images(folder)
+        self.folder = os.path.abspath(folder)
+        self.model.set_paths(paths)
+        self.lbl_title.setText(f"STUDY GALLERY ({len(paths)})")
+
+    def add_image(self, path):
+        """Appends an image that appeared in the open folder (e.g. from the folder watcher)."""
+        self.model.add_path(path)
+        self.lbl_title.setText(f"STUDY GALLERY ({len(self.model.paths)})")
+
+    def paths(self):
+        return list(self.model.paths)
+
+    def _on_current_changed(self, current, previous):
+        if current.isValid():
+            self.image_selected.emit(current.data(Qt.UserRole))
@@ -0,0 +1,117 @@
+"""
+History panel: past results from the results store (backend.store).
+"""
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import (QComboBox, QDialog, QDoubleSpinBox, QHBoxLayout, QLabel, QPushButton, QSpinBox,
+                             QTableWidget, QTableWidgetItem, QVBoxLayout)
+import os
+import time
+
+from backend.store import study_of
+
+MAX_ROWS = 1000
+STUDY_COLUMNS = ("Study", "Lesions", "Images", "Max conf", "Last analyzed")
+IMAGE_COLUMNS = ("Image", "Lesions", "Max conf", "Analyzed")
+
+class HistoryPanel(QDialog):
+    image_selected = pyqtSignal(str)
+    study_selected = pyqtSignal(str)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.study = None # set when drilled down into one study
+        self.rows = []
+        self.setWindowTitle("History")
+        self.resize(760, 420)
+
+        layout = QVBoxLayout(self)
+        filters = QHBoxLayout()
+        self.combo_mode = QComboBox()
+        self.combo_mode.addItems(["Studies", "Images"])
+        self.spin_lesions = QSpinBox()
+        self.spin_lesions.setRange(0, 100)
+        self.spin_lesions.setValue(1)
+        self.spin_conf = QDoubleSpinBox()
+        self.spin_conf.setRange(0.0, 1.0)
+        self.spin_conf.setSingleStep(0.05)
+        self.spin_conf.setValue(0.25)
+        btn_search = QPushButton("Search")
+        btn_search.clicked.connect(self.back_to_all)
+        filters.addWidget(self.combo_mode)
+        filters.addWidget(QLabel("with at least"))
+        filters.addWidget(self.spin_lesions)
+        filters.addWidget(QLabel("lesions above"))
+        filters.addWidget(self.spin_conf)
+        filters.addStretch()
+        filters.addWidget(btn_search)
+        layout.addLayout(filters)
+
+        self.table = QTableWidget(0, 0)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.cellDoubleClicked.connect(self.on_row_activated)
+        layout.addWidget(self.table, stretch=1)
+
+        self.lbl_status = QLabel()
+        self.lbl_status.setStyleSheet("color: #64748b; font-size: 12px;")
+        layout.addWidget(self.lbl_status)
+
+    def showEvent(self, event):
+        self.refresh()
+        super().showEvent(event)
+
+    def back_to_all(self):
+        self.study = None
+        self.refresh()
+
+    def refresh(self):
+        min_lesions, min_conf = self.spin_lesions.value(), self.spin_conf.value()
+        t0 = time.perf_counter()
+        if self.study is None and self.combo_mode.currentIndex() == 0:
+            self.rows = self.store.studies(max(1, min_lesions), min_conf, limit=MAX_ROWS)
+            cells = [(study, str(count), str(n_images), f"{max_conf:.2f}", _format_time(created))
+                     for study, count, n_images, max_conf, created in self.rows]
+            columns = STUDY_COLUMNS
+        else:
+            self.rows = self.store.images(study=self.study, min_lesions=min_lesions, min_conf=min_conf, limit=MAX_ROWS)
+            cells = [(os.path.basename(path) if self.study else path, str(n), f"{max_conf:.2f}", _format_time(created))
+                     for path, _, created, n, max_conf, _ in self.rows]
+            columns = IMAGE_COLUMNS
+        elapsed = time.perf_counter() - t0
+
+        self.table.clear()
+        self.table.setColumnCount(len(columns))
+        self.table.setHorizontalHeaderLabels(columns)
+        self.table.setRowCount(len(cells))
+        for r, values in enumerate(cells):
+            for c, text in enumerate(values):
+                item = QTableWidgetItem(text)
+                if 0 < c < len(values) - 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+        self.table.resizeColumnToContents(0)
+
+        scope = f"Study {self.study}" if self.study else "All results"
+        self.lbl_status.setText(f"{scope}: {len(cells)} rows in {elapsed * 1000:.1f} ms. "
+                                f"Double-click to open.")
+
+    def on_row_activated(self, row, column):
+        if self.study is None and self.combo_mode.currentIndex() == 0:
+            # Drill down into the study and show it in the gallery
+            self.study = self.rows[row][0]
+            self.study_selected.emit(self.study)
+            self.refresh()
+            return
+        path = self.rows[row][0]
+        if os.path.exists(path):
+            if self.study is None:
+                self.study_selected.emit(study_of(path))
+            self.image_selected.emit(path)
+        else:
+            self.lbl_status.setText(f"{path} no longer exists.")
+
+def _format_time(created):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(created)) if created else '-'
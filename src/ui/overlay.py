@@ -0,0 +1,111 @@
+"""
+Single scene item that draws every detection box in one pass.
+
+DetectionOverlayItem keeps the boxes and scores as arrays. Updating the
+detections only swaps that data and schedules a repaint; no scene items
+are created or removed. Boxes can be coloured by score, and an optional
+confidence heatmap is rendered at reduced resolution under the boxes.
+"""
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QColor, QImage, QPen
+from PyQt5.QtWidgets import QGraphicsItem
+
+from backend import metrics
+from backend.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+BOX_COLOR = QColor(255, 0, 0)
+BOX_WIDTH = 3
+# Score colours are bucketed so each bucket is one drawRects call
+SCORE_BUCKETS = 10
+# Heatmap resolution relative to the image
+HEATMAP_SCALE = 1 / 8
+HEATMAP_ALPHA = 110
+
+def score_color(score):
+    """Blue (low) to red (high) through yellow."""
+    hue = int(240 * (1 - min(max(score, 0.0), 1.0)))
+    return QColor.fromHsv(hue, 255, 255)
+
+class DetectionOverlayItem(QGraphicsItem):
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.score_colors = False
+        self.show_heatmap = False
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self._rects = []
+        self._buckets = []
+        self._heatmap = None
+        self.setZValue(1)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.width, self.height)
+
+    def set_size(self, width, height):
+        self.prepareGeometryChange()
+        self.width = width
+        self.height = height
+        self._heatmap = None
+        self.update()
+
+    def set_detections(self, boxes, scores):
+        """boxes: (n, 4) xyxy in image pixels, scores: (n,)."""
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        x1, y1, x2, y2 = self.boxes.T.tolist() if len(self.boxes) else ([], [], [], [])
+        self._rects = [QRectF(a, b, c - a, d - b) for a, b, c, d in zip(x1, y1, x2, y2)]
+        # Index lists per score bucket, for the score-coloured mode
+        bins = np.minimum((self.scores * SCORE_BUCKETS).astype(np.int32), SCORE_BUCKETS - 1)
+        self._buckets = [(b, np.flatnonzero(bins == b).tolist()) for b in np.unique(bins)]
+        self._heatmap = None
+        self.update()
+
+    def set_score_colors(self, enabled):
+        self.score_colors = enabled
+        self.update()
+
+    def set_heatmap(self, enabled):
+        self.show_heatmap = enabled
+        self.update()
+
+    def _build_heatmap(self):
+        # Max confidence covering each cell, blurred and colour-mapped once per data change
+        hw = max(1, int(self.width * HEATMAP_SCALE)), max(1, int(self.height * HEATMAP_SCALE))
+        acc = np.zeros((hw[1], hw[0]), dtype=np.float32)
+        scaled = (self.boxes * HEATMAP_SCALE).astype(np.int32)
+        for (x1, y1, x2, y2), s in zip(scaled.tolist(), self.scores.tolist()):
+            cell = acc[max(y1, 0):y2 + 1, max(x1, 0):x2 + 1]
+            np.maximum(cell, s, out=cell)
+        acc = cv2.GaussianBlur(acc, (0, 0), 2)
+        colored = cv2.applyColorMap((acc * 255).astype(np.uint8), cv2.COLORMAP_JET)
+        alpha = (np.clip(acc * 2, 0, 1) * HEATMAP_ALPHA).astype(np.uint8)
+        bgra = np.ascontiguousarray(np.dstack([colored, alpha]))
+        h, w = bgra.shape[:2]
+        # copy(): the QImage must own its pixels once bgra goes out of scope
+        return QImage(bgra.data, w, h, bgra.strides[0], QImage.Format_ARGB32).copy()
+
+    def paint(self, painter, option, widget=None):
+        with metrics.span('overlay_draw'):
+            self._paint(painter)
+
+    def _paint(self, painter):
+        if self.show_heatmap and len(self.scores):
+            if self._heatmap is None:
+                self._heatmap = self._build_heatmap()
+            painter.drawImage(self.boundingRect(), self._heatmap)
+
+        if not self._rects:
+            return
+        painter.setBrush(Qt.NoBrush)
+        if not self.score_colors:
+            painter.setPen(QPen(BOX_COLOR, BOX_WIDTH))
+            painter.drawRects(self._rects)
+            return
+        for bucket, indices in self._buckets:
+            painter.setPen(QPen(score_color((bucket + 0.5) / SCORE_BUCKETS), BOX_WIDTH))
+            painter.drawRects([self._rects[i] for i in indices])
@@ -0,0 +1,81 @@
+"""
+Performance panel: live per-stage timing histograms from backend.metrics.
+"""
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QDialog, QFileDialog, QHBoxLayout, QLabel, QMessageBox, QPushButton, QTableWidget,
+                             QTableWidgetItem, QVBoxLayout)
+
+from backend import metrics
+
+REFRESH_MS = 1000
+COLUMNS = ("Stage", "Count", "Mean ms", "p50 ms", "p95 ms", "Total s")
+
+class PerformancePanel(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Performance")
+        self.resize(560, 320)
+
+        layout = QVBoxLayout(self)
+        self.lbl_status = QLabel()
+        self.lbl_status.setStyleSheet("color: #64748b; font-size: 12px;")
+        layout.addWidget(self.lbl_status)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table, stretch=1)
+
+        buttons = QHBoxLayout()
+        btn_reset = QPushButton("Reset")
+        btn_reset.clicked.connect(self.reset)
+        btn_export = QPushButton("Export Prometheus...")
+        btn_export.clicked.connect(self.export)
+        buttons.addWidget(btn_reset)
+        buttons.addStretch()
+        buttons.addWidget(btn_export)
+        layout.addLayout(buttons)
+
+        # Polls only while the panel is visible
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        if not metrics.ENABLED:
+            self.lbl_status.setText("Timing collection is off (BRAIN_MET_METRICS=0).")
+        else:
+            self.lbl_status.setText("Per-stage timings since start-up or the last reset.")
+        rows = metrics.summary()
+        self.table.setRowCount(len(rows))
+        for r, (name, count, mean, p50, p95, total) in enumerate(rows):
+            values = (name, str(count), f"{mean:.1f}", f"{p50:.1f}", f"{p95:.1f}", f"{total:.2f}")
+            for c, text in enumerate(values):
+                item = QTableWidgetItem(text)
+                if c:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def export(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Timings", "brain_met.prom", "Prometheus (*.prom);;All Files (*)")
+        if not filename:
+            return
+        try:
+            metrics.write_prometheus(filename)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Error", f"Could not write timings:\n{e}")
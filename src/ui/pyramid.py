@@ -0,0 +1,215 @@
+"""
+Tiled multi-resolution image item for very large images.
+
+PyramidImageItem renders only the tiles that intersect the exposed area,
+taken from the pyramid level that matches the current zoom. Levels are
+downscaled by 2 each and, like the tiles themselves, are built lazily on
+the global QThreadPool. Until a tile is ready, the matching area of a
+coarser level that is already cached is drawn instead, so panning and
+zooming never wait on the builder.
+
+Jobs outlive the item: when it is replaced or removed from its scene,
+dispose() invalidates their generation and disconnects their signal, so
+late results are dropped instead of touching a deleted item.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+from PyQt5 import sip
+from PyQt5.QtCore import QObject, QRectF, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from backend.lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+TILE_SIZE = 512
+# Converted tiles kept in memory (512 x 512 x 4 bytes each)
+MAX_CACHED_TILES = 256
+# Images at least this large (either side) are shown through the pyramid
+PYRAMID_THRESHOLD = 4096
+
+class _TileSignals(QObject):
+    tile_ready = pyqtSignal(int, int, int, int) # generation, level, tx, ty
+
+class _TileJob(QRunnable):
+    def __init__(self, item, generation, level, tx, ty):
+        super().__init__()
+        self.item = item
+        self.generation = generation
+        self.level = level
+        self.tx = tx
+        self.ty = ty
+
+    def run(self):
+        self.item._build_tile(self.generation, self.level, self.tx, self.ty)
+
+class PyramidImageItem(QGraphicsItem):
+    def __init__(self, image):
+        super().__init__()
+        # exposedRect is only filled in with this flag
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+        self._signals = _TileSignals()
+        self._signals.tile_ready.connect(self._on_tile_ready)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._disposed = False
+        self.set_image(image)
+
+    def dispose(self):
+        """Drops all pending and running tile jobs; call before the item is deleted."""
+        with self._lock:
+            if self._disposed:
+                return
+            self._disposed = True
+            self._generation += 1
+            self._pending = set()
+        try:
+            self._signals.tile_ready.disconnect(self._on_tile_ready)
+        except TypeError:
+            pass
+
+    def itemChange(self, change, value):
+        # Leaving the scene (e.g. scene.clear()) is the last point the item is known to be alive
+        if change == QGraphicsItem.ItemSceneHasChanged and value is None:
+            self.dispose()
+        return super().itemChange(change, value)
+
+    def set_image(self, image):
+        self.prepareGeometryChange()
+        with self._lock:
+            # Results of jobs for the previous image are ignored
+            self._generation += 1
+            self.image = image
+            self._levels = [image.pixels] # level k is downscaled by 2**k; built on demand
+            self._tiles = OrderedDict() # (level, tx, ty) -> QImage, least recently used first
+            self._pending = set()
+            self._level_locks = {} # level -> lock held while that level is built
+        max_side = max(image.width, image.height)
+        self.num_levels = max(1, math.ceil(math.log2(max_side / TILE_SIZE)) + 1) if max_side > TILE_SIZE else 1
+        self.update()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.image.width, self.image.height)
+
+    def _level_for_scale(self, scale):
+        # Finest level that still has at least one image pixel per screen pixel
+        if scale >= 1:
+            return 0
+        return max(0, min(self.num_levels - 1, int(math.floor(math.log2(1 / scale)))))
+
+    def paint(self, painter, option, widget=None):
+        scale = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = self._level_for_scale(scale)
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, scale < 1)
+        factor = 2 ** level
+        span = TILE_SIZE * factor # tile size in scene (level 0) pixels
+        for ty in range(int(exposed.top() // span), int(math.ceil(exposed.bottom() / span))):
+            for tx in range(int(exposed.left() // span), int(math.ceil(exposed.right() / span))):
+                self._draw_tile(painter, level, tx, ty)
+
+    def _draw_tile(self, painter, level, tx, ty):
+        tile = self._cached_tile(level, tx, ty)
+        if tile is None:
+            self._request_tile(level, tx, ty)
+            # Fall back to the closest coarser tile that is already available
+            for coarse in range(level + 1, self.num_levels):
+                shift = coarse - level
+                parent = self._cached_tile(coarse, tx >> shift, ty >> shift)
+                if parent is not None:
+                    target = self._scene_rect(level, tx, ty)
+                    sub = TILE_SIZE >> shift
+                    source = QRectF((tx % (1 << shift)) * sub, (ty % (1 << shift)) * sub,
+                                    target.width() / 2 ** coarse, target.height() / 2 ** coarse)
+                    painter.drawImage(target, parent, source)
+                    break
+            return
+        painter.drawImage(self._scene_rect(level, tx, ty), tile, QRectF(tile.rect()))
+
+    def _scene_rect(self, level, tx, ty):
+        factor = 2 ** level
+        span = TILE_SIZE * factor
+        x, y = tx * span, ty * span
+        # Edge tiles are smaller than TILE_SIZE
+        w = min(span, self.image.width - x)
+        h = min(span, self.image.height - y)
+        return QRectF(x, y, w, h)
+
+    def _cached_tile(self, level, tx, ty):
+        with self._lock:
+            tile = self._tiles.get((level, tx, ty))
+            if tile is not None:
+                self._tiles.move_to_end((level, tx, ty))
+            return tile
+
+    def _request_tile(self, level, tx, ty):
+        key = (level, tx, ty)
+        with self._lock:
+            if self._disposed or key in self._pending:
+                return
+            self._pending.add(key)
+            generation = self._generation
+        QThreadPool.globalInstance().start(_TileJob(self, generation, level, tx, ty))
+
+    def _level_array(self, level):
+        # Runs on pool threads; each level is built once, from the one above it
+        with self._lock:
+            levels = self._levels
+            if level < len(levels):
+                return levels[level]
+            build_lock = self._level_locks.setdefault(level, threading.Lock())
+        # Jobs needing the same level wait for the one building it
+        with build_lock:
+            with self._lock:
+                if level < len(levels):
+                    return levels[level]
+            arr = self._level_array(level - 1)
+            h, w = arr.shape[:2]
+            down = cv2.resize(arr, (max(1, w // 2), max(1, h // 2)), interpolation=cv2.INTER_AREA)
+            with self._lock:
+                # levels may belong to a replaced image; it is then discarded with it
+                if len(levels) == level:
+                    levels.append(down)
+                return levels[level]
+
+    def _build_tile(self, generation, level, tx, ty):
+        with self._lock:
+            # Queued before the image changed or the item was disposed: nothing to do
+            if generation != self._generation:
+                return
+        arr = self._level_array(level)
+        crop = np.ascontiguousarray(arr[ty * TILE_SIZE:(ty + 1) * TILE_SIZE, tx * TILE_SIZE:(tx + 1) * TILE_SIZE])
+        if crop.size == 0:
+            with self._lock:
+                self._pending.discard((level, tx, ty))
+            return
+        h, w = crop.shape[:2]
+        if hasattr(QImage, 'Format_BGR888'):
+            qimage = QImage(crop.data, w, h, crop.strides[0], QImage.Format_BGR888)
+        else:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+            qimage = QImage(crop.data, w, h, crop.strides[0], QImage.Format_RGB888)
+        # Convert once to the painter's native format; the result owns its memory
+        qimage = qimage.convertToFormat(QImage.Format_RGB32)
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._pending.discard((level, tx, ty))
+            self._tiles[(level, tx, ty)] = qimage
+            while len(self._tiles) > MAX_CACHED_TILES:
+                self._tiles.popitem(last=False)
+        self._signals.tile_ready.emit(generation, level, tx, ty)
+
+    def _on_tile_ready(self, generation, level, tx, ty):
+        if sip.isdeleted(self) or self._disposed:
+            return
+        if generation == self._generation:
+            self.update(self._scene_rect(level, tx, ty))
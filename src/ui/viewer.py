@@ -1,10 +1,50 @@
-from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsRectItem, QGraphicsTextItem
-from PyQt5.QtCore import Qt, pyqtSignal, QRectF
-from PyQt5.QtGui import QPixmap, QPen, QColor, QBrush, QFont, QImage
-import cv2
-import numpy as np
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem
+from PyQt5.QtCore import Qt, pyqtSignal, QRectF, QPointF
+from PyQt5.QtGui import QPixmap, QImage
+
+from backend.image import SharedImage
+from backend.lazy import lazy_import
+from .overlay import DetectionOverlayItem
+from .pyramid import PYRAMID_THRESHOLD, PyramidImageItem
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+def qimage_view(image):
+    """
+    QImage over a SharedImage's pixel buffer without copying.
+    The QImage does not own the memory, so keep the SharedImage alive while it is in use.
+    """
+    pixels = image.pixels
+    h, w = pixels.shape[:2]
+    if hasattr(QImage, 'Format_BGR888'):
+        return QImage(pixels.data, w, h, pixels.strides[0], QImage.Format_BGR888)
+    # Qt < 5.14 has no BGR format: fall back to a converted copy
+    rgb = cv2.cvtColor(pixels, cv2.COLOR_BGR2RGB)
+    return QImage(rgb.data, w, h, rgb.strides[0], QImage.Format_RGB888).copy()
+
+class ImageItem(QGraphicsItem):
+    """Scene item painting a SharedImage straight from its buffer."""
+
+    def __init__(self, image):
+        super().__init__()
+        self.set_image(image)
+
+    def set_image(self, image):
+        self.prepareGeometryChange()
+        self.image = image
+        self.qimage = qimage_view(image)
+        self.update()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.image.width, self.image.height)
+
+    def paint(self, painter, option, widget=None):
+        painter.drawImage(QPointF(0, 0), self.qimage)
 
 class ImageViewer(QGraphicsView):
+    slice_changed = pyqtSignal(int) # new slice index when viewing a volume
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.scene = QGraphicsScene(self)
@@ -17,66 +57,129 @@ class ImageViewer(QGraphicsView):
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setResizeAnchor(QGraphicsView.AnchorUnderMouse)
+        # Repaint only what changed instead of the whole viewport
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState, True)
         
-        self.pixmap_item = None
+        self.image_item = None
         self.current_image_path = None
-        self._image_data = None # Store loaded cv2 image if needed
+        self.current_image = None # SharedImage on screen, also handed to the detector and the export
+        self.volume = None # backend.volume.Volume when viewing a multi-slice scan
+        self.slice_index = 0
         
-        self.box_items = []
+        # One overlay item draws every box; re-created only with the image
+        self.overlay_item = None
+        self.score_colors = False
+        self.show_heatmap = False
 
-    def load_image(self, file_path):
-        self.current_image_path = file_path
-        pixmap = QPixmap(file_path)
-        
-        if pixmap.isNull():
+    def load_image(self, file_path, image=None):
+        # Decoded once here (unless prefetched); the detector and the PDF export reuse this buffer
+        if image is None:
+            image = SharedImage.from_file(file_path)
+        if image is None:
             return False
 
+        self.current_image_path = file_path
+        self.volume = None
+        self._show_image(image)
+        return True
+
+    def load_volume(self, volume):
+        self.current_image_path = None
+        self.volume = volume
+        self.slice_index = len(volume) // 2
+        self._show_image(self._slice_image(self.slice_index))
+        return True
+
+    def _show_image(self, image):
+        self.current_image = image
+        if isinstance(self.image_item, PyramidImageItem):
+            # Its tile jobs may still be running; they must not reach the item once clear() deletes it
+            self.image_item.dispose()
         self.scene.clear()
-        self.box_items = []
         
-        self.pixmap_item = self.scene.addPixmap(pixmap)
-        self.setSceneRect(QRectF(pixmap.rect()))
+        # Very large images go through the tiled pyramid so pan/zoom only touches visible tiles
+        if max(image.width, image.height) >= PYRAMID_THRESHOLD:
+            self.image_item = PyramidImageItem(image)
+        else:
+            self.image_item = ImageItem(image)
+        self.scene.addItem(self.image_item)
+
+        self.overlay_item = DetectionOverlayItem(image.width, image.height)
+        self.overlay_item.set_score_colors(self.score_colors)
+        self.overlay_item.set_heatmap(self.show_heatmap)
+        self.scene.addItem(self.overlay_item)
+        self.setSceneRect(self.image_item.boundingRect())
         
         # Fit to view
         self.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
-        return True
+
+    def _slice_image(self, index):
+        # Only this slice is read from the memory-mapped volume
+        return SharedImage.from_array(self.volume.slice_bgr(index))
+
+    def set_slice(self, index):
+        if self.volume is None:
+            return
+        index = max(0, min(len(self.volume) - 1, index))
+        if index == self.slice_index:
+            return
+        self.slice_index = index
+        self.current_image = self._slice_image(index)
+        self.image_item.set_image(self.current_image)
+        self.draw_detections([])
+        self.slice_changed.emit(index)
+
+    def keyPressEvent(self, event):
+        if self.volume is not None and event.key() in (Qt.Key_Up, Qt.Key_PageUp):
+            self.set_slice(self.slice_index - 1)
+        elif self.volume is not None and event.key() in (Qt.Key_Down, Qt.Key_PageDown):
+            self.set_slice(self.slice_index + 1)
+        else:
+            super().keyPressEvent(event)
 
     def has_image(self):
-        return self.pixmap_item is not None
+        return self.image_item is not None
 
     def get_image_data(self):
-        # Return path or cv2 image depending on what the detector needs
-        # For this example, we return the path which is simplest
-        return self.current_image_path
+        # The decoded SharedImage, so the detector does not read the file again
+        return self.current_image
 
     def draw_detections(self, detections):
         """
         Draws bounding boxes on the image.
-        detections: list of dicts {'bbox': [x1, y1, x2, y2], 'label': str, 'conf': float}
+        detections: Detections, or list of dicts {'bbox': [x1, y1, x2, y2], 'label': str, 'conf': float}
+        Only the overlay's data changes; no scene items are created or removed.
         """
-        # Remove old boxes
-        for item in self.box_items:
-            self.scene.removeItem(item)
-        self.box_items.clear()
-        
-        pen = QPen(QColor(255, 0, 0), 3) # Red boundary
-        font = QFont("Arial", 10, QFont.Bold)
-        
-        for det in detections:
-            x1, y1, x2, y2 = det['bbox']
-            w = x2 - x1
-            h = y2 - y1
-            
-            # Draw Rect
-            rect_item = QGraphicsRectItem(x1, y1, w, h)
-            rect_item.setPen(pen)
-            self.scene.addItem(rect_item)
-            self.box_items.append(rect_item)
+        if self.overlay_item is None:
+            return
+        if isinstance(detections, list):
+            boxes = [det['bbox'] for det in detections]
+            scores = [det['conf'] for det in detections]
+        else:
+            boxes, scores = detections.boxes, detections.scores
+        self.overlay_item.set_detections(boxes, scores)
             
-            # Label (Text) removed as per request
-            # Only bounding box is displayed
+        # Label (Text) removed as per request
+        # Only bounding box is displayed
+
+    def set_score_colors(self, enabled):
+        self.score_colors = enabled
+        if self.overlay_item is not None:
+            self.overlay_item.set_score_colors(enabled)
+
+    def set_heatmap(self, enabled):
+        self.show_heatmap = enabled
+        if self.overlay_item is not None:
+            self.overlay_item.set_heatmap(enabled)
 
     def wheelEvent(self, event):
+        # Shift + wheel scrolls through the slices of a volume
+        if self.volume is not None and event.modifiers() & Qt.ShiftModifier:
+            delta = event.angleDelta().y() or event.angleDelta().x() # some platforms turn shift+wheel horizontal
+            self.set_slice(self.slice_index + (-1 if delta > 0 else 1))
+            return
+
         # Zoom factor
         zoom_in_factor = 1.25
         zoom_out_factor = 1 / zoom_in_factor
@@ -0,0 +1,84 @@
+"""
+Watch Folder control: runs a backend.watch.FolderWatcher through the
+window's inference service and shows its queue depth and latency.
+"""
+import os
+
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QFileDialog, QHBoxLayout, QLabel, QPushButton, QWidget
+
+from backend.service import PRIORITY_WATCH
+from backend.watch import FolderWatcher, format_status
+
+REFRESH_MS = 1000
+
+class WatchControl(QWidget):
+    file_done = pyqtSignal(str, object) # path, detections (list of dicts) at the threshold
+    watching_changed = pyqtSignal(str) # watched folder, or '' when stopped
+
+    def __init__(self, inference, store, parent=None):
+        super().__init__(parent)
+        self.inference = inference
+        self.store = store
+        self.watcher = None
+        self.last_file = None
+        self.file_done.connect(self.on_file_done)
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.btn_watch = QPushButton("  Watch Folder")
+        self.btn_watch.setIcon(self.style().standardIcon(self.style().SP_BrowserReload))
+        self.btn_watch.setProperty("class", "ToolbarBtn")
+        self.btn_watch.setCursor(Qt.PointingHandCursor)
+        self.btn_watch.clicked.connect(self.toggle)
+        self.lbl_status = QLabel()
+        self.lbl_status.setStyleSheet("color: #64748b; font-size: 12px;")
+        layout.addWidget(self.btn_watch)
+        layout.addWidget(self.lbl_status)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def toggle(self):
+        if self.watcher is not None:
+            # Don't block the window on a batch still on the model; the threads exit after it
+            self.stop(wait=False)
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Watch Folder")
+        if folder:
+            self.start(folder, self.window().conf_threshold)
+
+    def start(self, folder, conf_threshold):
+        engine = getattr(self.inference.detector.model, 'name', None)
+        # The watcher's worker thread waits on the shared service, so foreground requests still go first
+        self.watcher = FolderWatcher(folder, lambda paths: self.inference.submit_batch(paths, PRIORITY_WATCH).result(),
+                                     self.store, conf_threshold, engine=engine, on_result=self.file_done.emit)
+        self.watcher.start()
+        self.btn_watch.setText("  Stop Watching")
+        self.timer.start()
+        self.refresh()
+        self.watching_changed.emit(self.watcher.folder)
+
+    def stop(self, wait=True):
+        if self.watcher is None:
+            return
+        self.watcher.stop(wait)
+        self.watcher = None
+        self.timer.stop()
+        self.btn_watch.setText("  Watch Folder")
+        self.lbl_status.clear()
+        self.lbl_status.setToolTip("")
+        self.watching_changed.emit('')
+
+    def on_file_done(self, path, detections):
+        self.last_file = f"{os.path.basename(path)}: {len(detections)} lesion(s)"
+
+    def refresh(self):
+        if self.watcher is None:
+            return
+        status = self.watcher.status()
+        self.lbl_status.setText(f"Queue {status['queue_depth']}/{status['max_queue']} · "
+                                f"{status['latency_p50']:.1f}s")
+        last = f"\nLast: {self.last_file}" if self.last_file else ""
+        self.lbl_status.setToolTip(f"{self.watcher.folder}\n{format_status(status)}{last}")
@@ -1,26 +1,65 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFrame, QProgressBar, QSizePolicy, 
-                             QFileDialog, QListWidget, QListWidgetItem, QGraphicsDropShadowEffect, QMessageBox)
-from PyQt5.QtCore import Qt, pyqtSlot, QSize, QDate, QBuffer, QIODevice, QByteArray
-from PyQt5.QtGui import QIcon, QColor, QFont, QPixmap, QPainter, QTextDocument, QPen
-from PyQt5.QtPrintSupport import QPrinter
+                             QFileDialog, QListWidget, QListWidgetItem, QGraphicsDropShadowEffect, QMessageBox,
+                             QSlider, QCheckBox)
+from PyQt5.QtCore import Qt, pyqtSlot, QSize, QTimer
+from PyQt5.QtGui import QIcon, QColor, QFont, QPixmap
 
 from .viewer import ImageViewer
+from .gallery import GalleryPanel
+from .history import HistoryPanel
+from .performance import PerformancePanel
+from .watch import WatchControl
 from .styles import STYLESHEET
-from backend.detector import BrainTumorDetector, DetectionWorker
-import numpy as np
+from backend.batch import collect_images
+from backend.client import DEFAULT_SERVER, RemoteDetector
+from backend.detector import BrainTumorDetector, SRC_DIR
+from backend.prefetch import Prefetcher
+from backend.report import ReportExporter, diagnose, findings
+from backend.service import InferenceService, ModelLoader
+from backend.store import ResultsStore, study_of
+from backend.volume import is_volume_path, load_volume
+import os
+import time
+
+# Sample scans shipped at the repository root
+SAMPLE_DIR = os.path.dirname(SRC_DIR)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, launch_time=None):
         super().__init__()
         self.setWindowTitle("Brain Metastases Diagnosis System")
         self.resize(1280, 800)
         self.setStyleSheet(STYLESHEET)
 
-        # Backend
-        self.detector = BrainTumorDetector()
+        # Backend: the model is loaded in the background after the first paint,
+        # or, with BRAIN_MET_SERVER set, a shared local inference server is used instead
+        self.detector = RemoteDetector(DEFAULT_SERVER) if DEFAULT_SERVER else BrainTumorDetector(load=False)
+        self.model_loader = None
+        self.model_ready = False
+        self.pending_run = False
+        self.launch_time = launch_time if launch_time is not None else time.perf_counter()
+        self.first_paint_done = False
+
+        # One long-lived inference thread; only the latest request's result is shown
+        self.inference = InferenceService(self.detector)
+        self.inference.result_ready.connect(self.on_detection_complete)
+        self.inference.volume_progress.connect(self.on_volume_progress)
+        self.inference.request_dropped.connect(self.on_request_dropped)
+        self.inference.start()
+        self.current_request = None
+        self.volume_candidates = {} # slice index -> Detections for the open volume
+        # Decodes and pre-runs the next images of the gallery at background priority
+        self.prefetcher = Prefetcher(self.inference)
+        self.report_exporter = None
+        self.performance_panel = None
+        # Every analyzed image is kept in the results store for the History panel and `main.py query`
+        self.results_store = ResultsStore()
+        self.history_panel = None
         
         # State
+        self.conf_threshold = 0.25
+        self.current_candidates = None # raw model output at the floor threshold
         self.current_detections = []
         self.diagnosis_results = {
             'prob': 0,
@@ -46,6 +85,11 @@ class MainWindow(QMainWindow):
         content_layout = QHBoxLayout(content_wrapper)
         content_layout.setContentsMargins(20, 20, 20, 20)
         content_layout.setSpacing(20)
+
+        # Far left: study gallery
+        self.gallery = GalleryPanel()
+        self.gallery.image_selected.connect(self.open_path)
+        content_layout.addWidget(self.gallery)
         
         # Left: Viewport
         self.create_viewport(content_layout)
@@ -95,6 +139,7 @@ class MainWindow(QMainWindow):
         self.btn_sample.setIcon(self.style().standardIcon(self.style().SP_FileIcon))
         self.btn_sample.setProperty("class", "ToolbarBtn")
         self.btn_sample.setCursor(Qt.PointingHandCursor)
+        self.btn_sample.clicked.connect(self.load_sample)
 
         self.btn_run = QPushButton("  Run Diagnosis")
         self.btn_run.setObjectName("RunBtn")
@@ -105,9 +150,35 @@ class MainWindow(QMainWindow):
         self.btn_run.setEnabled(False) 
         self.btn_run.setFixedWidth(180)
 
+        self.btn_performance = QPushButton("  Performance")
+        self.btn_performance.setIcon(self.style().standardIcon(self.style().SP_FileDialogDetailedView))
+        self.btn_performance.setProperty("class", "ToolbarBtn")
+        self.btn_performance.setCursor(Qt.PointingHandCursor)
+        self.btn_performance.clicked.connect(self.show_performance)
+
+        self.btn_history = QPushButton("  History")
+        self.btn_history.setIcon(self.style().standardIcon(self.style().SP_FileDialogContentsView))
+        self.btn_history.setProperty("class", "ToolbarBtn")
+        self.btn_history.setCursor(Qt.PointingHandCursor)
+        self.btn_history.clicked.connect(self.show_history)
+
+        # Hot folder: new scanner exports are analyzed as they arrive
+        self.watch_control = WatchControl(self.inference, self.results_store)
+        self.watch_control.setEnabled(False)
+        self.watch_control.watching_changed.connect(self.on_watching_changed)
+        self.watch_control.file_done.connect(self.on_watch_file_done)
+
+        # Model status indicator
+        self.lbl_model_status = QLabel("Loading model...")
+        self.lbl_model_status.setStyleSheet("color: #d97706; font-weight: 600;")
+
         layout.addWidget(self.btn_import)
         layout.addWidget(self.btn_sample)
+        layout.addWidget(self.btn_performance)
+        layout.addWidget(self.btn_history)
+        layout.addWidget(self.watch_control)
         layout.addStretch()
+        layout.addWidget(self.lbl_model_status)
         layout.addWidget(self.btn_run)
 
         self.main_layout.addWidget(toolbar)
@@ -118,10 +189,19 @@ class MainWindow(QMainWindow):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
 
-        # Label above image
+        # Label above image, with overlay options
+        header_row = QHBoxLayout()
         header_lbl = QLabel("MRI VIEWPORT [AXIAL T1]")
         header_lbl.setStyleSheet("color: #64748b; font-weight: bold; font-size: 12px; padding-bottom: 8px;")
-        layout.addWidget(header_lbl)
+        self.chk_score_colors = QCheckBox("Score colours")
+        self.chk_heatmap = QCheckBox("Heatmap")
+        for chk in (self.chk_score_colors, self.chk_heatmap):
+            chk.setStyleSheet("color: #64748b; font-size: 12px; padding-bottom: 8px;")
+        header_row.addWidget(header_lbl)
+        header_row.addStretch()
+        header_row.addWidget(self.chk_score_colors)
+        header_row.addWidget(self.chk_heatmap)
+        layout.addLayout(header_row)
 
         # Frame for Viewer
         viewer_frame = QFrame()
@@ -131,9 +211,25 @@ class MainWindow(QMainWindow):
 
         self.viewer = ImageViewer()
         self.viewer.setStyleSheet("background-color: black; border: none;")
+        self.viewer.slice_changed.connect(self.on_slice_changed)
+        self.chk_score_colors.toggled.connect(self.viewer.set_score_colors)
+        self.chk_heatmap.toggled.connect(self.viewer.set_heatmap)
         vf_layout.addWidget(self.viewer)
         
         layout.addWidget(viewer_frame)
+
+        # Slice navigation, only shown for multi-slice volumes
+        self.slice_bar = QWidget()
+        sb_layout = QHBoxLayout(self.slice_bar)
+        sb_layout.setContentsMargins(0, 8, 0, 0)
+        self.slider_slice = QSlider(Qt.Horizontal)
+        self.slider_slice.valueChanged.connect(self.viewer.set_slice)
+        self.lbl_slice = QLabel("-")
+        self.lbl_slice.setStyleSheet("color: #64748b; font-weight: bold; font-size: 12px;")
+        sb_layout.addWidget(self.slider_slice)
+        sb_layout.addWidget(self.lbl_slice)
+        self.slice_bar.hide()
+        layout.addWidget(self.slice_bar)
         
         # Add shadow to container
         shadow = QGraphicsDropShadowEffect()
@@ -205,10 +301,26 @@ class MainWindow(QMainWindow):
         self.progress_bar.setStyleSheet("QProgressBar::chunk { background-color: #2563eb; border-radius: 3px; } QProgressBar { background-color: #e2e8f0; border-radius: 3px; border: none; }")
         self.progress_bar.setValue(0)
 
+        # Confidence threshold: re-filters cached candidates, never re-runs the model
+        row3 = QHBoxLayout()
+        row3.addWidget(QLabel("Confidence Threshold"))
+        row3.addStretch()
+        self.lbl_threshold = QLabel(f"{int(self.conf_threshold * 100)}%")
+        self.lbl_threshold.setStyleSheet("font-weight: bold; color: #475569;")
+        row3.addWidget(self.lbl_threshold)
+
+        self.slider_threshold = QSlider(Qt.Horizontal)
+        self.slider_threshold.setRange(5, 95)
+        self.slider_threshold.setValue(int(self.conf_threshold * 100))
+        self.slider_threshold.valueChanged.connect(self.on_threshold_changed)
+
         p_layout.addLayout(row1)
         p_layout.addSpacing(5)
         p_layout.addLayout(row2)
         p_layout.addWidget(self.progress_bar)
+        p_layout.addSpacing(10)
+        p_layout.addLayout(row3)
+        p_layout.addWidget(self.slider_threshold)
         
         layout.addWidget(prob_container)
 
@@ -264,17 +376,145 @@ class MainWindow(QMainWindow):
 
         parent_layout.addWidget(self.report_panel, stretch=1)
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            print(f"Startup: first paint {time.perf_counter() - self.launch_time:.2f}s after launch")
+            # Defer model loading until the window is on screen
+            QTimer.singleShot(0, self.start_model_loading)
+
+    def start_model_loading(self):
+        self.model_loader = ModelLoader(self.detector, self.inference)
+        self.model_loader.model_ready.connect(self.on_model_ready)
+        # First-launch tuning finishes after the model is ready; later requests use its profile
+        self.model_loader.profile_ready.connect(self.inference.apply_profile)
+        self.model_loader.start()
+
+    def on_model_ready(self, loaded, seconds):
+        self.model_ready = True
+        print(f"Startup: model ready {time.perf_counter() - self.launch_time:.2f}s after launch "
+              f"(load + warm-up {seconds:.2f}s)")
+        # Watched files need a model; until it is up they would all fail
+        self.watch_control.setEnabled(loaded)
+        if loaded:
+            self.lbl_model_status.setText("Model ready")
+            self.lbl_model_status.setStyleSheet("color: #16a34a; font-weight: 600;")
+        else:
+            self.lbl_model_status.setText("Model unavailable")
+            self.lbl_model_status.setStyleSheet("color: #dc2626; font-weight: 600;")
+
+        # Run a diagnosis requested while the model was still loading
+        if self.pending_run:
+            self.pending_run = False
+            self.run_detection()
+        self.start_prefetch()
+
+    def closeEvent(self, event):
+        if self.model_loader is not None:
+            # May still be tuning in the background
+            self.model_loader.requestInterruption()
+            self.model_loader.wait()
+        self.watch_control.stop(wait=False)
+        print(self.prefetcher.summary())
+        self.prefetcher.shutdown()
+        self.inference.stop()
+        if self.report_exporter is not None:
+            self.report_exporter.wait()
+        super().closeEvent(event)
+
     @pyqtSlot()
     def load_image(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Open MRI Image", "", 
-                                                   "Images (*.png *.jpg *.jpeg *.bmp *.tif);;All Files (*)", 
+                                                   "Images (*.png *.jpg *.jpeg *.bmp *.tif);;"
+                                                   "MRI Volumes (*.nii *.nii.gz *.dcm);;All Files (*)", 
                                                    options=options)
         if file_path:
-            self.viewer.load_image(file_path)
-            self.btn_run.setEnabled(True)
-            self.btn_run.setStyleSheet("background-color: #2563eb;") 
-            self.reset_report()
+            self.open_path(file_path)
+
+    @pyqtSlot()
+    def load_sample(self):
+        paths = collect_images(SAMPLE_DIR, recursive=False)
+        if not paths:
+            QMessageBox.warning(self, "Sample Error", "No sample images found.")
+            return
+        self.gallery.open_folder(SAMPLE_DIR, paths)
+        self.open_path(paths[0])
+
+    @pyqtSlot(str)
+    def open_path(self, file_path):
+        # A result for the previous image is no longer wanted
+        self.cancel_current_request()
+        if is_volume_path(file_path):
+            try:
+                volume = load_volume(file_path)
+            except Exception as e:
+                QMessageBox.warning(self, "Import Error", f"Could not open volume:\n{e}")
+                return
+            self.viewer.load_volume(volume)
+            self.slider_slice.blockSignals(True)
+            self.slider_slice.setRange(0, len(volume) - 1)
+            self.slider_slice.setValue(self.viewer.slice_index)
+            self.slider_slice.blockSignals(False)
+            self.lbl_slice.setText(f"Slice {self.viewer.slice_index + 1}/{len(volume)}")
+            self.slice_bar.show()
+        else:
+            self.viewer.load_image(file_path, self.prefetcher.take_image(file_path))
+            self.slice_bar.hide()
+        self.btn_run.setEnabled(True)
+        self.btn_run.setStyleSheet("background-color: #2563eb;") 
+        self.reset_report()
+        self.start_prefetch()
+
+    @pyqtSlot()
+    def show_performance(self):
+        if self.performance_panel is None:
+            self.performance_panel = PerformancePanel(self)
+        self.performance_panel.show()
+        self.performance_panel.raise_()
+
+    @pyqtSlot()
+    def show_history(self):
+        if self.history_panel is None:
+            self.history_panel = HistoryPanel(self.results_store, self)
+            self.history_panel.study_selected.connect(self.open_study)
+            self.history_panel.image_selected.connect(self.open_path)
+        self.history_panel.show()
+        self.history_panel.raise_()
+
+    @pyqtSlot(str)
+    def open_study(self, folder):
+        if os.path.isdir(folder):
+            self.gallery.open_folder(folder)
+
+    @pyqtSlot(str)
+    def on_watching_changed(self, folder):
+        if folder:
+            self.gallery.open_folder(folder)
+
+    def on_watch_file_done(self, path, detections):
+        # Shown in the gallery; opening it is instant as the result is in the detection cache
+        if self.gallery.folder is not None and os.path.join(study_of(path), '').startswith(
+                os.path.join(self.gallery.folder, '')):
+            self.gallery.add_image(path)
+
+    def store_result(self):
+        # Single images only; volume slices have no file of their own
+        image = self.viewer.current_image
+        if self.viewer.volume is not None or image is None or self.viewer.current_image_path is None:
+            return
+        try:
+            self.results_store.add(self.viewer.current_image_path, self.current_detections, self.conf_threshold,
+                                   image_hash=image.content_hash, engine=getattr(self.detector.model, 'name', None))
+        except Exception as e:
+            print(f"Could not store result: {e}")
+
+    def start_prefetch(self):
+        path = self.viewer.current_image_path
+        if path is not None:
+            # Only decode until the model can run
+            self.prefetcher.on_image_shown(path, self.gallery.paths(), infer=self.model_ready)
 
     def reset_report(self):
         self.alert_box.hide()
@@ -285,7 +525,9 @@ class MainWindow(QMainWindow):
         self.list_findings.clear()
         self.list_findings.addItem("• Ready to analyze.")
         self.diagnosis_results = {'prob': 0, 'lesion_count': 0, 'diagnosis': "Unknown"}
+        self.current_candidates = None
         self.current_detections = []
+        self.volume_candidates = {}
 
     @pyqtSlot()
     def run_detection(self):
@@ -293,64 +535,153 @@ class MainWindow(QMainWindow):
             return
 
         self.btn_run.setEnabled(False)
-        self.btn_run.setText("Analyzing...")
         self.reset_report() 
+
+        # Queue the request until the background loader finishes
+        if not self.model_ready:
+            self.pending_run = True
+            self.btn_run.setText("Waiting for model...")
+            return
+
+        self.btn_run.setText("Analyzing...")
         
-        # Use Thread
-        image_path = self.viewer.get_image_data()
-        self.worker = DetectionWorker(self.detector, image_path, 0.25)
-        self.worker.result_ready.connect(self.on_detection_complete)
-        self.worker.start()
+        # Hand off to the inference thread
+        if self.viewer.volume is not None:
+            self.current_request = self.inference.submit_volume(self.viewer.volume)
+            if self.current_request is None:
+                self.show_request_dropped()
+            return
+        candidates = self.prefetcher.take_result(self.viewer.current_image_path)
+        self.lbl_model_status.setToolTip(self.prefetcher.summary())
+        if candidates is not None:
+            # Already computed in the background while the user was on the previous image
+            self.btn_run.setEnabled(True)
+            self.btn_run.setText("  Run Diagnosis")
+            self.current_candidates = candidates
+            self.apply_threshold()
+            self.store_result()
+            return
+        image = self.viewer.get_image_data()
+        self.current_request = self.inference.submit(self.viewer.current_image_path, source=image)
+        if self.current_request is None:
+            self.show_request_dropped()
+
+    def cancel_current_request(self):
+        self.pending_run = False
+        if self.current_request is not None:
+            self.inference.cancel(self.current_request)
+            self.current_request = None
+            self.btn_run.setText("  Run Diagnosis")
+
+    def on_detection_complete(self, request_id, image_path, candidates):
+        # Drop stale results from requests that are no longer current
+        if request_id != self.current_request:
+            return
+        self.current_request = None
 
-    def on_detection_complete(self, detections, _):
         self.btn_run.setEnabled(True)
         self.btn_run.setText("  Run Diagnosis")
         
-        self.current_detections = detections
-        self.viewer.draw_detections(detections)
-        self.update_report(detections)
+        self.current_candidates = candidates
+        self.apply_threshold()
+        if candidates.error:
+            QMessageBox.warning(self, "Diagnosis Error", f"Could not analyze this image: {candidates.error}")
+            return
+        self.store_result()
 
+    def on_request_dropped(self, request_id):
+        # Evicted from a full queue before it ran: no result is coming
+        if request_id != self.current_request:
+            return
+        self.current_request = None
+        self.show_request_dropped()
 
-    def update_report(self, detections):
-        if not detections:
-            self.alert_box.hide()
-            self.list_findings.clear()
-            self.list_findings.addItem("• No Abnormalities Detected.")
-            self.diagnosis_results = {'prob': 0, 'lesion_count': 0, 'diagnosis': "Normal"}
+    def show_request_dropped(self):
+        # Refused or evicted by a full queue: no result is coming
+        self.btn_run.setEnabled(True)
+        self.btn_run.setText("  Run Diagnosis")
+        self.lbl_diagnosis.setText("Not analyzed")
+        self.list_findings.clear()
+        self.list_findings.addItem("• The request was dropped from a busy queue; run the diagnosis again.")
+
+    def on_volume_progress(self, request_id, done, total, results):
+        if request_id != self.current_request:
             return
+        self.volume_candidates.update(results)
+        self.btn_run.setText(f"Analyzing {done}/{total}...")
+        if done == total:
+            self.current_request = None
+            self.btn_run.setEnabled(True)
+            self.btn_run.setText("  Run Diagnosis")
+
+        # Show results as soon as the slice on screen has been processed
+        if self.viewer.slice_index in results or done == total:
+            self.current_candidates = self.volume_candidates.get(self.viewer.slice_index)
+            self.apply_threshold()
+
+    @pyqtSlot(int)
+    def on_slice_changed(self, index):
+        total = len(self.viewer.volume)
+        self.lbl_slice.setText(f"Slice {index + 1}/{total}")
+        self.slider_slice.blockSignals(True)
+        self.slider_slice.setValue(index)
+        self.slider_slice.blockSignals(False)
+
+        self.current_candidates = self.volume_candidates.get(index)
+        if self.current_candidates is not None:
+            self.apply_threshold()
+        else:
+            self.current_detections = []
 
-        # Show Alert
-        self.alert_box.show()
-        
-        # Get highest confidence
-        best_det = max(detections, key=lambda x: x['conf'])
-        prob_val = int(best_det['conf'] * 100)
-        
-        self.lbl_prob.setText(f"{prob_val}.0%")
-        self.progress_bar.setValue(prob_val)
-        self.diagnosis_results['prob'] = prob_val
-        
-        # IMPLEMENTATION OF NEW LOGIC
-        lesion_count = len(detections)
-        self.lbl_count.setText(str(lesion_count))
-        self.diagnosis_results['lesion_count'] = lesion_count
-        
-        if lesion_count == 1:
-            diagnosis_text = "Not Metastases"
-        elif lesion_count > 1:
-            diagnosis_text = "Metastases"
+    @pyqtSlot(int)
+    def on_threshold_changed(self, value):
+        self.conf_threshold = value / 100
+        self.lbl_threshold.setText(f"{value}%")
+        self.apply_threshold()
+
+    def apply_threshold(self):
+        # Nothing to filter until the model has run on the current image
+        if self.current_candidates is None:
+            return
+
+        filtered = self.current_candidates.filter(self.conf_threshold)
+        detections = filtered.to_list()
+        self.current_detections = detections
+        self.viewer.draw_detections(filtered)
+        if filtered.error:
+            # No result is not a negative result
+            self.diagnosis_results = {'prob': 0, 'lesion_count': 0, 'diagnosis': "Unknown"}
+            self.alert_box.hide()
+            self.lbl_prob.setText("-")
+            self.progress_bar.setValue(0)
+            self.lbl_count.setText("-")
+            self.lbl_diagnosis.setText("Analysis failed")
+            self.list_findings.clear()
+            self.list_findings.addItem(f"• {filtered.error}")
         else:
-            diagnosis_text = "Unknown"
-        
-        self.lbl_diagnosis.setText(diagnosis_text)
-        self.diagnosis_results['diagnosis'] = diagnosis_text
+            self.update_report(detections)
+
+        # Volume summary across every slice processed so far
+        analyzed = [c for c in self.volume_candidates.values() if not c.error]
+        if self.viewer.volume is not None and self.volume_candidates:
+            positive = sum(1 for c in analyzed if len(c.filter(self.conf_threshold)))
+            failed = len(self.volume_candidates) - len(analyzed)
+            self.list_findings.addItem(f"• Slice {self.viewer.slice_index + 1}: "
+                                       f"{positive} of {len(analyzed)} analyzed slices with lesions"
+                                       + (f", {failed} failed." if failed else "."))
 
-        # Clinical findings
+    def update_report(self, detections):
+        results = diagnose(detections)
+        self.diagnosis_results = results
         self.list_findings.clear()
-        self.list_findings.addItem(f"• Detected {lesion_count} lesion(s).")
-        self.list_findings.addItem(f"• Diagnosis: {diagnosis_text}")
-        self.list_findings.addItem(f"• Max Confidence: {prob_val}%")
-        self.list_findings.addItem(f"• Primary lesion: {best_det['label']}")
+        for line in findings(detections, results):
+            self.list_findings.addItem(line)
+        self.lbl_count.setText(str(results['lesion_count']))
+        self.lbl_diagnosis.setText(results['diagnosis'])
+        self.lbl_prob.setText(f"{results['prob']}.0%")
+        self.progress_bar.setValue(results['prob'])
+        # Show the alert only when something was found
+        self.alert_box.setVisible(bool(detections))
 
 
     @pyqtSlot()
@@ -358,119 +689,28 @@ class MainWindow(QMainWindow):
         if not self.viewer.has_image():
             QMessageBox.warning(self, "Export Error", "No image loaded to export.")
             return
+        if self.report_exporter is not None:
+            return
 
         filename, _ = QFileDialog.getSaveFileName(self, "Export PDF Report", "Detection_Report.pdf", "PDF Files (*.pdf)")
         if not filename:
             return
 
-        printer = QPrinter(QPrinter.HighResolution)
-        printer.setOutputFormat(QPrinter.PdfFormat)
-        printer.setOutputFileName(filename)
-        printer.setPageSize(QPrinter.A4)
-
-        # 1. Grab Image
-        image_path = self.viewer.current_image_path
-        if image_path:
-            image_pixmap = QPixmap(image_path)
-            
-            # Draw detections if any
-            if self.current_detections:
-                painter = QPainter(image_pixmap)
-                painter.setRenderHint(QPainter.Antialiasing)
-                pen = QPen(QColor(255, 0, 0), 5) 
-                painter.setPen(pen)
-                painter.setBrush(Qt.NoBrush)
-                
-                for det in self.current_detections:
-                    x1, y1, x2, y2 = det['bbox']
-                    w = x2 - x1
-                    h = y2 - y1
-                    painter.drawRect(int(x1), int(y1), int(w), int(h))
-                
-                painter.end()
+        findings = [self.list_findings.item(i).text() for i in range(self.list_findings.count())]
+        # Rendering and printing run on a worker thread; the window stays responsive
+        self.report_exporter = ReportExporter(filename, self.viewer.current_image, self.current_detections,
+                                              self.diagnosis_results, findings)
+        self.report_exporter.finished_export.connect(self.on_report_exported)
+        self.btn_export.setEnabled(False)
+        self.btn_export.setText("Exporting...")
+        self.report_exporter.start()
+
+    def on_report_exported(self, filename, error):
+        self.report_exporter.wait()
+        self.report_exporter = None
+        self.btn_export.setEnabled(True)
+        self.btn_export.setText("Export PDF Report")
+        if error:
+            QMessageBox.warning(self, "Export Error", f"Could not export report:\n{error}")
         else:
-            image_pixmap = QPixmap(400, 300)
-            image_pixmap.fill(Qt.black)
-
-        # Save pixmap to buffer to embed in HTML
-        ba = QByteArray()
-        buffer = QBuffer(ba)
-        buffer.open(QIODevice.WriteOnly)
-        image_pixmap.save(buffer, "PNG")
-        import base64
-        image_data = base64.b64encode(ba.data()).decode("utf-8")
-        
-        # 2. Build HTML Content
-        current_date = QDate.currentDate().toString(Qt.DefaultLocaleLongDate)
-        
-        # Findings to HTML
-        findings_html = "<ul>"
-        for i in range(self.list_findings.count()):
-            item = self.list_findings.item(i)
-            findings_html += f"<li>{item.text()}</li>"
-        findings_html += "</ul>"
-
-        html_content = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: sans-serif; padding: 40px; color: #333; }}
-                h1 {{ color: #1e293b; font-size: 24px; border-bottom: 2px solid #334155; padding_bottom: 10px; }}
-                .header {{ display: flex; justify-content: space-between; margin-bottom: 30px; }}
-                .meta {{ color: #64748b; font-size: 12px; margin-bottom: 20px; }}
-                .section {{ margin-bottom: 25px; }}
-                .label {{ font-weight: bold; color: #475569; }}
-                .value {{ color: #0f172a; }}
-                .image-container {{ text-align: center; margin: 20px 0; border: 1px solid #ddd; padding: 10px; }}
-                img {{ max-width: 100%; height: auto; }}
-                .stats-table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
-                .stats-table td {{ padding: 8px; border-bottom: 1px solid #eee; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>Brain Metastases Diagnostic Report</h1>
-            </div>
-            
-            <div class="meta">
-                Date: {current_date}<br>
-                Generated by: GUI Brain Metastases System
-            </div>
-
-            <div class="section">
-                <h3>Diagnosis Results</h3>
-                <table class="stats-table">
-                    <tr>
-                        <td class="label">Malignancy Probability</td>
-                        <td class="value">{self.diagnosis_results.get('prob', 0)}%</td>
-                    </tr>
-                    <tr>
-                        <td class="label">Lesion Count</td>
-                        <td class="value">{self.diagnosis_results.get('lesion_count', 0)}</td>
-                    </tr>
-                    <tr>
-                        <td class="label">Diagnosis</td>
-                        <td class="value">{self.diagnosis_results.get('diagnosis', 'N/A')}</td>
-                    </tr>
-                </table>
-            </div>
-
-            <div class="section image-container">
-                <h3>Visual Analysis</h3>
-                <img src="data:image/png;base64,{image_data}" width="500">
-            </div>
-
-            <div class="section">
-                <h3>Clinical Findings</h3>
-                {findings_html}
-            </div>
-        </body>
-        </html>
-        """
-
-        # 3. Print
-        document = QTextDocument()
-        document.setHtml(html_content)
-        document.print_(printer)
-        
-        QMessageBox.information(self, "Success", f"Report successfully exported to {filename}")
+            QMessageBox.information(self, "Success", f"Report successfully exported to {filename}")